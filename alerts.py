@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+from history import FUNDS, list_snapshots, load_snapshot
+from anomaly import latest_flags
+from secmaster import name_of
+from snapshot_store import fund_lock, atomic_write_text
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+SUBSCRIBERS_FILE = "alerts.json"       # 訂閱者設定 (格式見 alerts.example.json)，也可用環境變數 ALERTS_CONFIG
+SENT_LOG = "alerts_sent.json"          # 已送出的事件 id，避免重複通知
+SENT_LOG_SIZE = 5000                   # 每個訂閱者保留幾筆 id
+MAX_BATCH = 100                        # 一次 webhook 最多幾個事件
+MAX_WORKERS = 16                       # 同時送出的 webhook 數
+TIMEOUT = 5                            # 單次請求逾時 (秒)
+RETRIES = 3                            # 失敗重試次數 (連線錯誤、429、5xx)
+RETRY_BASE = 0.5                       # 重試間隔 0.5, 1, 2 秒
+
+EVENT_LABELS = {'new': '🆕 新進', 'exit': '❌ 出清', 'up': '🔺 加碼', 'down': '🔻 減碼', 'anomaly': '⚠️ 異常'}
+
+# ==========================================
+# 2. 事件：把每天的持股差異轉成事件
+# ==========================================
+
+def event_id(event):
+    key = f"{event['fund']}|{event['date']}|{event['code']}|{event['type']}|{event['shares_new']}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+def diff_events(fund, day, df_new, df_old):
+    """兩份統一欄位的快照 -> 事件 list (new / exit / up / down)"""
+    old = dict(zip(df_old['股票代號'], df_old['股數'])) if df_old is not None else {}
+    new = dict(zip(df_new['股票代號'], df_new['股數']))
+    weights = dict(zip(df_new['股票代號'], df_new['權重(%)']))
+
+    events = []
+    for code in sorted(set(old) | set(new)):
+        before, after = int(old.get(code, 0)), int(new.get(code, 0))
+        if before == after:
+            continue
+        if before == 0:
+            kind = 'new'
+        elif after == 0:
+            kind = 'exit'
+        else:
+            kind = 'up' if after > before else 'down'
+        event = {
+            'fund': fund, 'date': day, 'code': code, 'name': name_of(code), 'type': kind,
+            'shares_old': before, 'shares_new': after, 'delta': after - before,
+            'weight': round(float(weights.get(code, 0.0)), 4),
+        }
+        event['id'] = event_id(event)
+        events.append(event)
+    return events
+
+def latest_events(fund):
+    """取該基金最新兩份快照的差異"""
+    snapshots = list_snapshots(fund)
+    if not snapshots:
+        return []
+    day, path = snapshots[-1]
+    df_old = load_snapshot(snapshots[-2][1], fund) if len(snapshots) > 1 else None
+    return diff_events(fund, str(day.date()), load_snapshot(path, fund), df_old)
+
+def anomaly_events(fund):
+    """anomaly.py 標出的最新一天異常變動 -> 事件 (type = anomaly，多一個 z 分數)"""
+    events = []
+    for f in latest_flags(fund, top=None):
+        event = {
+            'fund': fund, 'date': f['日期'], 'code': f['股票代號'], 'name': f['股票名稱'], 'type': 'anomaly',
+            'shares_old': int(f['股數'] - f['股數變化']), 'shares_new': int(f['股數']), 'delta': int(f['股數變化']),
+            'weight': round(float(f['權重(%)']), 4), 'z': round(float(f['z']), 2),
+        }
+        event['id'] = event_id(event)
+        events.append(event)
+    return events
+
+# ==========================================
+# 3. 訂閱者與過濾條件
+# ==========================================
+
+def load_subscribers(path=SUBSCRIBERS_FILE):
+    """
+    每個訂閱者：
+      name / url            : 名稱與 webhook 網址
+      funds                 : 只看這些基金 (省略 = 全部)
+      watchlist             : 只看這些股票代號 (省略 = 全部)
+      min_share_delta       : 股數變化至少多少股 (新進 / 出清不受限)
+      types                 : 事件種類 new / exit / up / down / anomaly (省略 = 全部)
+    """
+    raw = os.environ.get("ALERTS_CONFIG")
+    if raw is None and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            raw = f.read()
+    return json.loads(raw)['subscribers'] if raw else []
+
+def matches(sub, event):
+    if sub.get('funds') and event['fund'] not in sub['funds']:
+        return False
+    if sub.get('watchlist') and event['code'] not in [str(c) for c in sub['watchlist']]:
+        return False
+    if sub.get('types') and event['type'] not in sub['types']:
+        return False
+    if event['type'] in ('up', 'down', 'anomaly') and abs(event['delta']) < sub.get('min_share_delta', 0):
+        return False
+    return True
+
+def format_text(events):
+    lines = [f"📢 主動式 ETF 持股異動 ({len(events)} 筆)"]
+    for e in events:
+        lines.append(f"{e['fund']} {EVENT_LABELS[e['type']]} {e['code']} {e['name']} "
+                     f"{e['delta']:+,} 股 (權重 {e['weight']:.2f}%)" + (f" z {e['z']:+.1f}" if 'z' in e else ""))
+    return "\n".join(lines)
+
+# ==========================================
+# 4. 送出：每個訂閱者一批，批次之間並行，失敗重試
+# ==========================================
+
+def load_sent():
+    if os.path.exists(SENT_LOG):
+        with open(SENT_LOG, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def post_batch(sub, events):
+    """送出一批事件，回傳 (是否成功, 嘗試次數, 說明)"""
+    batch_id = hashlib.sha1("".join(e['id'] for e in events).encode()).hexdigest()[:16]
+    payload = {'subscriber': sub['name'], 'batch_id': batch_id, 'events': events, 'text': format_text(events)}
+    # 同一批重試時 batch_id 不變，接收端可用它去重
+    headers = {'Content-Type': 'application/json', 'X-Alert-Batch-Id': batch_id}
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    for attempt in range(1, RETRIES + 2):
+        try:
+            response = requests.post(sub['url'], data=body, headers=headers, timeout=TIMEOUT)
+            if response.status_code < 300:
+                return True, attempt, f"HTTP {response.status_code}"
+            reason = f"HTTP {response.status_code}"
+            if response.status_code < 500 and response.status_code != 429:
+                return False, attempt, reason   # 4xx 重試也沒用
+        except requests.RequestException as e:
+            reason = type(e).__name__
+        if attempt <= RETRIES:
+            time.sleep(RETRY_BASE * (2 ** (attempt - 1)))
+    return False, attempt, reason
+
+def dispatch(events, subscribers=None, dry_run=False):
+    """
+    依訂閱條件分批送出；已送過的事件 (同一訂閱者、同一 id) 不會再送。
+    回傳每批的結果 list。
+    """
+    subscribers = load_subscribers() if subscribers is None else subscribers
+    if not events or not subscribers:
+        return []
+
+    with fund_lock("alerts"):
+        sent = load_sent()
+        jobs = []
+        for sub in subscribers:
+            seen = set(sent.get(sub['name'], []))
+            todo = [e for e in events if matches(sub, e) and e['id'] not in seen]
+            for i in range(0, len(todo), MAX_BATCH):
+                jobs.append((sub, todo[i:i + MAX_BATCH]))
+
+        if not jobs:
+            print("💤 沒有新的通知要送")
+            return []
+        if dry_run:
+            for sub, batch in jobs:
+                print(f"[{sub['name']}]\n{format_text(batch)}")
+            return []
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            outcomes = list(pool.map(lambda job: post_batch(*job), jobs))
+        elapsed = time.perf_counter() - start
+
+        results = []
+        for (sub, batch), (ok, attempts, reason) in zip(jobs, outcomes):
+            if ok:
+                ids = sent.get(sub['name'], []) + [e['id'] for e in batch]
+                sent[sub['name']] = ids[-SENT_LOG_SIZE:]
+            results.append({'subscriber': sub['name'], 'events': len(batch), 'ok': ok, 'attempts': attempts, 'reason': reason})
+        atomic_write_text(SENT_LOG, json.dumps(sent, ensure_ascii=False))
+
+    failed = [r for r in results if not r['ok']]
+    print(f"📨 通知已送出: {len(results) - len(failed)}/{len(results)} 批，耗時 {elapsed:.2f} 秒")
+    for r in failed:
+        print(f"   ⚠️ {r['subscriber']}: {r['events']} 筆送出失敗 ({r['reason']}，嘗試 {r['attempts']} 次)")
+    return results
+
+def notify(funds, dry_run=False):
+    """基金處理完後呼叫：取最新差異並通知 (poller 每檔公布後會立即呼叫)"""
+    subscribers = load_subscribers()
+    if not subscribers:
+        return []
+    events = [e for fund in funds for e in latest_events(fund) + anomaly_events(fund)]
+    return dispatch(events, subscribers, dry_run)
+
+# ==========================================
+# 5. 本機 webhook 替身 (測試用)
+# ==========================================
+
+class SinkHandler(BaseHTTPRequestHandler):
+    fail_rate = 0.0
+    received = []        # 收到的 payload (依 batch_id 去重)
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if random.random() < self.fail_rate:
+            self.send_response(503)
+            self.end_headers()
+            return
+        payload = json.loads(body)
+        with self.lock:
+            if all(p['batch_id'] != payload['batch_id'] for p in self.received):
+                self.received.append(payload)
+                print(payload['text'])
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def start_sink(port=0, fail_rate=0.0):
+    """啟動一個假 webhook，回傳 (server, url, 收到的 payload list)"""
+    handler = type("Sink", (SinkHandler,), {'fail_rate': fail_rate, 'received': []})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/hook", handler.received
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="持股異動通知：把最新差異送到訂閱的 webhook")
+    parser.add_argument("funds", nargs="*", default=FUNDS, help="要通知的基金 (預設全部)")
+    parser.add_argument("--dry-run", action="store_true", help="只印出要送的內容")
+    parser.add_argument("--sink", type=int, metavar="PORT", help="啟動本機 webhook 替身")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="webhook 替身回傳 503 的機率")
+    args = parser.parse_args()
+
+    if args.sink is not None:
+        server, url, _ = start_sink(args.sink, args.fail_rate)
+        print(f"🧪 webhook 替身啟動: {url} (Ctrl+C 結束)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        notify(args.funds, dry_run=args.dry_run)
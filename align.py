@@ -0,0 +1,81 @@
+import numpy as np
+
+from trading_calendar import get_calendar
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+STALE_DAYS = 3     # 沿用的快照超過幾個交易日算過期 (過期的基金不列入當天的跨基金比較)
+AXIS = "trading"   # 增量更新的輸出記下日期軸的種類，舊的 (快照日期聯集) 輸出會自動整個重建
+
+# ==========================================
+# 各基金公布的日子不一樣 (991a 的備份會跳日、981a 有週末的檔案、982a_backup 以檔案時間命名)，
+# 這裡把所有快照日期對齊到同一條交易日軸：
+#   - 非交易日的快照從下一個交易日起才算「看得到」(週末檔 = 下週一的資料)，不會用到未來的資料
+#   - 每個交易日取各基金「當天或之前最近一份」快照 (as-of)，並記錄沿用了幾個交易日
+# 所有基金的快照串成一條，一次 searchsorted 就對齊完，回補幾千份快照也是同一個步驟。
+# ==========================================
+
+def _days(dates):
+    return np.asarray(dates, dtype='datetime64[D]')
+
+def available_day(dates):
+    """快照日期 -> 第一個看得到它的交易日 (交易日為當天，非交易日往後順延)"""
+    return np.busday_offset(_days(dates), 0, roll='forward', busdaycal=get_calendar())
+
+def trading_axis(dates, end=None):
+    """所有快照日期 -> 連續交易日軸 (最早一份快照到最後一份或 end，皆順延到交易日)"""
+    dates = _days(dates)
+    if len(dates) == 0:
+        return np.array([], dtype='datetime64[D]')
+    start = available_day(dates.min())
+    stop = available_day(_days(end) if end is not None else dates.max())
+    n = np.busday_count(start, stop, busdaycal=get_calendar()) + 1
+    return np.busday_offset(start, np.arange(max(n, 0)), roll='forward', busdaycal=get_calendar())
+
+def align_funds(snap_dates, axis):
+    """
+    snap_dates: 各基金的快照日期 list (每檔已依日期排序)；axis: 交易日軸。
+    回傳 dict：
+      index : int [基金, 日期]，所有基金快照串接後的全域序號 (沒有快照時為 0)，
+              快照矩陣用同樣的順序串接後，一次 fancy index 就能取出 [基金, 日期, 股票]
+      pos   : int [基金, 日期]，該基金自己的快照序號
+      valid : bool [基金, 日期]，該日期之前已有快照
+      fresh : bool [基金, 日期]，當天看到的是新快照 (非沿用)
+      age   : int [基金, 日期]，沿用的快照是幾個交易日前的 (沒有快照為 -1)
+      stale : bool [基金, 日期]，age 超過 STALE_DAYS
+    """
+    axis = _days(axis)
+    n_f = len(snap_dates)
+    lengths = np.array([len(d) for d in snap_dates], dtype=np.int64)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if n_f else np.zeros(0, dtype=np.int64)
+    flat = available_day(np.concatenate([_days(d) for d in snap_dates]) if lengths.sum() else _days([]))
+
+    # 基金序號 × 間距 + 日期 當成一個排序鍵，所有基金一次 searchsorted
+    ordinal, query = flat.astype(np.int64), axis.astype(np.int64)
+    span = max(ordinal.max(initial=0), query.max(initial=0)) + 1
+    keys = np.repeat(np.arange(n_f, dtype=np.int64), lengths) * span + ordinal
+    queries = np.arange(n_f, dtype=np.int64)[:, None] * span + query[None, :]
+    index = np.searchsorted(keys, queries, side='right') - 1
+
+    valid = index >= starts[:, None]
+    index = np.where(valid, index, 0)
+    age = np.where(valid, np.busday_count(flat[index] if len(flat) else axis, axis, busdaycal=get_calendar()), -1)
+    return {
+        'index': index,
+        'pos': np.where(valid, index - starts[:, None], 0),
+        'valid': valid,
+        'fresh': valid & (age == 0),
+        'age': age,
+        'stale': valid & (age > STALE_DAYS),
+    }
+
+def asof(snap_dates, axis):
+    """單一基金的 as-of 對齊 (align_funds 的一列)"""
+    aligned = align_funds([snap_dates], axis)
+    return {key: value[0] for key, value in aligned.items()}
+
+def new_trading_days(snap_dates, last_day):
+    """增量更新用：last_day 之後新增的交易日"""
+    axis = trading_axis(snap_dates)
+    return axis[axis > np.datetime64(last_day, 'D')]
@@ -1,9 +1,60 @@
+import numpy as np
 import pandas as pd
 import os
 import glob
-import json
+import sys
 from datetime import datetime
 
+from rollup import load_rollup
+from trajsearch import INDEX_JSON, INDEX_NPY, similar_trends, load_index
+from align import AXIS, asof, available_day
+from build_site import write_asset, trends_asset
+from profiling import stage, run_profiled
+
+# 趨勢圖每檔股票最多幾個點，超過就改讀週 (再不夠就月) 彙整
+MAX_TREND_POINTS = 500
+# 趨勢資料另存成二進位資料檔 (build_site.py 的格式)，頁面載入後才下載，不再內嵌在 HTML 裡
+TREND_ASSET = "ana981a_trends"
+
+def pick_date_window(available_dates, lookback_days=10):
+    """
+    回傳 (最新日期, 最接近 lookback_days 天前的日期)。
+    """
+    latest_date = pd.Timestamp(available_dates[-1])
+    target_past_date = latest_date - pd.Timedelta(days=lookback_days)
+    past_date = pd.Timestamp(min(available_dates, key=lambda d: abs(pd.Timestamp(d) - target_past_date)))
+    return latest_date, past_date
+
+def coarsen_trends(trend_dict, fund="981a"):
+    """
+    長期趨勢圖：日資料點數超過 MAX_TREND_POINTS 的股票，改用 rollup.py 產生的
+    週/月彙整 (期末權重與股數)。沒有彙整檔時維持日資料。
+    """
+    for code, trend in trend_dict.items():
+        if len(trend['dates']) <= MAX_TREND_POINTS:
+            continue
+        for freq in ('weekly', 'monthly'):
+            rolled = load_rollup(fund, freq, code)
+            if rolled is None or rolled.empty:
+                break
+            trend.update({
+                'dates': rolled['期間'].tolist(),
+                'weights': rolled['權重_收'].tolist(),
+                'shares': rolled['股數_收'].tolist(),
+            })
+            if len(rolled) <= MAX_TREND_POINTS:
+                break
+    return trend_dict
+
+def attach_similar(trend_dict):
+    """
+    每檔持股附上近期走勢 (權重 + 股數) 最像的其他持股，點選趨勢圖時一起顯示。
+    要在 coarsen_trends 之前呼叫 (比的是日資料)。
+    """
+    for code, similar in similar_trends(trend_dict).items():
+        trend_dict[code]['similar'] = [[other, trend_dict[other]['name'], score] for other, score in similar]
+    return trend_dict
+
 def analyze_etf_holdings(csv_folder_path, output_html="ana981a.html"):
     """
     讀取資料夾內所有 CSV 檔案，分析持股趨勢並生成互動式 HTML 報告。
@@ -61,9 +112,7 @@ def analyze_etf_holdings(csv_folder_path, output_html="ana981a.html"):
 
     # 4. 取得日期節點 (最新 vs 10天前)
     available_dates = sorted(full_df['日期'].unique())
-    latest_date = pd.Timestamp(available_dates[-1])
-    target_past_date = latest_date - pd.Timedelta(days=10)
-    past_date = pd.Timestamp(min(available_dates, key=lambda d: abs(pd.Timestamp(d) - target_past_date)))
+    latest_date, past_date = pick_date_window(available_dates)
     days_diff = (latest_date - past_date).days
 
     # 5. 重點變動分析 (Top 10)
@@ -85,22 +134,37 @@ def analyze_etf_holdings(csv_folder_path, output_html="ana981a.html"):
     comparison = pd.merge(comparison, buy_date_summary, on='股票代號', how='left')
     comparison['實際買入日期(加碼)'].fillna('無變動', inplace=True)
     
-    top_increase = comparison[comparison['權重變動'] > 0].sort_values('權重變動', ascending=False).head(10)
-    top_decrease = comparison[comparison['權重變動'] < 0].sort_values('權重變動', ascending=True).head(10)
+    top_increase = comparison[comparison['權重變動'] > 0].sort_values(['權重變動', '股票代號'], ascending=[False, True]).head(10)
+    top_decrease = comparison[comparison['權重變動'] < 0].sort_values(['權重變動', '股票代號'], ascending=True).head(10)
 
     # 6. 整理最新持股名單與趨勢 JSON
     latest_holdings = pd.merge(df_latest, first_appearance, on='股票代號', how='left')
-    latest_holdings = latest_holdings.sort_values(['首次買入日期', '權重(%)'], ascending=[False, False])
+    latest_holdings = latest_holdings.sort_values(['首次買入日期', '權重(%)', '股票代號'], ascending=[False, False, True])
     
-    current_stock_names = latest_holdings['股票名稱'].unique()
+    # 趨勢以股票代號為鍵 (同一檔股票改名也不會斷線)
+    by_code = dict(tuple(full_df.groupby('股票代號')))
     trend_dict = {}
-    for name in current_stock_names:
-        stock_data = full_df[full_df['股票名稱'] == name].sort_values('日期')
-        trend_dict[name] = {
+    for code in latest_holdings['股票代號'].unique():
+        stock_data = by_code[code].sort_values('日期')
+        trend_dict[str(code)] = {
+            'name': stock_data['股票名稱'].iloc[-1],
             'dates': stock_data['日期'].dt.strftime('%Y-%m-%d').tolist(),
             'weights': stock_data['權重(%)'].tolist(),
             'shares': stock_data['股數'].tolist()
         }
+    with stage('similar'):
+        attach_similar(trend_dict)
+    coarsen_trends(trend_dict)
+
+    with stage('render'):
+        render_report(output_html, latest_date, days_diff, top_increase, top_decrease, latest_holdings, trend_dict)
+
+
+def render_report(output_html, latest_date, days_diff, top_increase, top_decrease, latest_holdings, trend_dict):
+    """
+    將分析結果輸出為 HTML 報告 (批次模式與串流模式共用)。
+    """
+    write_asset(TREND_ASSET, *trends_asset(trend_dict))
 
     # 7. HTML 片段生成
     def df_to_html_table(df, show_buy_date=False):
@@ -113,7 +177,7 @@ def analyze_etf_holdings(csv_folder_path, output_html="ana981a.html"):
     # 預先處理 HTML 組件以避免 f-string 解析問題
     table_inc_html = df_to_html_table(top_increase[['股票代號', '股票名稱', '權重變動', '權重(%)_新', '實際買入日期(加碼)']])
     table_dec_html = df_to_html_table(top_decrease[['股票代號', '股票名稱', '權重變動', '權重(%)_新']])
-    stock_tags_html = "".join([f'<div class="stock-tag" onclick=\'showTrend("{n}", this)\'>{n}</div>' for n in current_stock_names])
+    stock_tags_html = "".join([f'<div class="stock-tag" onclick=\'showTrend("{code}", this)\'>{t["name"]}</div>' for code, t in trend_dict.items()])
     
     latest_holdings_display = latest_holdings.copy()
     latest_holdings_display['首次買入日期'] = latest_holdings_display['首次買入日期'].dt.strftime('%Y-%m-%d')
@@ -128,6 +192,7 @@ def analyze_etf_holdings(csv_folder_path, output_html="ana981a.html"):
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>00981A ETF 持股分析</title>
         <script src="https://cdn.plot.ly/plotly-2.27.0.min.js"></script>
+        <script src="etfdata.js"></script>
         <style>
             body {{ font-family: "Microsoft JhengHei", sans-serif; margin: 20px; background-color: #f0f2f5; color: #333; }}
             .container {{ max-width: 1200px; margin: auto; background: white; padding: 25px; border-radius: 12px; box-shadow: 0 4px 15px rgba(0,0,0,0.1); }}
@@ -168,6 +233,7 @@ def analyze_etf_holdings(csv_folder_path, output_html="ana981a.html"):
                 <div id="chartPlaceholder" style="text-align:center; padding:50px; color:#999; border:2px dashed #ddd; border-radius:8px;">請點擊股票名稱</div>
                 <div id="chartWrapper" class="chart-wrapper">
                     <h3 id="selectedStockTitle" style="margin-top:0;"></h3>
+                    <p id="similarStocks" style="text-align:center; color:#666; font-size:0.9em;"></p>
                     <div id="weightChart"></div>
                     <div id="sharesChart" style="margin-top:20px;"></div>
                 </div>
@@ -178,14 +244,28 @@ def analyze_etf_holdings(csv_folder_path, output_html="ana981a.html"):
             </div>
         </div>
         <script>
-            const trendData = {json.dumps(trend_dict)};
-            function showTrend(name, element) {{
+            // 趨勢資料: site/data/{TREND_ASSET}.bin (長表，依股票代號切回每檔股票的序列)
+            const trendData = {{}};
+            const trendReady = ETFData.load('site/data/{TREND_ASSET}.bin').then(asset => {{
+                const c = asset.columns;
+                asset.meta.order.forEach(code => {{ trendData[code] = {{ name: asset.meta.names[code], similar: asset.meta.similar[code], dates: [], weights: [], shares: [] }}; }});
+                c.code.forEach((code, i) => {{
+                    const d = trendData[code];
+                    d.dates.push(c.date[i]); d.weights.push(c.weight[i]); d.shares.push(c.shares[i]);
+                }});
+            }});
+            function showTrend(code, element) {{
                 document.querySelectorAll('.stock-tag').forEach(el => el.classList.remove('active'));
                 element.classList.add('active');
+                trendReady.then(() => drawTrend(code));
+            }}
+            function drawTrend(code) {{
                 document.getElementById('chartPlaceholder').style.display = 'none';
                 document.getElementById('chartWrapper').style.display = 'block';
-                document.getElementById('selectedStockTitle').innerText = name + ' 歷史走勢';
-                const d = trendData[name];
+                const d = trendData[code];
+                document.getElementById('selectedStockTitle').innerText = d.name + ' 歷史走勢';
+                const similar = (d.similar || []).map(s => `${{s[1]}} (${{s[2].toFixed(2)}})`).join('、');
+                document.getElementById('similarStocks').innerText = similar ? '近期走勢相似: ' + similar : '';
                 const layout = (t) => ({{ title: t, hovermode: 'x unified', margin: {{t:40, b:40, l:60, r:20}} }});
                 Plotly.newPlot('weightChart', [{{x:d.dates, y:d.weights, mode:'lines+markers', name:'權重', line:{{color:'#27ae60', width:3}}}}], layout('權重趨勢 (%)'));
                 Plotly.newPlot('sharesChart', [{{x:d.dates, y:d.shares, mode:'lines+markers', name:'股數', line:{{color:'#2980b9', width:3}}}}], layout('股數趨勢'));
@@ -200,7 +280,195 @@ def analyze_etf_holdings(csv_folder_path, output_html="ana981a.html"):
         f.write(html_content)
     print(f"成功生成報告：{output_html}")
 
+def list_dated_files(csv_folder_path):
+    """
+    列出資料夾內以日期命名的 CSV (YYYY-MM-DD.csv)，依日期排序。
+    """
+    dated_files = []
+    for file_path in glob.glob(os.path.join(csv_folder_path, "*.csv")):
+        file_name = os.path.basename(file_path)
+        try:
+            report_date = pd.to_datetime(file_name.split('.')[0])
+        except Exception:
+            print(f"跳過無效格式檔案: {file_name}")
+            continue
+        dated_files.append((report_date, file_path))
+    dated_files.sort()
+    return dated_files
+
+def index_trends(codes, file_dates, fund="981a", index_npy=INDEX_NPY, index_json=INDEX_JSON):
+    """
+    串流模式的單股趨勢：從 trajsearch.py 的軌跡索引 (mmap) 只取出 codes 這幾列，
+    保留該基金當天有新快照 (非沿用) 且有持股的交易日。只讀既有的索引，不在這裡更新或重建；
+    索引不存在、日期軸不同或還沒更新到最新一份檔案時回傳 None，由呼叫端改用 stream_trends()。
+    索引裡沒有的股票 (索引比資料夾舊) 回傳空序列，由呼叫端補上最新一天。
+    """
+    if not (os.path.exists(index_npy) and os.path.exists(index_json)):
+        return None
+    meta, traj = load_index(index_npy, index_json)
+    if meta.get('axis') != AXIS or not meta['dates'] or available_day(max(file_dates)) > np.datetime64(meta['dates'][-1], 'D'):
+        return None
+    axis = np.array(meta['dates'], dtype='datetime64[D]')
+    fresh = asof(file_dates, axis)['fresh']
+    rows = {code: i for i, (f, code) in enumerate(meta['pairs']) if f == fund}
+    trends = {}
+    for code in codes:
+        if code not in rows:
+            trends[code] = {'dates': [], 'weights': [], 'shares': []}
+            continue
+        series = np.asarray(traj[rows[code]], dtype=np.float64)
+        keep = fresh & (series[:, 1] > 0)
+        trends[code] = {
+            'dates': [str(d) for d in axis[keep]],
+            'weights': series[keep, 0].round(4).tolist(),
+            'shares': series[keep, 1].astype(np.int64).tolist(),
+        }
+    return trends
+
+def stream_trends(codes, dated_files):
+    """
+    沒有可用的軌跡索引時：再串流讀一次每日 CSV，只收集 codes (最新持股) 這幾檔的序列。
+    日期與索引相同，以看得到該檔案的交易日表示 (週末檔算下週一，同一天有多份時取較晚的)。
+    """
+    wanted = set(codes)
+    series = {code: {} for code in codes}
+    for report_date, file_path in dated_files:
+        try:
+            df = pd.read_csv(file_path, dtype={'股票代號': str})
+            df.columns = [c.strip() for c in df.columns]
+            df = df[['股票代號', '股數', '權重(%)']]
+        except Exception:
+            continue
+        day = str(available_day(report_date.strftime('%Y-%m-%d')))
+        held = df[df['股票代號'].astype(str).str.strip().isin(wanted) & (df['股數'] > 0)]
+        for code, shares, weight in zip(held['股票代號'].astype(str).str.strip(), held['股數'], held['權重(%)']):
+            series[code][day] = (round(float(weight), 4), int(shares))
+    return {code: {'dates': sorted(points),
+                   'weights': [points[d][0] for d in sorted(points)],
+                   'shares': [points[d][1] for d in sorted(points)]}
+            for code, points in series.items()}
+
+def stream_etf_holdings(csv_folder_path, output_html="ana981a.html", fund="981a"):
+    """
+    串流模式：依日期逐一讀取每日 CSV，每檔股票只保留固定大小的累計值
+    (首次出現日、最新名稱 / 股數 / 權重、區間內的加碼日期)，不把整段歷史 concat 成一張大表，
+    記憶體用量只和股票檔數成正比。趨勢圖改從軌跡索引 (trajectories.npy) 取最新持股那幾列
+    (索引不能用時再串流一次，只收集那幾檔)。
+    """
+    if not os.path.exists(csv_folder_path):
+        print(f"錯誤：找不到資料夾 {csv_folder_path}")
+        return
+
+    dated_files = list_dated_files(csv_folder_path)
+    if not dated_files:
+        print(f"在 {csv_folder_path} 路徑下找不到任何 CSV 檔案。")
+        return
+
+    # 日期節點只需要檔名就能決定，不必先讀完資料
+    latest_date, past_date = pick_date_window([d for d, _ in dated_files])
+    days_diff = (latest_date - past_date).days
+
+    # 每檔股票的累計狀態: 代號 -> dict (大小固定，不隨日期數增加)
+    states = {}
+    past_snapshot = {}
+    latest_codes = set()
+
+    for report_date, file_path in dated_files:
+        try:
+            df = pd.read_csv(file_path, dtype={'股票代號': str})
+            df.columns = [c.strip() for c in df.columns]
+            df = df[['股票代號', '股票名稱', '股數', '權重(%)']]
+        except Exception as e:
+            print(f"讀取檔案 {os.path.basename(file_path)} 失敗: {e}")
+            continue
+
+        in_window = report_date >= past_date
+        is_latest = report_date == latest_date
+        is_past = report_date == past_date
+
+        codes = df['股票代號'].astype(str).str.strip().tolist()
+        names = df['股票名稱'].astype(str).str.strip().tolist()
+        for code, name, shares, weight in zip(codes, names, df['股數'].tolist(), df['權重(%)'].tolist()):
+            state = states.get(code)
+            if state is None:
+                # 首次出現且股數大於零視為買入
+                bought = shares > 0
+                state = states[code] = {'first_date': report_date, 'buy_dates': set()}
+            else:
+                bought = shares > state['last_shares']
+
+            state['name'] = name
+            state['last_shares'] = shares
+            state['last_weight'] = weight
+            if in_window and bought:
+                state['buy_dates'].add(report_date.strftime('%m/%d'))
+
+            if is_past:
+                past_snapshot[code] = (weight, shares)
+            if is_latest:
+                latest_codes.add(code)
+
+    if not latest_codes:
+        print("最新日期的檔案無法讀取，無法產生報告。")
+        return
+
+    # 5. 重點變動分析 (Top 10)
+    rows = []
+    for code in latest_codes | set(past_snapshot):
+        state = states[code]
+        held_now = code in latest_codes
+        w_new = state['last_weight'] if held_now else 0
+        w_old, s_old = past_snapshot.get(code, (0, 0))
+        buy_dates = ', '.join(sorted(state['buy_dates'])) or '無變動'
+        rows.append({
+            '股票代號': code,
+            '股票名稱': state['name'],
+            '股數_新': state['last_shares'] if held_now else 0,
+            '權重(%)_新': w_new,
+            '權重(%)_舊': w_old,
+            '股數_舊': s_old,
+            '權重變動': w_new - w_old,
+            '實際買入日期(加碼)': buy_dates,
+        })
+    comparison = pd.DataFrame(rows)
+    top_increase = comparison[comparison['權重變動'] > 0].sort_values(['權重變動', '股票代號'], ascending=[False, True]).head(10)
+    top_decrease = comparison[comparison['權重變動'] < 0].sort_values(['權重變動', '股票代號'], ascending=True).head(10)
+
+    # 6. 最新持股名單與趨勢
+    latest_holdings = pd.DataFrame([{
+        '股票代號': code,
+        '股票名稱': states[code]['name'],
+        '股數': states[code]['last_shares'],
+        '權重(%)': states[code]['last_weight'],
+        '首次買入日期': states[code]['first_date'],
+    } for code in latest_codes])
+    latest_holdings = latest_holdings.sort_values(['首次買入日期', '權重(%)', '股票代號'], ascending=[False, False, True])
+
+    with stage('trends'):
+        codes = latest_holdings['股票代號'].tolist()
+        trends = index_trends(codes, [d for d, _ in dated_files], fund)
+        if trends is None:
+            print("⚠️ 軌跡索引不存在或尚未更新到最新一天，改為串流讀取最新持股的趨勢")
+            trends = stream_trends(codes, dated_files)
+    trend_dict = {}
+    for code in latest_holdings['股票代號']:
+        state, trend = states[code], trends[code]
+        if not trend['dates']:
+            trend = {'dates': [latest_date.strftime('%Y-%m-%d')], 'weights': [state['last_weight']], 'shares': [state['last_shares']]}
+        trend_dict[code] = {'name': state['name'], **trend}
+    with stage('similar'):
+        attach_similar(trend_dict)
+    coarsen_trends(trend_dict, fund)
+
+    with stage('render'):
+        render_report(output_html, latest_date, days_diff, top_increase, top_decrease, latest_holdings, trend_dict)
+
 if __name__ == "__main__":
     # 自動搜尋 981a 資料夾，若無則搜尋目前路徑
     data_path = "981a" if os.path.exists("981a") else "."
-    analyze_etf_holdings(data_path)
+    # --stream: 逐日串流分析，適合歷史很長或多檔基金的資料夾
+    # --profile[=cprofile]：讀檔分析 / 相似走勢 / 輸出報表各自輸出火焰圖到 profiles/
+    if "--stream" in sys.argv[1:]:
+        run_profiled('ana981a', stream_etf_holdings, data_path)
+    else:
+        run_profiled('ana981a', analyze_etf_holdings, data_path)
@@ -0,0 +1,285 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from history import FUNDS, list_snapshots, load_snapshot
+from leadlag import flow_factor
+from stats import window_arrays
+from snapshot_store import atomic_write_bytes, atomic_write_text
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+ANOMALY_DIR = "anomaly"          # anomaly/<基金>.csv：異常變動紀錄；anomaly/<基金>_state.json：每檔股票的累計統計
+Z_THRESHOLD = 3.0                # 與該檔股票自己過去的變動相比，超過幾個標準差算異常
+MIN_HISTORY = 20                 # 至少累積幾次變動才開始判斷
+MIN_STD_SHARES = 0.005           # 股數變化標準差的下限 (0.5%)，從沒動過的股票不會因為一點點變化就被標成異常
+MIN_STD_WEIGHT = 0.02            # 權重變化標準差的下限 (百分點)
+REPORT_LIMIT = 5                 # 報表上列出幾筆
+
+FLAG_COLUMNS = ['日期', '股票代號', '股票名稱', '股數', '股數變化', '權重(%)', '主動變化(%)', '權重變化', 'z_股數', 'z_權重', '樣本數']
+STATE_FIELDS = ['n', 'mean_s', 'm2_s', 'mean_w', 'm2_w', 'shares', 'weight']
+
+# ==========================================
+# 每檔 (基金, 股票) 各自累計兩個變動的平均與變異數 (Welford)：
+#   主動變化 = 今日股數 / 昨日股數 ÷ 當天的申購買回規模因子 - 1 (與 leadlag.py 相同，扣掉整檔基金等比例的增減)
+#   權重變化 = 今日權重 - 昨日權重 (百分點)
+# 只有前後兩天都持有的股票才計入 (新進 / 出清本來就是事件，由 alerts.py 通知)。
+# 每天用「今天之前」的統計算 z 分數，再把今天的變動併入，成本 O(股票數)；
+# 狀態存成 JSON，保留最後一天與前一天兩份，同一天重跑取代快照時從前一天的狀態重算。
+# 全量重算把整段歷史排成 [日期, 股票] 陣列，逐日用同一個 Welford 更新 (每一步都是整列向量運算)，
+# 結果與逐日增量累計完全相同；不用 Σx² - n·平均² (股數變化的平均遠大於變異時會相消而失準)。
+# ==========================================
+
+def empty_block():
+    block = {'codes': np.array([], dtype=str)}
+    block.update({field: np.zeros(0) for field in STATE_FIELDS})
+    return block
+
+def _reindex(block, codes):
+    """把狀態對齊到新的股票代號集合 (新股票的統計為 0)"""
+    pos = np.searchsorted(block['codes'], codes)
+    pos = np.clip(pos, 0, max(len(block['codes']) - 1, 0))
+    hit = (block['codes'][pos] == codes) if len(block['codes']) else np.zeros(len(codes), dtype=bool)
+    out = {'codes': codes}
+    for field in STATE_FIELDS:
+        out[field] = np.where(hit, block[field][pos] if len(block['codes']) else 0.0, 0.0)
+    return out
+
+def _zscore(x, n, mean, m2, floor):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(m2 / np.maximum(n - 1, 1))
+        return np.where(n >= MIN_HISTORY, (x - mean) / np.maximum(std, floor), np.nan)
+
+def active_change(shares, prev):
+    """主動變化 (沿最後一軸為股票)；前後兩天沒有都持有的位置為 NaN"""
+    ratio, factor = flow_factor(shares, prev)
+    return ratio / factor - 1
+
+def welford(n, mean, m2, x, mask):
+    """把 mask 位置的 x 併入平均與 M2 (n 為併入後的樣本數)，回傳 (新平均, 新 M2)"""
+    d = np.where(mask, x - mean, 0.0)
+    new_mean = mean + np.where(mask, d / np.maximum(n, 1), 0.0)
+    return new_mean, m2 + np.where(mask, d * (x - new_mean), 0.0)
+
+def step(block, codes, shares, weights):
+    """
+    單日增量更新 (O(股票數))：回傳 (新狀態, 當天每檔股票的 dict of 陣列)。
+    codes 需已排序 (快照讀進來時排序)。
+    """
+    union = np.union1d(block['codes'], codes)
+    state = _reindex(block, union)
+    pos = np.searchsorted(union, codes)
+    cur_s = np.zeros(len(union))
+    cur_w = np.zeros(len(union))
+    cur_s[pos], cur_w[pos] = shares, weights
+
+    prev_s, prev_w = state['shares'], state['weight']
+    both = (prev_s > 0) & (cur_s > 0)
+    x_s = active_change(cur_s, prev_s) if len(union) else np.zeros(0)
+    x_w = cur_w - prev_w
+    z_s = _zscore(x_s, state['n'], state['mean_s'], state['m2_s'], MIN_STD_SHARES)
+    z_w = _zscore(x_w, state['n'], state['mean_w'], state['m2_w'], MIN_STD_WEIGHT)
+    day = {'codes': union, 'shares': cur_s, 'weight': cur_w, 'delta': cur_s - prev_s, 'x_s': x_s, 'x_w': x_w,
+           'z_s': np.where(both, z_s, np.nan), 'z_w': np.where(both, z_w, np.nan), 'n': state['n'].copy()}
+
+    # Welford：只併入前後兩天都持有的股票
+    n = state['n'] + both
+    for key, x in (('s', x_s), ('w', x_w)):
+        state[f'mean_{key}'], state[f'm2_{key}'] = welford(n, state[f'mean_{key}'], state[f'm2_{key}'], x, both)
+    state['n'] = n
+    state['shares'], state['weight'] = cur_s, cur_w
+    return state, day
+
+# ==========================================
+# 2. 全量重算 (整段歷史排成陣列，逐日 Welford)
+# ==========================================
+
+def expanding_before(x, mask):
+    """
+    每一天「之前」的樣本數、平均與 M2 (Σ(x-平均)²)，以及最後一天併入之後的 (樣本數, 平均, M2)；
+    x / mask: [日期, 股票]，迴圈只跑日期，與增量更新 (step) 用同一個 welford()。
+    """
+    cnt, mean, m2 = np.zeros(x.shape), np.zeros(x.shape), np.zeros(x.shape)
+    n, mu, acc = np.zeros(x.shape[1:]), np.zeros(x.shape[1:]), np.zeros(x.shape[1:])
+    for i in range(len(x)):
+        cnt[i], mean[i], m2[i] = n, mu, acc
+        n = n + mask[i]
+        mu, acc = welford(n, mu, acc, x[i], mask[i])
+    return cnt, mean, m2, (n, mu, acc)
+
+def full_history(frames):
+    """
+    回傳 (每天的 dict of 陣列 (第一份快照沒有前一天，不含在內), 最後一天之後的狀態, 前一天之後的狀態)。
+    """
+    codes, shares, weights = window_arrays(frames)
+    prev_s, prev_w = np.zeros_like(shares), np.zeros_like(weights)
+    prev_s[1:], prev_w[1:] = shares[:-1], weights[:-1]
+    both = (prev_s > 0) & (shares > 0)
+    x_s = active_change(shares, prev_s)
+    x_w = weights - prev_w
+    both[0] = False
+
+    cnt, mean_s, m2_s, final_s = expanding_before(x_s, both)
+    _, mean_w, m2_w, final_w = expanding_before(x_w, both)
+    z_s = np.where(both, _zscore(x_s, cnt, mean_s, m2_s, MIN_STD_SHARES), np.nan)
+    z_w = np.where(both, _zscore(x_w, cnt, mean_w, m2_w, MIN_STD_WEIGHT), np.nan)
+    days = [{'codes': codes, 'shares': shares[i], 'weight': weights[i], 'delta': shares[i] - prev_s[i], 'x_s': x_s[i], 'x_w': x_w[i],
+             'z_s': z_s[i], 'z_w': z_w[i], 'n': cnt[i].astype(np.float64)} for i in range(1, len(frames))]
+
+    def state_after(i, n, stat_s, stat_w):
+        """第 i 天併入之後的狀態"""
+        return {'codes': codes, 'n': n, 'shares': shares[i], 'weight': weights[i],
+                'mean_s': stat_s[0], 'm2_s': stat_s[1], 'mean_w': stat_w[0], 'm2_w': stat_w[1]}
+
+    last = len(frames) - 1
+    cur = state_after(last, final_s[0], final_s[1:], final_w[1:])
+    # 前一天併入之後 = 最後一天之前的統計
+    base = state_after(last - 1, cnt[last], (mean_s[last], m2_s[last]), (mean_w[last], m2_w[last])) if last > 0 else empty_block()
+    return days, cur, base
+
+# ==========================================
+# 3. 異常清單與狀態檔
+# ==========================================
+
+def flag_rows(day_str, day, names):
+    """一天的結果 -> 異常列 (DataFrame)，依 |z| 由大到小"""
+    z = np.fmax(np.abs(day['z_s']), np.abs(day['z_w']))
+    hit = np.nonzero(np.nan_to_num(z) >= Z_THRESHOLD)[0]
+    hit = hit[np.argsort(-z[hit], kind='stable')]
+    codes = day['codes'][hit]
+    return pd.DataFrame({
+        '日期': day_str, '股票代號': codes, '股票名稱': [names.get(c, c) for c in codes],
+        '股數': day['shares'][hit].astype(np.int64), '股數變化': day['delta'][hit].astype(np.int64),
+        '權重(%)': day['weight'][hit].round(4),
+        '主動變化(%)': (day['x_s'][hit] * 100).round(2), '權重變化': day['x_w'][hit].round(4),
+        'z_股數': day['z_s'][hit].round(2), 'z_權重': day['z_w'][hit].round(2),
+        '樣本數': day['n'][hit].astype(np.int64),
+    }, columns=FLAG_COLUMNS)
+
+def flags_path(fund):
+    return os.path.join(ANOMALY_DIR, f"{fund}.csv")
+
+def state_path(fund):
+    return os.path.join(ANOMALY_DIR, f"{fund}_state.json")
+
+def _block_to_json(block):
+    out = {'codes': block['codes'].tolist()}
+    out.update({field: block[field].tolist() for field in STATE_FIELDS})
+    return out
+
+def _block_from_json(raw):
+    block = {'codes': np.array(raw['codes'], dtype=str)}
+    block.update({field: np.array(raw[field], dtype=np.float64) for field in STATE_FIELDS})
+    return block
+
+def load_state(fund):
+    path = state_path(fund)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return {'as_of': raw['as_of'], 'base_date': raw['base_date'],
+            'cur': _block_from_json(raw['cur']), 'base': _block_from_json(raw['base'])}
+
+def save_state(fund, as_of, cur, base_date, base):
+    state = {'as_of': as_of, 'base_date': base_date, 'cur': _block_to_json(cur), 'base': _block_to_json(base)}
+    atomic_write_text(state_path(fund), json.dumps(state, ensure_ascii=False))
+
+def load_flags(fund):
+    path = flags_path(fund)
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype={'日期': str, '股票代號': str})
+
+# ==========================================
+# 4. 更新
+# ==========================================
+
+def _concat_flags(frames):
+    """合併異常列；沒有異常的日子 (空表) 先去掉，全部為空時回傳只有欄位的空表"""
+    frames = [df for df in frames if not df.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FLAG_COLUMNS)
+
+def update_fund(fund, rebuild=False):
+    """
+    有狀態檔時只處理「前一天之後」的快照 (最後一天一律重算)，每天 O(股票數)；
+    沒有狀態檔或 rebuild=True 時整段歷史一次向量化重算。回傳處理的天數。
+    """
+    snapshots = list_snapshots(fund)
+    if not snapshots:
+        return 0
+    days = [d.strftime('%Y-%m-%d') for d, _ in snapshots]
+    state = None if rebuild else load_state(fund)
+    existing = None if rebuild else load_flags(fund)
+
+    if state is None or existing is None:
+        frames = [load_snapshot(p, fund, resolve=False) for _, p in snapshots]
+        results, cur, base = full_history(frames)
+        flags = [flag_rows(day, result, dict(zip(df['股票代號'], df['股票名稱'])))
+                 for day, result, df in zip(days[1:], results, frames[1:])]
+        table = _concat_flags(flags)
+        done = len(snapshots)
+    else:
+        # 從「前一天之後」的狀態接著算：最後一天 (as_of) 一律重算，同一天重跑取代快照時結果跟著更新
+        start = state['base_date'] or ''
+        todo = [(day, path) for day, (_, path) in zip(days, snapshots) if day > start]
+        if not todo:
+            return 0
+        cur = base = state['base']
+        flags = []
+        for day, path in todo:
+            df = load_snapshot(path, fund, resolve=False).sort_values('股票代號')
+            base = cur
+            cur, result = step(cur, df['股票代號'].to_numpy(str), df['股數'].to_numpy(np.float64),
+                               df['權重(%)'].to_numpy(np.float64))
+            flags.append(flag_rows(day, result, dict(zip(df['股票代號'], df['股票名稱']))))
+        kept = existing[existing['日期'] < todo[0][0]]
+        table = _concat_flags([kept] + flags)
+        done = len(todo)
+
+    os.makedirs(ANOMALY_DIR, exist_ok=True)
+    base_date = days[-2] if len(days) > 1 else None
+    save_state(fund, days[-1], cur, base_date, base)
+    atomic_write_bytes(flags_path(fund), table[FLAG_COLUMNS].to_csv(index=False).encode("utf-8-sig"))
+    return done
+
+def flags_on(table, day, top=REPORT_LIMIT):
+    """
+    某一天 |z| 最大的幾筆異常 (list of dict)，給報表用；top=None 時全部 (通知用)。
+    每筆多一個 z：股數 / 權重兩者中絕對值較大的 z 分數。
+    """
+    if table is None or table.empty:
+        return []
+    return _with_z(table[table['日期'] == day].head(top))
+
+def flags_by_day(table, days=None, top=REPORT_LIMIT):
+    """每一天 (或只取 days 這幾天) 的 flags_on() (dict: 日期 -> list)，重建歷史報表時整張表只分組一次"""
+    if table is None or table.empty:
+        return {}
+    if days is not None:
+        table = table[table['日期'].isin(days)]
+    return {day: _with_z(rows.head(top)) for day, rows in table.groupby('日期', sort=False)}
+
+def _with_z(rows):
+    rows = rows.to_dict('records')
+    for row in rows:
+        row['z'] = max((row['z_股數'], row['z_權重']), key=lambda v: -1 if pd.isna(v) else abs(v))
+    return rows
+
+def latest_flags(fund, top=REPORT_LIMIT):
+    state = load_state(fund)
+    return flags_on(load_flags(fund), state['as_of'], top) if state else []
+
+def update_anomaly(funds=None, rebuild=False):
+    for fund in funds or FUNDS:
+        done = update_fund(fund, rebuild)
+        flags = latest_flags(fund, top=None)
+        print(f"   {fund}: 處理 {done} 天，最新一天 {len(flags)} 筆異常" if done else f"   {fund}: 無新資料")
+    print(f"✅ 異常變動已更新: {ANOMALY_DIR}/ (|z| ≥ {Z_THRESHOLD:g}，至少 {MIN_HISTORY} 次變動)")
+
+if __name__ == "__main__":
+    import sys
+    update_anomaly(rebuild="--rebuild" in sys.argv[1:])
@@ -0,0 +1,162 @@
+import os
+import json
+import hashlib
+
+import pandas as pd
+
+from funds import REGISTRY
+from history import FUNDS, list_snapshots, load_snapshot, diff_snapshots
+from snapshot_store import atomic_write_text
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+API_DIR = "api"      # 靜態 JSON API 的根目錄 (GitHub Pages 上的網址即 <站台>/api/...)
+SCHEMA = 1           # 欄位有不相容的改動時才加一，下游可以依此判斷
+
+# 檔案配置：
+#   api/latest.json                每檔基金最新一天的檔案位置與 sha256 (很小，輪詢這個就好)
+#   api/<基金>/index.json          該基金所有日期，各自附上快照 / 差異檔的 sha256
+#   api/<基金>/<日期>.json         當天完整持股 (發布後不再變動，可以永久快取)
+#   api/<基金>/<日期>.diff.json    與前一份快照比較的異動 (new / exit / up / down)
+# 所有檔案以固定的鍵順序與格式輸出，同樣的資料永遠得到同樣的位元組與 sha256。
+
+# ==========================================
+# 2. 文件格式
+# ==========================================
+
+def _dumps(doc):
+    return json.dumps(doc, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+def _number(value):
+    """整數股數輸出成整數，其餘四捨五入到小數 4 位；缺值 (出清的權重) 為 null"""
+    if pd.isna(value):
+        return None
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 4)
+
+def snapshot_doc(fund, day, df):
+    df = df.sort_values('股票代號', kind='stable')
+    return {
+        'schema': SCHEMA, 'fund': fund, 'date': day,
+        'holdings': [{'code': code, 'name': name, 'shares': _number(shares), 'weight': _number(weight)}
+                     for code, name, shares, weight in zip(df['股票代號'], df['股票名稱'], df['股數'], df['權重(%)'])],
+    }
+
+def diff_doc(fund, day, base_day, diff):
+    """base 為比較基準的日期；第一份快照沒有基準，所有持股的 kind 都是 first"""
+    diff = diff[diff['變動'] != 'same']
+    return {
+        'schema': SCHEMA, 'fund': fund, 'date': day, 'base': base_day,
+        'changes': [{'code': code, 'name': name, 'kind': kind, 'shares': _number(shares),
+                     'shares_prev': _number(prev), 'change': _number(change), 'weight': _number(weight)}
+                    for code, name, kind, shares, prev, change, weight in
+                    zip(diff['股票代號'], diff['股票名稱'], diff['變動'], diff['股數'],
+                        diff['股數_old'], diff['股數變化'], diff['權重(%)'])],
+    }
+
+def publish(path, doc):
+    """寫出一份文件，回傳 (sha256, 狀態)；狀態為 new / same / replaced (內容與已發布的不同)"""
+    text = _dumps(doc)
+    sha = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    status = 'new'
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            status = 'same' if f.read() == text else 'replaced'
+    if status != 'same':
+        atomic_write_text(path, text)
+    return sha, status
+
+# ==========================================
+# 3. 增量發布
+# ==========================================
+
+def fund_dir(fund):
+    return os.path.join(API_DIR, fund)
+
+def load_index(fund):
+    path = os.path.join(fund_dir(fund), "index.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def update_fund(fund, rebuild=False):
+    """
+    只發布還沒有檔案的日期；最後一天也一律重新產生 (同一天重跑取代了快照時跟著更新，
+    並在 index 留下新的 sha256)。更早的日期發布後就不再讀取。
+    rebuild=True 時整段歷史重新產生 (格式沒變時檔案內容不變，只是重新驗證)。
+    回傳 (index, 重新產生的天數, 內容被改寫的日期)。
+    """
+    snapshots = list_snapshots(fund)
+    index = None if rebuild else load_index(fund)
+    known = {e['date']: e for e in index['dates']} if index and index.get('schema') == SCHEMA else {}
+    days = [d.strftime('%Y-%m-%d') for d, _ in snapshots]
+
+    last_known = max((i for i, day in enumerate(days) if day in known), default=-1)
+    todo = [i for i, day in enumerate(days) if day not in known or i == last_known]
+
+    os.makedirs(fund_dir(fund), exist_ok=True)
+    frames = {}
+    def frame(i):
+        if i not in frames:
+            frames[i] = load_snapshot(snapshots[i][1], fund, resolve=False)
+        return frames[i]
+
+    replaced = []
+    for i in todo:
+        day = days[i]
+        df = frame(i)
+        base = frame(i - 1) if i > 0 else None
+        diff = diff_snapshots(df, base)
+        sha, status = publish(os.path.join(fund_dir(fund), f"{day}.json"), snapshot_doc(fund, day, df))
+        diff_sha, diff_status = publish(os.path.join(fund_dir(fund), f"{day}.diff.json"),
+                                        diff_doc(fund, day, days[i - 1] if i > 0 else None, diff))
+        if 'replaced' in (status, diff_status):
+            replaced.append(day)
+        known[day] = {'date': day, 'sha256': sha, 'diff_sha256': diff_sha,
+                      'holdings': len(df), 'changes': int((diff['變動'] != 'same').sum())}
+        frames.pop(i - 1, None)
+
+    index = {'schema': SCHEMA, 'fund': fund, 'name': REGISTRY[fund]['name'],
+             'dates': [known[day] for day in days if day in known]}
+    publish(os.path.join(fund_dir(fund), "index.json"), index)
+    return index, len(todo), replaced
+
+def latest_entry(fund, index):
+    path = os.path.join(fund_dir(fund), "index.json")
+    with open(path, "rb") as f:
+        index_sha = hashlib.sha256(f.read()).hexdigest()
+    last = index['dates'][-1]
+    return {
+        'date': last['date'],
+        'snapshot': f"{fund}/{last['date']}.json", 'sha256': last['sha256'],
+        'diff': f"{fund}/{last['date']}.diff.json", 'diff_sha256': last['diff_sha256'],
+        'index': f"{fund}/index.json", 'index_sha256': index_sha,
+    }
+
+def update_api(funds=None, rebuild=False):
+    latest_path = os.path.join(API_DIR, "latest.json")
+    latest = {'schema': SCHEMA, 'funds': {}}
+    if os.path.exists(latest_path) and not rebuild:
+        with open(latest_path, encoding='utf-8') as f:
+            latest = json.load(f)
+
+    for fund in funds or FUNDS:
+        index, added, replaced = update_fund(fund, rebuild)
+        if not index['dates']:
+            print(f"   {fund}: 沒有任何快照")
+            continue
+        latest['funds'][fund] = latest_entry(fund, index)
+        print(f"   {fund}: {len(index['dates'])} 天，本次產生 {added} 天" if added else f"   {fund}: 無新資料")
+        for day in replaced:
+            print(f"   ⚠️ {fund} {day}: 內容與已發布的不同 (同日重跑取代了快照)，已覆寫並更新 sha256")
+
+    latest['schema'] = SCHEMA
+    publish(latest_path, latest)
+    print(f"✅ 靜態 JSON API 已更新: {API_DIR}/latest.json")
+    return latest
+
+if __name__ == "__main__":
+    import sys
+    update_api(rebuild="--rebuild" in sys.argv[1:])
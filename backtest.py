@@ -0,0 +1,244 @@
+import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from panel import build_panel
+from flows import build_prices, PRICE_CSV
+from leadlag import flow_factor
+from snapshot_store import atomic_write_text
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+OUTPUT_DIR = "backtest"            # backtest/<基金>_<權重方式>_d<延遲>.csv (單次) / sweep.csv (參數掃描)
+DELAY = 1                          # 揭露後第幾個交易日收盤跟單 (持股晚上才公布，最快隔天)
+SCHEME = 'mirror'
+SCHEMES = {
+    'mirror': '照基金揭露的權重 (多檔基金取平均)',
+    'equal': '基金持有的股票等權重',
+    'accumulate': '近期主動買超金額加權 (扣掉申購買回的等比例增減)',
+}
+LOOKBACK = 20                      # accumulate：累計最近幾個交易日的主動買超
+MAX_WEIGHT = 0.10                  # 單一個股權重上限，超出的部分留在現金
+FEE_RATE = 0.001425                # 手續費 (買賣各收一次)
+TAX_RATE = 0.003                   # 證交稅 (賣出)
+SLIPPAGE = 0.0005                  # 滑價 (買賣各算一次)
+TRADING_DAYS = 252
+
+SWEEP_DELAYS = (1, 2, 3, 5)
+SWEEP_MAX_WEIGHTS = (0.05, 0.10, 1.0)
+MAX_WORKERS = os.cpu_count() or 1
+
+SERIES_COLUMNS = ['日期', '日報酬(%)', '淨值', '回撤(%)', '換手率(%)', '交易成本(%)', '無價格權重(%)']
+
+# ==========================================
+# 2. 輸入：交易日軸上的持股、權重與個股報酬 (陣列皆為 [基金, 交易日, 股票] 或 [交易日, 股票])
+# ==========================================
+
+def load_inputs(price_csv=PRICE_CSV):
+    """
+    價格以自備價格檔為主 (flows.py 的 prices.csv)，其次用快照推得的價格；
+    沒有價格的股票報酬視為 0，並在結果中記錄這部分權重 (無價格權重)。
+    """
+    panel = build_panel()
+    prices = build_prices(panel, price_csv)
+
+    returns = np.full_like(prices, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = prices[1:] / prices[:-1] - 1
+    return {'funds': panel['funds'], 'days': panel['dates'], 'codes': panel['codes'],
+            'shares': panel['shares'], 'weights': panel['weights'].astype(np.float64), 'valid': panel['valid'],
+            'prices': prices, 'returns': returns}
+
+def active_value(shares, valid, prices):
+    """每天的主動買賣金額：股數變化扣掉申購買回的等比例增減後 × 價格 (沒有價格為 0)"""
+    prev = np.zeros_like(shares)
+    prev[:, 1:] = shares[:, :-1]
+    _, factor = flow_factor(shares, prev)
+    both = np.zeros_like(valid)
+    both[:, 1:] = valid[:, 1:] & valid[:, :-1]
+    active = np.where(both[:, :, None], shares - prev * factor, 0.0)
+    return np.nan_to_num(active * prices[None, :, :])
+
+# ==========================================
+# 3. 目標權重 [交易日, 股票]：第 t 天揭露的持股換算出的跟單權重 (合計 ≤ 1，其餘為現金)
+# ==========================================
+
+def _normalize(values):
+    total = values.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total > 0, values / np.where(total > 0, total, 1), 0.0)
+
+def target_weights(inputs, fund_idx, scheme=SCHEME, max_weight=MAX_WEIGHT, lookback=LOOKBACK):
+    shares = inputs['shares'][fund_idx]
+    held = (shares > 0).any(axis=0)
+
+    if scheme == 'mirror':
+        # 每檔基金先把股票部位換算成合計 100%，再對當天有資料的基金取平均
+        per_fund = _normalize(inputs['weights'][fund_idx])
+        n_valid = inputs['valid'][fund_idx].sum(axis=0)[:, None]
+        target = np.where(n_valid > 0, per_fund.sum(axis=0) / np.maximum(n_valid, 1), 0.0)
+    elif scheme == 'equal':
+        target = _normalize(held.astype(np.float64))
+    elif scheme == 'accumulate':
+        flow = active_value(shares, inputs['valid'][fund_idx], inputs['prices']).sum(axis=0)
+        cum = np.cumsum(flow, axis=0)
+        window = cum.copy()
+        window[lookback:] -= cum[:-lookback]
+        target = _normalize(np.where(held, np.clip(window, 0, None), 0.0))
+    else:
+        raise ValueError(f"未知的權重方式: {scheme} (可用: {', '.join(SCHEMES)})")
+    return np.minimum(target, max_weight)
+
+# ==========================================
+# 4. 模擬 (全部交易日 × 股票一次算完，沒有逐日迴圈)
+# ==========================================
+
+def simulate(target, returns, delay=DELAY, fee=FEE_RATE, tax=TAX_RATE, slippage=SLIPPAGE):
+    """
+    第 t 天揭露的目標權重在第 t+delay 天收盤調整完成，第 t+delay+1 天開始賺這個權重的報酬。
+    調整前的權重是前一天持股經過當天漲跌後的比例，買進收 手續費+滑價，賣出另收證交稅。
+    換手率 = (買進 + 賣出) / 2，占淨值比例。回傳每天一列的 dict。
+    """
+    n_t = len(target)
+    held = np.zeros_like(target)
+    if delay < n_t:
+        held[delay:] = target[:n_t - delay]
+
+    prev = np.zeros_like(held)
+    prev[1:] = held[:-1]
+    r = np.nan_to_num(returns)
+    gross = (prev * r).sum(axis=1)
+    drift = prev * (1 + r) / (1 + gross)[:, None]
+
+    trade = held - drift
+    buy = np.clip(trade, 0, None).sum(axis=1)
+    sell = np.clip(-trade, 0, None).sum(axis=1)
+    cost = buy * (fee + slippage) + sell * (fee + tax + slippage)
+
+    net = (1 + gross) * (1 - cost) - 1
+    nav = np.cumprod(1 + net)
+    drawdown = nav / np.maximum.accumulate(nav) - 1
+    return {
+        'return': net, 'nav': nav, 'drawdown': drawdown,
+        'turnover': (buy + sell) / 2, 'cost': cost,
+        'unpriced': (prev * np.isnan(returns)).sum(axis=1),
+    }
+
+def summarize(result):
+    net = result['return']
+    years = len(net) / TRADING_DAYS
+    vol = net.std(ddof=1) * np.sqrt(TRADING_DAYS) if len(net) > 1 else np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = net.mean() * TRADING_DAYS / vol
+    return {
+        '總報酬(%)': round((result['nav'][-1] - 1) * 100, 2),
+        '年化報酬(%)': round((result['nav'][-1] ** (1 / years) - 1) * 100, 2) if years > 0 else np.nan,
+        '年化波動(%)': round(vol * 100, 2),
+        'Sharpe': round(sharpe, 2),
+        '最大回撤(%)': round(result['drawdown'].min() * 100, 2),
+        '平均日換手(%)': round(result['turnover'].mean() * 100, 2),
+        '累計成本(%)': round(result['cost'].sum() * 100, 2),
+        '平均無價格權重(%)': round(result['unpriced'].mean() * 100, 2),
+    }
+
+def series_frame(days, result):
+    return pd.DataFrame({
+        '日期': [str(d) for d in days],
+        '日報酬(%)': (result['return'] * 100).round(4),
+        '淨值': result['nav'].round(6),
+        '回撤(%)': (result['drawdown'] * 100).round(4),
+        '換手率(%)': (result['turnover'] * 100).round(4),
+        '交易成本(%)': (result['cost'] * 100).round(4),
+        '無價格權重(%)': (result['unpriced'] * 100).round(4),
+    })[SERIES_COLUMNS]
+
+# ==========================================
+# 5. 參數掃描 (process pool；輸入陣列在 worker 啟動時傳一次，每個組合只傳參數)
+# ==========================================
+
+_inputs = None
+
+def _init_worker(inputs):
+    global _inputs
+    _inputs = inputs
+
+def _fund_index(inputs, funds):
+    return [inputs['funds'].index(f) for f in funds]
+
+def run_one(params):
+    inputs = _inputs
+    target = target_weights(inputs, _fund_index(inputs, params['funds']), params['scheme'], params['max_weight'])
+    result = simulate(target, inputs['returns'], params['delay'])
+    return dict({'基金': '+'.join(params['funds']), '權重方式': params['scheme'],
+                 '延遲(交易日)': params['delay'], '單檔上限(%)': round(params['max_weight'] * 100, 2)},
+                **summarize(result))
+
+def sweep_grid(funds):
+    """預設掃描：每檔基金單獨 + 全部合併，× 權重方式 × 延遲 × 單檔上限"""
+    groups = [[f] for f in funds] + [list(funds)]
+    return [{'funds': g, 'scheme': s, 'delay': d, 'max_weight': w}
+            for g, s, d, w in itertools.product(groups, SCHEMES, SWEEP_DELAYS, SWEEP_MAX_WEIGHTS)]
+
+def run_sweep(inputs, grid, workers=MAX_WORKERS):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(inputs,)) as pool:
+        rows = list(pool.map(run_one, grid, chunksize=max(1, len(grid) // (workers * 4))))
+    return pd.DataFrame(rows).sort_values('Sharpe', ascending=False, kind='stable').reset_index(drop=True)
+
+# ==========================================
+# 6. 進入點
+# ==========================================
+
+def backtest(funds=None, scheme=SCHEME, delay=DELAY, max_weight=MAX_WEIGHT, price_csv=PRICE_CSV):
+    inputs = load_inputs(price_csv)
+    if len(inputs['days']) < 2:
+        print("歷史資料不足，無法回測。")
+        return None
+    funds = funds or inputs['funds']
+    target = target_weights(inputs, _fund_index(inputs, funds), scheme, max_weight)
+    result = simulate(target, inputs['returns'], delay)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    path = os.path.join(OUTPUT_DIR, f"{'+'.join(funds)}_{scheme}_d{delay}.csv")
+    atomic_write_text(path, series_frame(inputs['days'], result).to_csv(index=False), encoding="utf-8-sig")
+
+    print(f"✅ 回測完成: {path} ({inputs['days'][0]} ~ {inputs['days'][-1]}，{SCHEMES[scheme]}，延遲 {delay} 個交易日)")
+    for key, value in summarize(result).items():
+        print(f"   {key}: {value}")
+    return result
+
+def sweep(funds=None, workers=MAX_WORKERS, price_csv=PRICE_CSV):
+    inputs = load_inputs(price_csv)
+    if len(inputs['days']) < 2:
+        print("歷史資料不足，無法回測。")
+        return None
+    grid = sweep_grid(funds or inputs['funds'])
+    table = run_sweep(inputs, grid, workers)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    path = os.path.join(OUTPUT_DIR, "sweep.csv")
+    atomic_write_text(path, table.to_csv(index=False), encoding="utf-8-sig")
+    print(f"✅ 參數掃描完成: {path} ({len(grid)} 組參數，{workers} 個 process)")
+    print(table.head(10).to_string(index=False))
+    return table
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="跟單回測：照基金揭露的持股建立自己的投資組合")
+    parser.add_argument("--funds", help="逗號分隔的基金代號 (預設全部合併)")
+    parser.add_argument("--scheme", choices=list(SCHEMES), default=SCHEME, help="跟單權重方式")
+    parser.add_argument("--delay", type=int, default=DELAY, help="揭露後第幾個交易日收盤跟單")
+    parser.add_argument("--max-weight", type=float, default=MAX_WEIGHT, help="單一個股權重上限 (0~1)")
+    parser.add_argument("--prices", default=PRICE_CSV, help="自備日收盤價 (欄位: 日期, 股票代號, 收盤價)")
+    parser.add_argument("--sweep", action="store_true", help="掃描所有基金 / 權重方式 / 延遲 / 上限的組合")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="參數掃描的 process 數")
+    args = parser.parse_args()
+
+    funds = args.funds.split(",") if args.funds else None
+    if args.sweep:
+        sweep(funds, args.workers, args.prices)
+    else:
+        backtest(funds, args.scheme, args.delay, args.max_weight, args.prices)
@@ -0,0 +1,292 @@
+import os
+import io
+import gzip
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+from funds import REGISTRY, FUNDS
+from history import list_snapshots, load_snapshot
+from secmaster import name_of
+from snapshot_store import atomic_write_bytes
+from stats import load_stats, stats_path
+from sectors import COHORT_CSV, SECTOR_COLUMN
+from align import trading_axis, align_funds
+
+try:
+    import brotli
+except ImportError:  # 沒裝 brotli 時只產生 gzip 版本
+    brotli = None
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+SITE_DIR = "site"
+DATA_DIR = os.path.join(SITE_DIR, "data")   # 頁面讀取的二進位資料檔: site/data/<名稱>.bin (+ .gz / .br)
+MAGIC = b"ETFB"
+ALIGN = 8                # 每個欄位的起點對齊 8 bytes，瀏覽器可直接建 TypedArray
+WEIGHT_SCALE = 10000     # 權重 (%) 存成 整數 / 10000，小數第 4 位以下本來就是雜訊
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+# 頁面本身也在旁邊放 .gz / .br (靜態伺服器有開 precompressed 時直接送出)
+PAGES = ['total.html', 'ana981a.html'] + [cfg['html'] for cfg in REGISTRY.values()]
+
+# ==========================================
+# 2. 欄式二進位格式
+# ==========================================
+# 檔案 = "ETFB" + uint32 表頭長度 + JSON 表頭 + 各欄位資料 (little-endian，起點對齊 8 bytes)
+# 表頭每個欄位: name / dtype / shape / offset / byteLength，再加上解碼方式：
+#   values : 字典編碼，資料是 values 的索引 (股票代號、名稱、基金)
+#   delta  : 沿最後一軸存差分，解碼時累加 (日期、時間序列)
+#   varint : 整數以 zigzag + 7-bit 變長編碼存成 bytes (小的差分只佔 1 byte)，shape 為解碼後的形狀
+#   scale  : 整數 ÷ scale 還原成小數 (權重)
+#   date   : 整數為 1970-01-01 起的天數，解碼成 'YYYY-MM-DD'
+# 解碼器在 etfdata.js，頁面用 ETFData.load('site/data/<名稱>.bin') 讀取。
+
+def col_dict(values):
+    """字串欄位 -> 字典編碼 (索引用 uint8 / uint16 / uint32)"""
+    uniq, idx = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    dtype = np.uint8 if len(uniq) <= 0xFF else np.uint16 if len(uniq) <= 0xFFFF else np.uint32
+    return idx.astype(dtype), {'values': uniq.tolist()}
+
+def col_dates(dates):
+    """日期 -> 天數差分 (日期幾乎都是遞增的小間隔，差分後多半存成 1 byte)"""
+    days = (np.asarray(dates, dtype='datetime64[D]') - EPOCH).astype(np.int64)
+    return _varint(_delta(days)), {'shape': list(days.shape), 'varint': True, 'delta': True, 'date': True}
+
+def col_int(values, delta=False, scale=None):
+    """
+    數值 -> 整數 (可先乘 scale)，存成放得下的最小整數型別；delta=True 時沿最後一軸差分後存成 varint。
+    有 NaN、不是整數或超出 int32 範圍時改存 float64 原值。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scaled = np.round(values * scale) if scale else values
+    fits = (np.isfinite(scaled).all() and np.abs(scaled).max(initial=0) < 2 ** 30
+            and (scale or np.array_equal(scaled, np.round(scaled))))
+    if not fits:
+        return values, {}
+    ints = scaled.astype(np.int64)
+    opts = {'scale': scale} if scale else {}
+    if delta:
+        return _varint(_delta(ints)), {'shape': list(ints.shape), 'varint': True, 'delta': True, **opts}
+    return _narrow(ints), opts
+
+def col_float(values):
+    """有 NaN 的比率類數字 (重疊度、換手率) 直接存 float32"""
+    return np.asarray(values, dtype=np.float32), {}
+
+def _delta(ints):
+    out = ints.copy()
+    out[..., 1:] = np.diff(ints, axis=-1)
+    return out
+
+def _varint(ints):
+    """
+    int64 -> zigzag (0, -1, 1, -2 ... -> 0, 1, 2, 3 ...) -> 每 byte 7 bits、最高位元表示後面還有 (LEB128)。
+    全部向量化：先算每個數要幾個 byte，再把 [數值, byte] 矩陣中用得到的格子依序攤平。
+    """
+    v = ints.ravel().astype(np.int64)
+    zz = ((v << 1) ^ (v >> 63)).astype(np.uint64)
+    n_bytes = np.maximum(1, (np.floor(np.log2(np.maximum(zz, 1).astype(np.float64))).astype(np.int64) // 7) + 1)
+    n_bytes = np.where(zz == 0, 1, n_bytes)
+    width = int(n_bytes.max(initial=1))
+    k = np.arange(width, dtype=np.uint64)
+    groups = ((zz[:, None] >> (np.uint64(7) * k)) & np.uint64(0x7F)).astype(np.uint8)
+    more = k[None, :] < (n_bytes[:, None] - 1).astype(np.uint64)
+    groups |= np.where(more, 0x80, 0).astype(np.uint8)
+    return groups[k[None, :] < n_bytes[:, None].astype(np.uint64)]
+
+def _narrow(ints):
+    """int8 / int16 / int32 中放得下的最小型別"""
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if ints.size == 0 or (ints.min() >= info.min and ints.max() <= info.max):
+            return ints.astype(dtype)
+    raise ValueError("整數超出 int32 範圍")
+
+DTYPES = {'uint8': 'u8', 'uint16': 'u16', 'uint32': 'u32', 'int8': 'i8', 'int16': 'i16', 'int32': 'i32',
+          'float32': 'f32', 'float64': 'f64'}
+
+def encode(columns, meta=None):
+    """columns: {名稱: (ndarray, 解碼選項)} -> bytes"""
+    header, blobs, offset = [], [], 0
+    for name, (data, opts) in columns.items():
+        data = np.ascontiguousarray(data)
+        raw = data.astype(data.dtype.newbyteorder('<'), copy=False).tobytes()
+        header.append({'name': name, 'dtype': DTYPES[data.dtype.name], 'shape': list(data.shape),
+                       'offset': offset, 'byteLength': len(raw), **opts})   # opts 的 shape (varint) 蓋過 bytes 長度
+        pad = -len(raw) % ALIGN
+        blobs.append(raw + b"\0" * pad)
+        offset += len(raw) + pad
+
+    head = json.dumps({'columns': header, 'meta': meta or {}}, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+    head += b" " * (-(len(MAGIC) + 4 + len(head)) % ALIGN)
+    return MAGIC + struct.pack("<I", len(head)) + head + b"".join(blobs)
+
+def precompress(data):
+    """-> {副檔名: 內容}；gzip 不寫時間戳，同樣的資料每次產生的檔案一模一樣"""
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=9, mtime=0) as f:
+        f.write(data)
+    variants = {'.gz': buf.getvalue()}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return variants
+
+def write_with_variants(path, data):
+    atomic_write_bytes(path, data)
+    sizes = {'': len(data)}
+    for ext, packed in precompress(data).items():
+        atomic_write_bytes(path + ext, packed)
+        sizes[ext] = len(packed)
+    return sizes
+
+def write_asset(name, columns, meta=None, data_dir=DATA_DIR):
+    """寫出 <data_dir>/<name>.bin 與壓縮版本，回傳各版本大小"""
+    os.makedirs(data_dir, exist_ok=True)
+    return write_with_variants(os.path.join(data_dir, f"{name}.bin"), encode(columns, meta))
+
+# ==========================================
+# 3. 各份資料 (來源都是其他腳本已經產生的輸出，這裡只負責換格式)
+# ==========================================
+
+def holdings_asset():
+    """
+    各基金在共同的最新交易日 as-of 的持股 (total.html 的交叉比對表)，取代直接比對各自最新的 CSV。
+    meta 記下每檔基金用的是哪一天的快照、沿用了幾個交易日；過期的基金頁面上不列入共識計數。
+    """
+    snapshots = {fund: list_snapshots(fund) for fund in FUNDS}
+    axis = trading_axis([d for snaps in snapshots.values() for d, _ in snaps])
+    if not len(axis):
+        return None, None, [REGISTRY[f]['baseline'] for f in FUNDS]
+    aligned = align_funds([[d for d, _ in snapshots[fund]] for fund in FUNDS], axis[-1:])
+
+    frames, funds, sources = [], {}, []
+    for fi, fund in enumerate(FUNDS):
+        if not aligned['valid'][fi, 0]:
+            continue
+        snap_date, path = snapshots[fund][aligned['pos'][fi, 0]]
+        frames.append(load_snapshot(path, fund).assign(基金=fund))
+        sources.append(path)
+        funds[fund] = {'date': snap_date.strftime('%Y-%m-%d'), 'age': int(aligned['age'][fi, 0]),
+                       'stale': bool(aligned['stale'][fi, 0])}
+    df = pd.concat(frames, ignore_index=True)
+    names = [name_of(code) or name for code, name in zip(df['股票代號'], df['股票名稱'])]
+    return {
+        'fund': col_dict(df['基金']),
+        'code': col_dict(df['股票代號']),
+        'name': col_dict(names),
+        'weight': col_int(df['權重(%)'], scale=WEIGHT_SCALE),
+    }, {'asof': str(axis[-1]), 'funds': funds}, sources
+
+def exposure_asset(path="exposure.json"):
+    """合計權重 / 合計股數時間序列：[股票, 日期] 矩陣沿日期差分"""
+    if not os.path.exists(path):
+        return None, None, path
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    codes = list(data['stocks'])
+    weight = np.array([data['stocks'][c]['weight'] for c in codes], dtype=np.float64).reshape(len(codes), -1)
+    shares = np.array([data['stocks'][c]['shares'] for c in codes], dtype=np.float64).reshape(len(codes), -1)
+    return {
+        'dates': col_dates(data['dates']),
+        'code': col_dict(codes),
+        'name': col_dict([data['stocks'][c]['name'] for c in codes]),
+        'weight': col_int(weight, delta=True, scale=WEIGHT_SCALE),
+        'shares': col_int(shares, delta=True),
+    }, None, path
+
+def overlap_asset(path="overlap.json"):
+    """重疊度：全體平均與兩兩基金的 Jaccard / 權重重疊"""
+    if not os.path.exists(path):
+        return None, None, path
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    series = lambda values: np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return {
+        'dates': col_dates(data['dates']),
+        'cohort_jaccard': col_float(series(data['cohort']['jaccard'])),
+        'cohort_weighted': col_float(series(data['cohort']['weighted'])),
+        'pair_jaccard': col_float(np.array([series(p['jaccard']) for p in data['pairs']]).reshape(len(data['pairs']), -1)),
+        'pair_weighted': col_float(np.array([series(p['weighted']) for p in data['pairs']]).reshape(len(data['pairs']), -1)),
+    }, {'funds': data['funds'], 'pairs': [[p['a'], p['b']] for p in data['pairs']]}, path
+
+def stats_asset():
+    """各基金每日組合統計 (stats.py 的 stats/<基金>.csv 串成一張長表)"""
+    sources = [stats_path(f) for f in FUNDS]
+    frames = [load_stats(f).assign(基金=f) for f in FUNDS if os.path.exists(stats_path(f))]
+    if not frames:
+        return None, None, sources
+    df = pd.concat(frames, ignore_index=True)
+    columns = {'fund': col_dict(df['基金']), 'date': col_dates(df['日期'])}
+    for name in df.columns.drop(['基金', '日期']):
+        columns[name] = col_float(df[name].astype('float64'))
+    return columns, None, sources
+
+def sectors_asset():
+    """全體基金每日族群曝險 (sectors.py 的 sectors/all.csv，長表)"""
+    if not os.path.exists(COHORT_CSV):
+        return None, None, [COHORT_CSV]
+    df = pd.read_csv(COHORT_CSV, dtype={'日期': str, SECTOR_COLUMN: str})
+    columns = {'date': col_dates(df['日期']), 'sector': col_dict(df[SECTOR_COLUMN]),
+               '合計權重(%)': col_int(df['合計權重(%)'], scale=WEIGHT_SCALE)}
+    for name in ('持有基金數', '加碼基金數', '減碼基金數'):
+        columns[name] = col_int(df[name])
+    return columns, {'column': SECTOR_COLUMN}, [COHORT_CSV]
+
+def trends_asset(trend_dict):
+    """
+    ana981a.py 的單股趨勢 ({代號: {name, dates, weights, shares, similar}}) 攤成一張長表，
+    每檔股票的日期 / 權重 / 股數各自接續差分；名稱與相似走勢放在 meta。
+    """
+    codes = list(trend_dict)
+    lengths = [len(trend_dict[c]['dates']) for c in codes]
+    flat = lambda key: [v for c in codes for v in trend_dict[c][key]]
+    columns = {
+        'code': col_dict(np.repeat(np.array(codes, dtype=str), lengths)),
+        'date': col_dates(flat('dates')),
+        'weight': col_int(flat('weights'), delta=True, scale=WEIGHT_SCALE),
+        'shares': col_int(flat('shares'), delta=True),
+    }
+    meta = {'order': codes,
+            'names': {c: trend_dict[c]['name'] for c in codes},
+            'similar': {c: trend_dict[c].get('similar', []) for c in codes}}
+    return columns, meta
+
+# ==========================================
+# 4. 整站輸出
+# ==========================================
+
+def _source_size(paths):
+    paths = [paths] if isinstance(paths, str) else paths
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+def build_site():
+    builders = {'holdings': holdings_asset, 'exposure': exposure_asset, 'overlap': overlap_asset, 'stats': stats_asset,
+                'sectors': sectors_asset}
+    print(f"📦 產生網站資料檔: {DATA_DIR}/ (brotli: {'有' if brotli else '未安裝，只產生 gzip'})")
+    for name, builder in builders.items():
+        columns, meta, source = builder()
+        if columns is None:
+            print(f"   ⚠️ {name}: 找不到來源 {source}，略過")
+            continue
+        sizes = write_asset(name, columns, meta)
+        print(f"   {name}: 原始 {_source_size(source):,} B -> bin {sizes['']:,} B / gz {sizes['.gz']:,} B"
+              + (f" / br {sizes['.br']:,} B" if '.br' in sizes else ""))
+
+    for page in PAGES:
+        if not os.path.exists(page):
+            continue
+        with open(page, "rb") as f:
+            data = f.read()
+        sizes = {}
+        for ext, packed in precompress(data).items():
+            atomic_write_bytes(page + ext, packed)
+            sizes[ext] = len(packed)
+        print(f"   {page}: {len(data):,} B -> gz {sizes['.gz']:,} B" + (f" / br {sizes['.br']:,} B" if '.br' in sizes else ""))
+    print(f"✅ 完成: {DATA_DIR}/")
+
+if __name__ == "__main__":
+    build_site()
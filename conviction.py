@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+from panel import build_panel
+from snapshot_store import atomic_write_text
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+OUTPUT_HTML = "conviction.html"    # 「最強信心加碼」排行
+OUTPUT_CSV = "conviction.csv"      # 最新一天所有 (基金, 股票) 的分數，方便查詢
+TOP_N = 30
+MOMENTUM_WINDOW = 5                # 權重動能：與幾個交易日前相比
+SCORE_WEIGHTS = {                  # 各項排名百分位的權重 (合計 1)
+    'streak': 0.35,
+    'momentum': 0.25,
+    'agreement': 0.25,
+    'held': 0.15,
+}
+
+# ==========================================
+# 2. 向量化計算 (所有陣列皆為 [基金, 日期, 股票])
+# ==========================================
+
+def run_length(event, fresh):
+    """
+    連續事件長度 (run-length)：每個位置回傳「到當天為止連續發生 event 的快照數」。
+    只有 fresh (當天有新快照) 的日期會累加或中斷，沒公布的日子沿用前值。
+    """
+    idx = np.arange(event.shape[1])[None, :, None]
+    hit = event & fresh[:, :, None]
+    breaks = ~event & fresh[:, :, None]
+    cum = np.cumsum(hit, axis=1, dtype=np.int32)
+    last_break = np.maximum.accumulate(np.where(breaks, idx, -1), axis=1)
+    base = np.take_along_axis(cum, np.clip(last_break, 0, None), axis=1)
+    return cum - np.where(last_break >= 0, base, 0)
+
+def share_deltas(shares, valid):
+    """與前一個日期相比的股數變化；基金第一份快照沒有前值，視為 0"""
+    delta = np.zeros_like(shares)
+    both = valid[:, 1:] & valid[:, :-1]
+    delta[:, 1:] = np.where(both[:, :, None], shares[:, 1:] - shares[:, :-1], 0)
+    return delta
+
+def days_held(held, dates):
+    """目前這段持有從哪天開始，回傳到當天為止的日曆天數 (未持有為 0)"""
+    idx = np.arange(held.shape[1])[None, :, None]
+    last_out = np.maximum.accumulate(np.where(held, -1, idx), axis=1)
+    start = np.clip(last_out + 1, 0, held.shape[1] - 1)
+    day_num = dates.astype('int64')
+    span = day_num[None, :, None] - day_num[start] + 1
+    return np.where(held, span, 0)
+
+def percentile_rank(values, mask):
+    """
+    每個日期在 mask 範圍內做排名百分位 (0 ~ 1)，mask 以外為 0。
+    同值 (並列) 取平均名次，分數只依數值而定，不受基金 / 股票在陣列中的位置影響；
+    只有一筆時沒有高低可比，與全部並列相同給 0.5。
+    values / mask: [基金, 日期, 股票]
+    """
+    n_f, n_d, n_s = values.shape
+    flat = np.where(mask, values, -np.inf).transpose(1, 0, 2).reshape(n_d, n_f * n_s)
+    order = flat.argsort(axis=1, kind='stable')
+    ordered = np.take_along_axis(flat, order, axis=1)
+    idx = np.broadcast_to(np.arange(flat.shape[1]), flat.shape)
+    # 每段相同值的第一個與最後一個名次，平均即並列名次
+    starts = np.ones(flat.shape, dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    ends = np.ones(flat.shape, dtype=bool)
+    ends[:, :-1] = starts[:, 1:]
+    first = np.maximum.accumulate(np.where(starts, idx, 0), axis=1)
+    last = np.minimum.accumulate(np.where(ends, idx, flat.shape[1])[:, ::-1], axis=1)[:, ::-1]
+    ranks = np.empty(flat.shape)
+    np.put_along_axis(ranks, order, (first + last) / 2, axis=1)
+
+    n_out = (~mask).transpose(1, 0, 2).reshape(n_d, -1).sum(axis=1)[:, None]
+    n_in = n_f * n_s - n_out
+    pct = np.where(n_in > 1, (ranks - n_out) / np.maximum(n_in - 1, 1), 0.5)
+    pct = np.where(flat == -np.inf, 0, np.clip(pct, 0, 1))
+    return pct.reshape(n_d, n_f, n_s).transpose(1, 0, 2)
+
+def compute_conviction(panel):
+    """
+    一次算完整段歷史的各項指標與信心分數，回傳 dict (皆為 [基金, 日期, 股票])：
+      acc_streak  : 連續加碼次數      dist_streak : 連續減碼次數
+      held_days   : 持有天數          momentum    : 權重動能 (百分點)
+      agreement   : 同一天也在連續加碼中的基金數
+      score       : 0 ~ 100，只有「正在連續加碼」的持股才有分數
+    """
+    weights = panel['weights'].astype(np.float64)
+    shares, valid, fresh, dates = panel['shares'], panel['valid'], panel['fresh'], panel['dates']
+
+    delta = share_deltas(shares, valid)
+    # 與前一份完全相同的快照 (週末、重複公布) 不算新的一天，不會中斷連續紀錄
+    informative = fresh & (delta != 0).any(axis=2)
+    acc_streak = run_length(delta > 0, informative)
+    dist_streak = run_length(delta < 0, informative)
+
+    held = shares > 0
+    held_days = days_held(held, dates)
+
+    past = np.clip(np.arange(weights.shape[1]) - MOMENTUM_WINDOW, 0, None)
+    momentum = weights - weights[:, past]
+
+    accumulating = (acc_streak > 0) & held
+    agreement = np.broadcast_to(accumulating.sum(axis=0), accumulating.shape)
+
+    score = (SCORE_WEIGHTS['streak'] * percentile_rank(acc_streak, accumulating)
+             + SCORE_WEIGHTS['momentum'] * percentile_rank(momentum, accumulating)
+             + SCORE_WEIGHTS['agreement'] * percentile_rank(agreement, accumulating)
+             + SCORE_WEIGHTS['held'] * percentile_rank(held_days, accumulating)) * 100
+
+    return {
+        'acc_streak': acc_streak, 'dist_streak': dist_streak, 'held_days': held_days,
+        'momentum': momentum, 'agreement': agreement, 'score': np.where(accumulating, score, 0),
+    }
+
+def latest_table(panel, metrics):
+    """取最新日期，展開成 (基金, 股票) 一列的 DataFrame，依信心分數排序"""
+    weights, shares = panel['weights'][:, -1], panel['shares'][:, -1]
+    fi, si = np.nonzero(shares > 0)
+    codes = np.array(panel['codes'], dtype=object)
+    table = pd.DataFrame({
+        '基金': np.array(panel['funds'], dtype=object)[fi],
+        '股票代號': codes[si],
+        '股票名稱': pd.Series(codes[si]).map(panel['names']).to_numpy(),
+        '權重(%)': weights[fi, si].round(2),
+        '股數': shares[fi, si].astype(np.int64),
+        '連續加碼': metrics['acc_streak'][fi, -1, si],
+        '連續減碼': metrics['dist_streak'][fi, -1, si],
+        '持有天數': metrics['held_days'][fi, -1, si],
+        f'權重動能({MOMENTUM_WINDOW}日)': metrics['momentum'][fi, -1, si].round(2),
+        '同步加碼基金數': metrics['agreement'][fi, -1, si],
+        '信心分數': metrics['score'][fi, -1, si].round(1),
+    })
+    return table.sort_values(['信心分數', '權重(%)'], ascending=False, kind='stable').reset_index(drop=True)
+
+# ==========================================
+# 3. 輸出
+# ==========================================
+
+def render_html(table, latest_date, output_html=OUTPUT_HTML):
+    adds = table[table['連續加碼'] > 0].head(TOP_N)
+    dists = table[table['連續減碼'] > 0].sort_values(['連續減碼', '權重(%)'], ascending=False, kind='stable').head(TOP_N)
+    adds_html = adds.to_html(classes='display_table', index=False, border=0) if not adds.empty else "<p>目前沒有連續加碼中的持股</p>"
+    dists_html = dists.drop(columns=['信心分數']).to_html(classes='display_table', index=False, border=0) if not dists.empty else "<p>目前沒有連續減碼中的持股</p>"
+
+    html_content = f"""
+    <!DOCTYPE html>
+    <html lang="zh-Hant">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>主動式 ETF 信心加碼排行</title>
+        <style>
+            body {{ font-family: "Microsoft JhengHei", sans-serif; margin: 20px; background-color: #f0f2f5; color: #333; }}
+            .container {{ max-width: 1200px; margin: auto; background: white; padding: 25px; border-radius: 12px; box-shadow: 0 4px 15px rgba(0,0,0,0.1); }}
+            h1, h2 {{ color: #1a73e8; text-align: center; }}
+            .info-bar {{ margin-bottom: 20px; padding: 15px; background: #2c3e50; color: white; border-radius: 8px; text-align: center; font-weight: bold; }}
+            .display_table {{ width: 100%; border-collapse: collapse; font-size: 0.85em; }}
+            .display_table th, .display_table td {{ padding: 8px; border: 1px solid #eee; text-align: left; }}
+            .display_table th {{ background-color: #f8f9fa; color: #5f6368; }}
+            .note {{ color: #666; font-size: 0.85em; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h1>🔥 最強信心加碼</h1>
+            <div class="info-bar">資料日期：{latest_date}</div>
+            <p class="note">信心分數 = 連續加碼次數、權重動能、同步加碼基金數、持有天數在所有「正在連續加碼」持股中的排名百分位加權 (0 ~ 100)。</p>
+            {adds_html}
+            <h2>🧊 連續減碼中</h2>
+            {dists_html}
+        </div>
+    </body>
+    </html>
+    """
+    atomic_write_text(output_html, html_content)
+
+def build_conviction(output_html=OUTPUT_HTML, output_csv=OUTPUT_CSV):
+    panel = build_panel()
+    if len(panel['dates']) == 0:
+        print("找不到任何歷史快照。")
+        return None
+
+    metrics = compute_conviction(panel)
+    table = latest_table(panel, metrics)
+    latest_date = str(panel['dates'][-1])
+
+    atomic_write_text(output_csv, table.to_csv(index=False), encoding="utf-8-sig")
+    render_html(table, latest_date, output_html)
+    print(f"✅ 信心加碼排行已輸出: {output_html} / {output_csv} ({latest_date}, 加碼中 {int((table['連續加碼'] > 0).sum())} 檔)")
+    return table
+
+if __name__ == "__main__":
+    build_conviction()
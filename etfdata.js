@@ -0,0 +1,71 @@
+// build_site.py 產生的欄式二進位資料檔 (site/data/*.bin) 的解碼器
+// 格式: "ETFB" + uint32 表頭長度 + JSON 表頭 + 各欄位資料 (little-endian，起點對齊 8 bytes)
+// 用法: ETFData.load('site/data/exposure.bin').then(d => d.columns.weight ...)
+const ETFData = (() => {
+    const TYPES = { u8: Uint8Array, u16: Uint16Array, u32: Uint32Array, i8: Int8Array, i16: Int16Array, i32: Int32Array,
+                    f32: Float32Array, f64: Float64Array };
+
+    // 瀏覽器支援 DecompressionStream 時優先下載 .gz 版本，否則讀未壓縮的 .bin
+    async function fetchBytes(url) {
+        if (typeof DecompressionStream !== 'undefined') {
+            try {
+                const r = await fetch(url + '.gz');
+                if (r.ok) {
+                    const stream = r.body.pipeThrough(new DecompressionStream('gzip'));
+                    return new Uint8Array(await new Response(stream).arrayBuffer());
+                }
+            } catch (e) { /* 改讀未壓縮版本 */ }
+        }
+        const r = await fetch(url);
+        if (!r.ok) throw new Error(`無法讀取 ${url}`);
+        return new Uint8Array(await r.arrayBuffer());
+    }
+
+    const isoDate = days => new Date(days * 86400000).toISOString().slice(0, 10);
+
+    function decodeColumn(bytes, base, c) {
+        const T = TYPES[c.dtype];
+        const start = bytes.byteOffset + base + c.offset;
+        let data = new T(bytes.buffer.slice(start, start + c.byteLength));
+        if (c.varint) {
+            // zigzag + 7-bit 變長整數 (用乘法而非位元運算，超過 32 bits 也正確)
+            const out = new Float64Array(c.shape.reduce((a, b) => a * b, 1));
+            for (let i = 0, p = 0; i < out.length; i++) {
+                let v = 0, mul = 1, b;
+                do { b = data[p++]; v += (b & 0x7f) * mul; mul *= 128; } while (b & 0x80);
+                out[i] = v % 2 ? -(v + 1) / 2 : v / 2;
+            }
+            data = out;
+        }
+        if (c.delta) {
+            // 沿最後一軸累加還原 (差分存成窄整數，累加要用 float64 才不會溢位)
+            data = Float64Array.from(data);
+            const row = c.shape.length ? c.shape[c.shape.length - 1] : data.length;
+            for (let i = 0; i < data.length; i++) if (i % row) data[i] += data[i - 1];
+        }
+        if (c.scale) data = Float64Array.from(data, v => v / c.scale);
+        if (c.date) return Array.from(data, isoDate);
+        if (c.values) return Array.from(data, i => c.values[i]);
+        return data;
+    }
+
+    function decode(bytes) {
+        if (String.fromCharCode(...bytes.subarray(0, 4)) !== 'ETFB') throw new Error('不是 ETFB 資料檔');
+        const headLen = new DataView(bytes.buffer, bytes.byteOffset).getUint32(4, true);
+        const header = JSON.parse(new TextDecoder().decode(bytes.subarray(8, 8 + headLen)));
+        const columns = {}, shapes = {};
+        header.columns.forEach(c => {
+            columns[c.name] = decodeColumn(bytes, 8 + headLen, c);
+            shapes[c.name] = c.shape;
+        });
+        return { columns, shapes, meta: header.meta };
+    }
+
+    // 二維欄位 ([列, 欄]) 取出第 i 列
+    function row(data, shape, i) {
+        const n = shape[shape.length - 1];
+        return data.slice(i * n, (i + 1) * n);
+    }
+
+    return { load: async url => decode(await fetchBytes(url)), decode, row };
+})();
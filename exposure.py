@@ -0,0 +1,99 @@
+import os
+import json
+
+import numpy as np
+
+from history import FUNDS, list_snapshots, load_snapshot
+from panel import build_panel
+from secmaster import name_of
+from align import AXIS, asof, new_trading_days
+from snapshot_store import atomic_write_text
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+OUTPUT_JSON = "exposure.json"   # 每檔股票的合計權重 / 合計股數時間序列
+
+# ==========================================
+# 合計權重 (README 定義：所有 ETF 對該股權重直接相加，代表曝險強度)
+# 快照沿用超過 align.STALE_DAYS 個交易日的基金當天不列入合計 (與 overlap.py 相同)
+# 每天只用當日各基金的最新快照做 O(股票數) 的增量更新；
+# 檔案不存在時才用持股面板一次向量化重建
+# ==========================================
+
+def full_rebuild():
+    panel = build_panel()
+    live = (panel['valid'] & ~panel['stale'])[:, :, None]
+    weight = np.where(live, panel['weights'], 0).sum(axis=0)   # [日期, 股票]
+    shares = np.where(live, panel['shares'], 0).sum(axis=0)
+    stocks = {}
+    for si, code in enumerate(panel['codes']):
+        stocks[code] = {
+            'name': panel['names'].get(code, code),
+            'weight': [round(float(v), 4) for v in weight[:, si]],
+            'shares': [int(v) for v in shares[:, si]],
+        }
+    return {'axis': AXIS, 'dates': [str(d) for d in panel['dates']], 'stocks': stocks}
+
+def incremental_update(data):
+    """只處理最後一天之後新增的交易日 (各基金取當日或之前最近一份快照，與面板相同)"""
+    snapshots = {fund: list_snapshots(fund) for fund in FUNDS}
+    new_days = new_trading_days([d for snaps in snapshots.values() for d, _ in snaps], data['dates'][-1])
+    if not len(new_days):
+        return 0
+    aligned = {fund: asof([d for d, _ in snaps], new_days) for fund, snaps in snapshots.items()}
+
+    stocks = data['stocks']
+    cache = {}
+    for i, day in enumerate(str(d) for d in new_days):
+        combined = {}
+        for fund, snaps in snapshots.items():
+            if not aligned[fund]['valid'][i] or aligned[fund]['stale'][i]:
+                continue
+            path = snaps[aligned[fund]['pos'][i]][1]
+            if path not in cache:
+                cache[path] = load_snapshot(path, fund)
+            df = cache[path]
+            for code, w, s in zip(df['股票代號'], df['權重(%)'], df['股數']):
+                entry = combined.setdefault(code, [name_of(code), 0.0, 0.0])
+                entry[1] += w
+                entry[2] += s
+
+        n_prev = len(data['dates'])
+        for code, (name, _, _) in combined.items():
+            if code not in stocks:
+                # 第一次出現的股票，之前的日期補 0
+                stocks[code] = {'name': name, 'weight': [0.0] * n_prev, 'shares': [0] * n_prev}
+            stocks[code]['name'] = name
+        for code, series in stocks.items():
+            _, w, s = combined.get(code, (None, 0.0, 0.0))
+            series['weight'].append(round(float(w), 4))
+            series['shares'].append(int(s))
+        data['dates'].append(day)
+    return len(new_days)
+
+def update_exposure(output_json=OUTPUT_JSON, rebuild=False):
+    data = None
+    if not rebuild and os.path.exists(output_json):
+        with open(output_json, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get('axis') != AXIS:
+            print("⚠️ 既有檔案的日期軸不是交易日軸，整個重建")
+            data = None
+    if data is None:
+        print("🔁 重建合計曝險時間序列...")
+        data = full_rebuild()
+        added = len(data['dates'])
+    else:
+        added = incremental_update(data)
+        if not added:
+            print("💤 沒有新的日期需要更新")
+            return data
+
+    atomic_write_text(output_json, json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+    print(f"✅ 合計曝險已更新: {output_json} (+{added} 天，共 {len(data['dates'])} 天 / {len(data['stocks'])} 檔)")
+    return data
+
+if __name__ == "__main__":
+    import sys
+    update_exposure(rebuild="--rebuild" in sys.argv[1:])
@@ -0,0 +1,164 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from panel import build_panel
+from conviction import share_deltas
+from snapshot_store import atomic_write_text
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+PRICE_CSV = "prices.csv"          # 選用：自備收盤價 (欄位: 日期, 股票代號, 收盤價)，優先於快照推得的價格
+OUTPUT_DIR = "flows"
+TRADES_CSV = os.path.join(OUTPUT_DIR, "trades.csv")          # 每檔基金每天每檔股票的估計成交金額
+NET_FLOW_CSV = os.path.join(OUTPUT_DIR, "net_flow.csv")      # 全體主動式 ETF 每天每檔股票的淨買賣金額
+COST_BASIS_CSV = os.path.join(OUTPUT_DIR, "cost_basis.csv")  # 最新持股的平均成本
+
+# ==========================================
+# 2. 價格矩陣 [日期, 股票]
+# ==========================================
+
+def load_price_csv(panel, path=PRICE_CSV):
+    """讀取自備價格檔，對齊成 [日期, 股票]；沒有檔案時全部為 NaN"""
+    grid = np.full((len(panel['dates']), len(panel['codes'])), np.nan)
+    if not os.path.exists(path):
+        return grid
+    df = pd.read_csv(path, dtype={'股票代號': str})
+    df['日期'] = pd.to_datetime(df['日期']).values.astype('datetime64[D]')
+    wide = df.pivot_table(index='日期', columns='股票代號', values='收盤價', aggfunc='last')
+    wide = wide.reindex(index=pd.DatetimeIndex(panel['dates']), columns=panel['codes'])
+    return wide.to_numpy(np.float64)
+
+def forward_fill(values):
+    """沿日期軸 (axis 0) 往後補值，開頭沒有值的維持 NaN"""
+    idx = np.where(np.isnan(values), 0, np.arange(values.shape[0])[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return values[idx, np.arange(values.shape[1])[None, :]]
+
+def build_prices(panel, path=PRICE_CSV):
+    """自備價格優先，其次用各基金快照推得的價格，最後往後補值"""
+    own = load_price_csv(panel, path)
+    prices = np.where(np.isnan(own), panel['prices'], own)
+    return forward_fill(prices)
+
+# ==========================================
+# 3. 向量化計算 ([基金, 日期, 股票])
+# ==========================================
+
+def traded_value(delta, prices):
+    """估計成交金額 = 股數變化 × 當日價格 (買進為正、賣出為負)"""
+    return delta * prices[None, :, :]
+
+def run_starts(held):
+    """每個位置所屬持有區間的起點索引 (未持有為 -1)"""
+    idx = np.arange(held.shape[1])[None, :, None]
+    prev_held = np.zeros_like(held)
+    prev_held[:, 1:] = held[:, :-1]
+    start = held & ~prev_held
+    last_start = np.maximum.accumulate(np.where(start, idx, -1), axis=1)
+    return start, np.where(held, last_start, -1)
+
+def average_cost(shares, delta, prices):
+    """
+    移動平均成本：買進時 成本 += 買進股數 × 價格；賣出按平均成本等比例扣除 (平均成本不變)；
+    出清後重新計算。持有區間第一天 (含基金第一份快照) 以當日價格 × 全部股數為起始成本。
+
+    遞迴式 cost[t] = cost[t-1] × r[t] + b[t]，其中賣出時 r = 今日股數 / 昨日股數、買進時 r = 1，
+    展開後 cost[t] = R[t] × Σ b[k] / R[k] (R 為區間內 r 的累乘)。
+    以 log 累加避免逐日迴圈，全部基金、股票一次算完。
+    """
+    held = shares > 0
+    start, start_idx = run_starts(held)
+    prev = np.zeros_like(shares)
+    prev[:, 1:] = shares[:, :-1]
+
+    buy = np.where(start, shares * prices, np.where(delta > 0, delta * prices, 0.0))
+    selling = held & ~start & (delta < 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_r = np.where(selling, np.log(shares / np.where(prev > 0, prev, 1)), 0.0)
+
+    safe_start = np.clip(start_idx, 0, None)
+    cum_log = np.cumsum(log_r, axis=1)
+    log_R = cum_log - np.take_along_axis(cum_log, safe_start, axis=1)
+
+    def run_sum(values):
+        # 區間內累加：整段 cumsum 減掉區間起點之前的部分
+        cum = np.cumsum(values, axis=1)
+        return cum - (np.take_along_axis(cum, safe_start, axis=1) - np.take_along_axis(values, safe_start, axis=1))
+
+    # 沒有價格的買進讓該區間成本未知 (NaN)，但不能汙染之後的持有區間
+    term = np.where(held, buy * np.exp(-log_R), 0.0)
+    unknown = run_sum(np.isnan(term).astype(np.int32)) > 0
+    cost = np.where(unknown, np.nan, np.exp(log_R) * run_sum(np.nan_to_num(term)))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(held, cost / np.where(held, shares, 1), np.nan)
+
+def compute_flows(panel, price_csv=PRICE_CSV):
+    shares = panel['shares']
+    prices = build_prices(panel, price_csv)
+    delta = share_deltas(shares, panel['valid'])
+    value = traded_value(delta, prices)
+    return {
+        'prices': prices,
+        'delta': delta,
+        'value': value,
+        'net_flow': np.nansum(value, axis=0),               # [日期, 股票]
+        'avg_cost': average_cost(shares, delta, prices),
+    }
+
+# ==========================================
+# 4. 輸出 (用 np.nonzero 一次展開成長表)
+# ==========================================
+
+def build_flows(price_csv=PRICE_CSV):
+    panel = build_panel()
+    if len(panel['dates']) == 0:
+        print("找不到任何歷史快照。")
+        return None
+
+    result = compute_flows(panel, price_csv)
+    funds = np.array(panel['funds'], dtype=object)
+    codes = np.array(panel['codes'], dtype=object)
+    names = pd.Series(codes).map(panel['names']).to_numpy()
+    dates = np.array([str(d) for d in panel['dates']], dtype=object)
+
+    fi, di, si = np.nonzero(result['delta'])
+    trades = pd.DataFrame({
+        '日期': dates[di], '基金': funds[fi], '股票代號': codes[si], '股票名稱': names[si],
+        '股數變化': result['delta'][fi, di, si].astype(np.int64),
+        '估計股價': result['prices'][di, si].round(2),
+        '估計成交金額': result['value'][fi, di, si].round(0),
+    }).sort_values(['日期', '基金', '股票代號'])
+
+    flow = result['net_flow']
+    di, si = np.nonzero(flow)
+    net_flow = pd.DataFrame({
+        '日期': dates[di], '股票代號': codes[si], '股票名稱': names[si],
+        '淨買賣金額': flow[di, si].round(0),
+    }).sort_values(['日期', '淨買賣金額'], ascending=[True, False])
+
+    shares = panel['shares'][:, -1]
+    fi, si = np.nonzero(shares > 0)
+    last_price = result['prices'][-1, si]
+    avg_cost = result['avg_cost'][fi, -1, si]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pnl = (last_price / avg_cost - 1) * 100
+    cost_basis = pd.DataFrame({
+        '基金': funds[fi], '股票代號': codes[si], '股票名稱': names[si],
+        '股數': shares[fi, si].astype(np.int64),
+        '平均成本': avg_cost.round(2), '最新股價': last_price.round(2),
+        '未實現損益(%)': pnl.round(2),
+    }).sort_values(['基金', '股票代號'])
+
+    for path, df in [(TRADES_CSV, trades), (NET_FLOW_CSV, net_flow), (COST_BASIS_CSV, cost_basis)]:
+        atomic_write_text(path, df.to_csv(index=False), encoding="utf-8-sig")
+
+    priced = np.isfinite(trades['估計成交金額']).mean() if len(trades) else 0
+    print(f"✅ 資金流向已輸出: {OUTPUT_DIR}/ (交易 {len(trades)} 筆，其中 {priced:.0%} 有價格)")
+    return trades, net_flow, cost_basis
+
+if __name__ == "__main__":
+    build_flows()
@@ -0,0 +1,98 @@
+# ==========================================
+# 基金註冊表：每檔基金一筆設定，全部由 pipeline.py 的同一套流程執行
+# ==========================================
+# 新增一檔基金只要在 REGISTRY 加一筆 (同一家投信通常一行就夠)，不必再複製整支腳本。
+#
+# 每筆設定：
+#   name        : 報表上顯示的名稱
+#   source      : 資料來源轉接器 (sources.py 的 ADAPTERS)；params 為該來源需要的參數
+#   report      : 報表版面 (reports.py 的 STYLES)
+#   columns     : 原始欄位 -> 統一欄位 (順序即原始 CSV 的欄位順序)；
+#                 股價 / 市值 / 金額 是選用欄位，來源有提供才會有 (flows.py 用來估算成交金額)
+#   baseline    : 最新一份持股 (明天的比對基準)
+#   html        : 最新報表
+#   backup      : 提交前把舊基準檔複製到這裡 (now = 現在時間, mtime = 舊基準檔修改時間)
+#   archive     : 新快照另存一份到這裡 (today = 資料日期)
+#   backup_html : 備份基準檔時連同舊報表一起備份
+#   pattern / date_regex / dated_by : 歷史存檔的位置與日期判讀 (history.py 使用)
+#     dated_by:
+#       'captured' - 檔名日期就是抓取資料的日期 (981a/2025-12-15.csv)
+#       'replaced' - 檔名日期是「被新資料取代」的時間 (備份/mtime)，
+#                    內容其實是前一次執行抓到的資料，所以日期要往前挪一份
+
+NOMURA_COLUMNS = {'股票代號': '股票代號', '股票名稱': '股票名稱', '股數': '股數', '權重(%)': '權重(%)',
+                  '股價': '股價', '市值': '市值'}
+EZMONEY_COLUMNS = {'股票代號': '股票代號', '股票名稱': '股票名稱', '股數': '股數', '權重(%)': '權重(%)'}
+CAPITAL_COLUMNS = {'股票代號': '股票代號', '股票名稱': '股票名稱', '權重(%)': '權重(%)', '持有股數': '股數'}
+FHTRUST_COLUMNS = {'證券代號': '股票代號', '證券名稱': '股票名稱', '股數': '股數', '金額': '金額', '權重(%)': '權重(%)'}
+
+def nomura_fund(fund, fund_id):
+    """野村投信：API 以 FundID 查詢，舊基準檔備份為 <基金>/backup_<時間>.csv"""
+    return {
+        'name': fund_id,
+        'source': 'nomura', 'params': {'fund_id': fund_id},
+        'report': 'nomura',
+        'columns': NOMURA_COLUMNS,
+        'baseline': f'{fund}.csv',
+        'html': f'{fund}.html',
+        'backup': f'{fund}/backup_{{now:%Y%m%d_%H%M%S}}.csv',
+        'pattern': f'{fund}/backup_*.csv',
+        'date_regex': r'backup_(\d{8})_\d{6}',
+        'dated_by': 'replaced',
+    }
+
+def ezmoney_fund(fund, fund_code):
+    """統一投信：持股在基金頁面的 DataAsset 區塊，每天另存 <基金>/<日期>.csv"""
+    return {
+        'name': fund.upper(),
+        'source': 'ezmoney', 'params': {'fund_code': fund_code},
+        'report': 'ezmoney',
+        'columns': EZMONEY_COLUMNS,
+        'baseline': f'{fund}.csv',
+        'html': f'{fund}.html',
+        'archive': f'{fund}/{{today:%Y-%m-%d}}.csv',
+        'pattern': f'{fund}/*.csv',
+        'date_regex': r'(\d{4}-\d{2}-\d{2})',
+        'dated_by': 'captured',
+    }
+
+def capital_fund(fund, fund_id):
+    """群益投信：buyback API，舊基準檔與舊報表一起備份到 <基金>_backup/<日期>_<基金>.*"""
+    return {
+        'name': fund,
+        'source': 'capital', 'params': {'fund_id': fund_id},
+        'report': 'capital',
+        'columns': CAPITAL_COLUMNS,
+        'baseline': f'{fund}.csv',
+        'html': f'{fund}.html',
+        'backup': f'{fund}_backup/{{mtime:%Y%m%d}}_{fund}.csv',
+        'backup_html': True,
+        'pattern': f'{fund}_backup/*_{fund}.csv',
+        'date_regex': rf'(\d{{8}})_{fund}',
+        'dated_by': 'replaced',
+    }
+
+def fhtrust_fund(fund, etf_code):
+    """復華投信：下載持股 Excel，舊基準檔備份為 <基金>/holdings_<日期>.csv"""
+    return {
+        'name': fund.upper(),
+        'source': 'fhtrust', 'params': {'etf_code': etf_code},
+        'report': 'fhtrust',
+        'columns': FHTRUST_COLUMNS,
+        'baseline': f'{fund}.csv',
+        'html': f'{fund}.html',
+        'backup': f'{fund}/holdings_{{mtime:%Y%m%d}}.csv',
+        'pattern': f'{fund}/holdings_*.csv',
+        'date_regex': r'holdings_(\d{8})',
+        'dated_by': 'replaced',
+    }
+
+REGISTRY = {
+    '980a': nomura_fund('980a', '00980A'),
+    '981a': ezmoney_fund('981a', '49YTW'),     # 統一 FANG+
+    '982a': capital_fund('982a', '399'),       # ⚠️ 請確認代號 (399=00929)
+    '985a': nomura_fund('985a', '00985A'),
+    '991a': fhtrust_fund('991a', 'ETF23'),
+}
+
+FUNDS = list(REGISTRY)
@@ -0,0 +1,220 @@
+import os
+import glob
+import re
+import numpy as np
+import pandas as pd
+
+import secmaster
+from funds import REGISTRY
+from trading_calendar import previous_trading_day
+
+# ==========================================
+# 1. 設定區：各基金的歷史存檔位置與欄位對照都在 funds.py 的註冊表
+# ==========================================
+# 用到的欄位: baseline / pattern / date_regex / dated_by / columns (說明見 funds.py)
+ARCHIVES = REGISTRY
+
+FUNDS = list(ARCHIVES)
+CANONICAL_COLUMNS = ['股票代號', '股票名稱', '股數', '權重(%)']
+PRICE_COLUMNS = ['股價', '市值', '金額']
+DIFF_COLUMNS = ['股票代號', '股票名稱', '股數', '權重(%)', '股數_old', '股數變化', '變動']
+CHANGE_KINDS = ['new', 'exit', 'up', 'down']
+
+def payload_price(df):
+    """由快照本身推算每股價格 (股價，或 市值/金額 ÷ 股數)；沒有價格欄位時回傳 None"""
+    if '股價' in df.columns:
+        return df['股價']
+    for col in ('市值', '金額'):
+        if col in df.columns:
+            return df[col] / df['股數']
+    return None
+
+# ==========================================
+# 2. 讀取函式
+# ==========================================
+
+def _parse_file_date(path, date_regex):
+    match = re.search(date_regex, os.path.basename(path))
+    if not match:
+        return None
+    return pd.to_datetime(match.group(1))
+
+def list_snapshots(fund, root="."):
+    """
+    列出某基金所有歷史快照，回傳依日期排序的 [(日期, 檔案路徑), ...]。
+    同一天有多份時保留最後一份。
+    """
+    cfg = ARCHIVES[fund]
+    stamped = []
+    for path in glob.glob(os.path.join(root, cfg['pattern'])):
+        file_date = _parse_file_date(path, cfg['date_regex'])
+        if file_date is None:
+            print(f"跳過無法辨識日期的檔案: {path}")
+            continue
+        stamped.append((file_date, path))
+    stamped.sort(key=lambda x: (x[0], os.path.basename(x[1])))
+
+    if cfg['dated_by'] == 'replaced':
+        # 第 i 份備份的內容，是第 i-1 份備份時間點那次執行抓到的資料；
+        # 目前的基準檔則是最後一次執行 (最後一份備份的時間點) 的結果。
+        # 第一份備份的資料抓取時間沒有紀錄，以它之前的最後一個交易日 (資料日期) 代替
+        baseline = os.path.join(root, cfg['baseline']) if cfg['baseline'] else None
+        paths = [p for _, p in stamped]
+        dates = [d for d, _ in stamped]
+        if dates:
+            dates = [pd.Timestamp(previous_trading_day(dates[0]))] + dates[:-1]
+            if baseline and os.path.exists(baseline):
+                paths.append(baseline)
+                dates.append(stamped[-1][0])
+        elif baseline and os.path.exists(baseline):
+            paths.append(baseline)
+            dates.append(pd.Timestamp(pd.Timestamp.fromtimestamp(os.path.getmtime(baseline)).date()))
+        stamped = list(zip(dates, paths))
+
+    # 同日多份只留最後一份
+    by_date = {}
+    for snap_date, path in stamped:
+        by_date[snap_date] = path
+    return sorted(by_date.items())
+
+def to_number(series):
+    """移除千分位逗號與百分比符號後轉為數字"""
+    cleaned = series.astype(str).str.replace(',', '', regex=False).str.replace('%', '', regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors='coerce')
+
+def load_snapshot(path, fund, resolve=True):
+    """
+    讀取一份快照並統一欄位：股票代號 / 股票名稱 / 股數 / 權重(%) (+ 股價 / 市值 / 金額) + sid。
+    已清倉 (股數為 0) 的列會被移除。
+    """
+    return normalize(pd.read_csv(path, dtype=str), fund, resolve)
+
+def normalize(df, fund, resolve=True):
+    """
+    把原始欄位 (CSV 或剛抓下來的資料) 轉成統一欄位。
+    resolve=True 時同時查證券主檔，補上整數 sid (跨基金比對一律用 sid)。
+    """
+    return _normalize(df, fund, resolve).reset_index(drop=True)
+
+def _normalize(df, fund, resolve):
+    """normalize() 本體；保留原本的 index (load_snapshots 用來切回各份)"""
+    cfg = ARCHIVES[fund]
+    df = df.copy()
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df[[c for c in cfg['columns'] if c in df.columns]].rename(columns=cfg['columns'])
+
+    df['股票代號'] = df['股票代號'].astype(str).str.strip()
+    df['股票名稱'] = df['股票名稱'].astype(str).str.strip()
+    df['股數'] = to_number(df['股數']).fillna(0)
+    df['權重(%)'] = to_number(df['權重(%)']).fillna(0)
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = to_number(df[col])
+    if resolve:
+        df = secmaster.resolve(df)
+
+    return df[(df['股數'] > 0) & ~df['股票代號'].isin(['', 'nan'])]
+
+def load_snapshots(paths, fund, resolve=True):
+    """
+    一次讀入同一基金的多份快照，回傳與 paths 同順序的 list (讀取失敗的位置為 None)。
+    合併成一張表只統一欄位、查主檔一次，結果與逐份 load_snapshot 相同 (重建歷史報表用)。
+    """
+    raw = {}
+    for i, path in enumerate(paths):
+        try:
+            raw[i] = pd.read_csv(path, dtype=str).rename(columns=lambda c: str(c).strip())
+        except Exception as e:
+            print(f"讀取 {path} 失敗: {e}")
+    if not raw:
+        return [None] * len(paths)
+
+    merged = _normalize(pd.concat(raw.values(), ignore_index=True), fund, resolve)
+    # 合併前每份的起點 -> 每一列屬於第幾份 (列的順序不變，直接依位置切開)
+    starts = np.cumsum([0] + [len(df) for df in raw.values()])
+    bounds = np.searchsorted(merged.index.to_numpy(), starts)
+    cfg = ARCHIVES[fund]
+    frames = [None] * len(paths)
+    for k, i in enumerate(raw):
+        frame = merged.iloc[bounds[k]:bounds[k + 1]].reset_index(drop=True)
+        # 選用的價格欄位只留這一份原本就有的
+        absent = [canon for native, canon in cfg['columns'].items()
+                  if canon in PRICE_COLUMNS and canon in frame.columns and native not in raw[i].columns]
+        frames[i] = frame.drop(columns=absent)
+    return frames
+
+def to_native(df, fund):
+    """把統一欄位的 DataFrame 轉回該基金腳本使用的原始欄位名稱與順序"""
+    cfg = ARCHIVES[fund]
+    cols = [(native, canon) for native, canon in cfg['columns'].items() if canon in df.columns]
+    native_df = df[[canon for _, canon in cols]].copy()
+    native_df.columns = [native for native, _ in cols]
+    return native_df
+
+def diff_snapshots(df_new, df_old=None):
+    """
+    兩份統一欄位的快照 -> 差異表 (依股票代號排序，欄位見 DIFF_COLUMNS)。
+    變動: first (沒有前一份) / new / exit / up / down / same；出清的股數為 0、權重為 NaN。
+    """
+    new = df_new[['股票代號', '股票名稱', '股數', '權重(%)']]
+    if df_old is None:
+        diff = new.sort_values('股票代號').reset_index(drop=True)
+        diff['股數_old'] = 0.0
+        diff['股數變化'] = 0.0
+        diff['變動'] = 'first'
+        return diff
+
+    old = df_old[['股票代號', '股票名稱', '股數']].rename(columns={'股票名稱': '名稱_old', '股數': '股數_old'})
+    return _diff_table(new.merge(old, on='股票代號', how='outer', sort=True))
+
+def _diff_table(merged):
+    """新 / 舊快照 outer merge 後的表 -> 差異表欄位"""
+    shares = merged['股數'].fillna(0).to_numpy(np.float64)
+    prev = merged['股數_old'].fillna(0).to_numpy(np.float64)
+    change = shares - prev
+    kind = np.select([prev == 0, shares == 0, change > 0, change < 0], CHANGE_KINDS, 'same')
+
+    return pd.DataFrame({
+        '股票代號': merged['股票代號'],
+        '股票名稱': merged['股票名稱'].fillna(merged['名稱_old']),
+        '股數': shares,
+        '權重(%)': merged['權重(%)'],
+        '股數_old': prev,
+        '股數變化': change,
+        '變動': kind,
+    })[DIFF_COLUMNS]
+
+def diff_consecutive(frames, df_prev=None):
+    """
+    連續快照逐份與前一份比對 (第一份與 df_prev 比)，回傳差異表 list，每份與 diff_snapshots 相同。
+    全部疊成一張表只合併一次，不必每一對各做一次 merge (重建歷史報表用)。
+    """
+    if not frames:
+        return []
+    olds = [df_prev] + frames[:-1]
+    pairs = [i for i, old in enumerate(olds) if old is not None]
+    diffs = [diff_snapshots(df, None) if old is None else None for df, old in zip(frames, olds)]
+    if not pairs:
+        return diffs
+
+    new = pd.concat([frames[i] for i in pairs], ignore_index=True)[['股票代號', '股票名稱', '股數', '權重(%)']]
+    new['_份'] = np.repeat(pairs, [len(frames[i]) for i in pairs])
+    old = pd.concat([olds[i] for i in pairs], ignore_index=True)[['股票代號', '股票名稱', '股數']]
+    old = old.rename(columns={'股票名稱': '名稱_old', '股數': '股數_old'})
+    old['_份'] = np.repeat(pairs, [len(olds[i]) for i in pairs])
+    merged = new.merge(old, on=['_份', '股票代號'], how='outer', sort=True)
+    table = _diff_table(merged)
+
+    part = merged['_份'].to_numpy()
+    bounds = np.searchsorted(part, pairs + [len(frames)])
+    for k, i in enumerate(pairs):
+        diffs[i] = table.iloc[bounds[k]:bounds[k + 1]].reset_index(drop=True)
+    return diffs
+
+def iter_history(fund, root="."):
+    """依日期逐一產生 (日期, DataFrame)，一次只讀一份"""
+    for snap_date, path in list_snapshots(fund, root):
+        try:
+            yield snap_date, load_snapshot(path, fund)
+        except Exception as e:
+            print(f"讀取 {path} 失敗: {e}")
@@ -0,0 +1,181 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from panel import build_panel
+from snapshot_store import atomic_write_text
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+OUTPUT_CSV = "leadlag.csv"       # 領先 / 跟隨排行 (每組基金一列)
+OUTPUT_JSON = "leadlag.json"     # 每組基金在各落後天數的相關係數 (畫圖用)
+MAX_LAG = 10                     # 最多看幾個交易日的落後
+MIN_ACTIVE_CHANGE = 0.02         # 扣掉申購買回的等比例變動後，股數至少要變 2% 才算一次主動買賣
+
+# ==========================================
+# 2. 主動買賣訊號 (所有陣列皆為 [基金, 交易日, 股票]，面板已對齊到交易日軸，見 align.py)
+# ==========================================
+
+def flow_factor(shares, prev):
+    """
+    申購買回的規模因子：兩天都持有的股票「今日股數 / 昨日股數」的中位數 (沿最後一軸)。
+    回傳 (ratio, factor)；當天沒有可比的股票時因子為 1。
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where((prev > 0) & (shares > 0), shares / np.where(prev > 0, prev, 1), np.nan)
+    has_ratio = np.isfinite(ratio).any(axis=-1, keepdims=True)
+    return ratio, np.nanmedian(np.where(has_ratio, ratio, 1.0), axis=-1, keepdims=True)
+
+def trade_signals(shares, valid):
+    """
+    主動買賣訊號：+1 買進 / -1 賣出 / 0 沒動作。
+    ETF 申購買回會讓所有持股等比例增減，先用每天「今日股數 / 昨日股數」的中位數當作規模因子扣掉，
+    剩下超過 MIN_ACTIVE_CHANGE 的變動 (以及新建倉、出清) 才算經理人的主動決定。
+    """
+    prev = np.zeros_like(shares)
+    prev[:, 1:] = shares[:, :-1]
+    both_days = np.zeros_like(valid)
+    both_days[:, 1:] = valid[:, 1:] & valid[:, :-1]
+
+    ratio, factor = flow_factor(shares, prev)
+    active = np.where(np.isfinite(ratio), ratio / factor - 1, 0.0)
+
+    entry = (shares > 0) & (prev == 0)
+    exit_ = (shares == 0) & (prev > 0)
+    signal = np.where(active > MIN_ACTIVE_CHANGE, 1, np.where(active < -MIN_ACTIVE_CHANGE, -1, 0))
+    signal = np.where(entry, 1, np.where(exit_, -1, signal))
+    return np.where(both_days[:, :, None], signal, 0).astype(np.float64), entry & both_days[:, :, None]
+
+# ==========================================
+# 3. 落後相關 (FFT，一次算完所有基金組合與所有落後天數)
+# ==========================================
+
+def _xcorr(x, y, n_fft, max_lag):
+    """
+    沿交易日軸 (最後一軸) 的交叉相關 Σ_t x_a[t] · y_b[t + k]，k = 0..max_lag。
+    x: [A, T] 或 [A, 股票, T]，y 同理；股票軸一併加總，回傳 [A, B, max_lag + 1]。
+    """
+    fx = np.fft.rfft(x.reshape(x.shape[0], -1, x.shape[-1]), n_fft, axis=-1)
+    fy = np.fft.rfft(y.reshape(y.shape[0], -1, y.shape[-1]), n_fft, axis=-1)
+    spec = np.einsum('asn,bsn->abn', np.conj(fx), fy)
+    return np.fft.irfft(spec, n_fft, axis=-1)[:, :, :max_lag + 1]
+
+def lagged_correlation(signal, valid, max_lag=MAX_LAG):
+    """
+    corr[a, b, k] = 基金 a 在第 t 天的買賣與基金 b 在第 t+k 天的買賣的相關 (餘弦相關)，
+    只計入兩檔基金都有資料的日子；k > 0 且 corr[a, b, k] 較大代表 a 先動、b 後跟。
+    """
+    n_t = signal.shape[1]
+    n_fft = 1 << int(np.ceil(np.log2(2 * n_t)))   # 補零避免循環相關
+    x = signal.transpose(0, 2, 1)                     # [基金, 股票, 交易日]
+    m = valid.astype(np.float64)                      # [基金, 交易日]
+    energy = (signal ** 2).sum(axis=2)                # [基金, 交易日]
+
+    num = _xcorr(x, x, n_fft, max_lag)
+    den_a = _xcorr(energy, m, n_fft, max_lag)        # a 的訊號能量 (b 也有資料的日子)
+    den_b = _xcorr(m, energy, n_fft, max_lag)        # b 的訊號能量 (a 也有資料的日子)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = num / np.sqrt(den_a * den_b)
+    return np.where((den_a > 0.5) & (den_b > 0.5), corr, 0.0)
+
+# ==========================================
+# 4. 先行者統計：誰先建倉
+# ==========================================
+
+def first_mover(entry, max_lag=MAX_LAG):
+    """
+    led[a, b]      : b 建倉時，a 在之前 1 ~ max_lag 個交易日內已先建倉同一檔股票的次數
+    same_day[a, b] : 兩檔基金同一天建倉同一檔股票的次數
+    lag_sum[a, b]  : led 的那些事件中，a 領先的交易日數總和 (算平均領先天數用)
+    """
+    n_t = entry.shape[1]
+    idx = np.arange(n_t)[None, :, None]
+    last = np.maximum.accumulate(np.where(entry, idx, -1), axis=1)
+    # 前一天為止最近一次建倉的日子 -> 距今幾個交易日
+    last_before = np.full_like(last, -1)
+    last_before[:, 1:] = last[:, :-1]
+    gap = np.where(last_before >= 0, idx - last_before, 0)
+    recent = (gap >= 1) & (gap <= max_lag)
+
+    e = entry.astype(np.float64)
+    led = np.einsum('ats,bts->ab', recent.astype(np.float64), e)
+    lag_sum = np.einsum('ats,bts->ab', np.where(recent, gap, 0).astype(np.float64), e)
+    same_day = np.einsum('ats,bts->ab', e, e)
+    return led, same_day, lag_sum
+
+# ==========================================
+# 5. 排行
+# ==========================================
+
+def compute_leadlag(panel, max_lag=MAX_LAG):
+    # 沿用太久 (stale) 的快照不是當天的部位，視同沒有資料，恢復公布的第一天也不算成一次買賣
+    shares, valid, days = panel['shares'], panel['valid'] & ~panel['stale'], panel['dates']
+    signal, entry = trade_signals(shares, valid)
+    corr = lagged_correlation(signal, valid, max_lag)
+    led, same_day, lag_sum = first_mover(entry, max_lag)
+    return {'days': days, 'corr': corr, 'led': led, 'same_day': same_day, 'lag_sum': lag_sum,
+            'events': np.abs(signal).sum(axis=(1, 2)).astype(np.int64)}
+
+def ranking_table(funds, result):
+    """
+    每組基金一列，方向定為「領先相關 - 反向相關」為正的一方領先：
+      領先相關 = max_k≥1 corr[領先, 跟隨, k]，反向相關 = max_k≥1 corr[跟隨, 領先, k]
+    """
+    corr, led, same_day, lag_sum = result['corr'], result['led'], result['same_day'], result['lag_sum']
+    lead = corr[:, :, 1:].max(axis=2)
+    best_lag = corr[:, :, 1:].argmax(axis=2) + 1
+    asym = lead - lead.T
+    a, b = np.nonzero(np.triu(np.ones_like(asym, dtype=bool), k=1))
+    flip = asym[a, b] < 0
+    a, b = np.where(flip, b, a), np.where(flip, a, b)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lead_share = led[a, b] / (led[a, b] + led[b, a])
+        avg_days = lag_sum[a, b] / led[a, b]
+    names = np.array(funds, dtype=object)
+    table = pd.DataFrame({
+        '領先基金': names[a], '跟隨基金': names[b],
+        '最佳落後天數': best_lag[a, b],
+        '領先相關': lead[a, b].round(4), '反向相關': lead[b, a].round(4),
+        '同日相關': corr[a, b, 0].round(4), '不對稱度': asym[a, b].round(4),
+        '先建倉次數': led[a, b].astype(np.int64), '後建倉次數': led[b, a].astype(np.int64),
+        '同日建倉次數': same_day[a, b].astype(np.int64),
+        '先建倉比例': np.round(lead_share, 3), '平均領先天數': np.round(avg_days, 1),
+    })
+    return table.sort_values(['不對稱度', '先建倉比例', '領先基金'], ascending=[False, False, True],
+                             kind='stable').reset_index(drop=True)
+
+def build_leadlag(max_lag=MAX_LAG):
+    panel = build_panel()
+    if len(panel['dates']) == 0:
+        print("找不到任何歷史快照。")
+        return None
+
+    funds = panel['funds']
+    result = compute_leadlag(panel, max_lag)
+    table = ranking_table(funds, result)
+    atomic_write_text(OUTPUT_CSV, table.to_csv(index=False), encoding="utf-8-sig")
+
+    payload = {
+        'funds': funds,
+        'lags': list(range(max_lag + 1)),
+        'start': str(result['days'][0]), 'end': str(result['days'][-1]),
+        'events': dict(zip(funds, result['events'].tolist())),
+        'corr': {a: {b: result['corr'][i, j].round(4).tolist() for j, b in enumerate(funds) if j != i}
+                 for i, a in enumerate(funds)},
+    }
+    atomic_write_text(OUTPUT_JSON, json.dumps(payload, ensure_ascii=False))
+
+    print(f"✅ 領先 / 跟隨排行已輸出: {OUTPUT_CSV} ({len(funds)} 檔基金，{len(result['days'])} 個交易日，最多落後 {max_lag} 天)")
+    if not table.empty:
+        print(table.head(10).to_string(index=False))
+    return table
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="找出哪檔基金先動手、哪檔基金跟進")
+    parser.add_argument("--max-lag", type=int, default=MAX_LAG, help="最多看幾個交易日的落後")
+    args = parser.parse_args()
+    build_leadlag(args.max_lag)
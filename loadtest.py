@@ -0,0 +1,118 @@
+import io
+import time
+import warnings
+import contextlib
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import mock_server
+import sources
+from funds import REGISTRY, FUNDS
+from pipeline import fetch
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+REQUESTS_PER_FUND = 50
+CONCURRENCY = 8
+
+# 各來源轉接器的網址變數 -> 假伺服器上的路徑 (保留查詢參數與格式欄位)
+URL_ATTRS = {
+    'nomura': ('NOMURA_URL', "/API/ETFAPI/api/Fund/GetFundAssets"),
+    'ezmoney': ('EZMONEY_URL', "/ETF/Fund/Info?fundCode={code}"),
+    'capital': ('CAPITAL_URL', "/CFWeb/api/etf/buyback"),
+    'fhtrust': ('FHTRUST_URL', "/api/assetsExcel/{etf}/{date}"),
+}
+
+# ==========================================
+# 2. 壓力測試：直接呼叫正式的抓取函式
+# ==========================================
+
+def point_sources(base_url):
+    """把各來源轉接器的網址改指向假伺服器"""
+    for attr, path in URL_ATTRS.values():
+        setattr(sources, attr, base_url + path)
+
+def timed_fetch(fund, day):
+    """回傳 (基金, 結果, 耗時秒)；結果為 ok / empty / short / error:<例外類別>"""
+    expected = mock_server.size_of(fund)
+    start = time.perf_counter()
+    try:
+        df = fetch(fund, day)
+        if df is None or len(df) == 0:
+            outcome = 'empty'
+        elif len(df) < expected:
+            outcome = 'short'
+        else:
+            outcome = 'ok'
+    except Exception as e:
+        outcome = f"error:{type(e).__name__}"
+    return fund, outcome, time.perf_counter() - start
+
+def summarize(fund, results, wall):
+    latencies = np.array([r[2] for r in results]) * 1000
+    outcomes = {}
+    for _, outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'fund': fund, 'n': len(results), 'ok': outcomes.get('ok', 0),
+        'rps': len(results) / wall if wall else 0.0,
+        'p50': p50, 'p95': p95, 'p99': p99, 'max': latencies.max(),
+        'failures': {k: v for k, v in outcomes.items() if k != 'ok'},
+    }
+
+def run_load(funds, requests_per_fund=REQUESTS_PER_FUND, concurrency=CONCURRENCY, base_url=None):
+    server = None
+    if base_url is None:
+        server, base_url = mock_server.start_server(port=0)
+    point_sources(base_url)
+    day = date.today()
+    jobs = [fund for fund in funds for _ in range(requests_per_fund)]
+
+    # 抓取程式本身會印進度，壓測時先收起來
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda fund: timed_fetch(fund, day), jobs))
+        wall = time.perf_counter() - start
+
+    if server:
+        server.shutdown()
+    rows = [summarize(fund, [r for r in results if r[0] == fund], wall) for fund in funds]
+    rows.append(summarize('全部', results, wall))
+    return rows, wall
+
+def print_report(rows, wall, concurrency):
+    print(f"\n📊 壓力測試結果 (並行 {concurrency}，總耗時 {wall:.2f} 秒)")
+    print(f"{'基金':<6}{'請求':>6}{'成功':>6}{'req/s':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}  失敗原因")
+    for r in rows:
+        failures = ", ".join(f"{k}×{v}" for k, v in sorted(r['failures'].items())) or "-"
+        print(f"{r['fund']:<6}{r['n']:>6}{r['ok']:>6}{r['rps']:>9.1f}{r['p50']:>10.1f}{r['p95']:>10.1f}"
+              f"{r['p99']:>10.1f}{r['max']:>10.1f}  {failures}")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="用假投信 API 對抓取程式做壓力 / 故障測試")
+    parser.add_argument("funds", nargs="*", default=FUNDS, help="要測試的基金 (預設全部)")
+    parser.add_argument("-n", "--requests", type=int, default=REQUESTS_PER_FUND, help="每檔基金的請求數")
+    parser.add_argument("-c", "--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--url", help="使用已啟動的 mock_server.py (例如 http://127.0.0.1:8765)")
+    parser.add_argument("--size", type=int, help="每檔基金的持股數")
+    parser.add_argument("--latency", type=float, default=0, help="固定延遲 (毫秒)")
+    parser.add_argument("--jitter", type=float, default=0, help="隨機延遲上限 (毫秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    # 只有內建伺服器吃得到這些設定；--url 時以該伺服器的啟動參數為準
+    if args.size:
+        mock_server.CONFIG['sizes'] = {fund: args.size for fund in REGISTRY}
+    mock_server.CONFIG.update(latency_ms=args.latency, jitter_ms=args.jitter,
+                              error_rate=args.error_rate, truncate_rate=args.truncate_rate)
+
+    rows, wall = run_load(args.funds, args.requests, args.concurrency, args.url)
+    print_report(rows, wall, args.concurrency)
@@ -0,0 +1,236 @@
+import io
+import os
+import json
+import html
+import time
+import random
+import threading
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from funds import REGISTRY
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+# 本機假的投信網站：照各家真實格式回應，用來測試抓取程式，不必連到官網
+#   野村   POST /API/ETFAPI/api/Fund/GetFundAssets   (980a, 985a)
+#   統一   GET  /ETF/Fund/Info?fundCode=49YTW        (981a，頁面內的 DataAsset div)
+#   群益   POST /CFWeb/api/etf/buyback               (982a)
+#   復華   GET  /api/assetsExcel/<etf>/<date>        (991a，xlsx 下載)
+# 各家有哪些基金取自 funds.py 的註冊表，新增的基金不必再改這裡
+HOST = "127.0.0.1"
+PORT = 8765
+MASTER_CSV = "secmaster.csv"      # 有證券主檔時用真實代號與名稱
+
+CONFIG = {
+    'sizes': {'981a': 60},  # 每檔基金的持股數 (沒列出的用 DEFAULT_SIZE)
+    'latency_ms': 0,        # 每個回應固定延遲
+    'jitter_ms': 0,         # 額外的隨機延遲 (0 ~ jitter_ms)
+    'error_rate': 0.0,      # 回傳 500/503 的機率
+    'truncate_rate': 0.0,   # 只送出一半內容就斷線的機率
+}
+
+DEFAULT_SIZE = 50
+
+def _funds_of(source, key):
+    """註冊表中某家投信的 {基金參數: 基金}"""
+    return {cfg['params'][key]: fund for fund, cfg in REGISTRY.items() if cfg['source'] == source}
+
+NOMURA_FUNDS = _funds_of('nomura', 'fund_id')
+EZMONEY_FUNDS = _funds_of('ezmoney', 'fund_code')
+CAPITAL_FUNDS = _funds_of('capital', 'fund_id')
+FHTRUST_FUNDS = _funds_of('fhtrust', 'etf_code')
+
+def size_of(fund):
+    return CONFIG['sizes'].get(fund, DEFAULT_SIZE)
+
+# ==========================================
+# 2. 假持股資料 (同一基金同一天的內容固定，換一天股數會變)
+# ==========================================
+
+_universe = None
+
+def universe():
+    global _universe
+    if _universe is None:
+        if os.path.exists(MASTER_CSV):
+            df = pd.read_csv(MASTER_CSV, dtype=str, keep_default_na=False)
+            df = df[df['股票代號'].str.fullmatch(r'\d{4}')]
+            _universe = list(zip(df['股票代號'], df['股票名稱']))
+        else:
+            _universe = [(str(1101 + i), f"測試股{i:03d}") for i in range(300)]
+    return _universe
+
+def make_holdings(fund, day, size=None):
+    """回傳 [(代號, 名稱, 股數, 權重%, 股價), ...]，權重合計約 95%"""
+    size = size or size_of(fund)
+    stocks = universe()
+    if size > len(stocks):
+        # 持股數超過已知股票時補上假代號
+        stocks = stocks + [(f"T{i:04d}", f"測試股{i:04d}") for i in range(size - len(stocks))]
+    rng = random.Random(zlib.crc32(f"{fund}".encode()))
+    picks = rng.sample(range(len(stocks)), min(size, len(stocks)))
+    day_rng = random.Random(zlib.crc32(f"{fund}{day}".encode()))
+
+    rows = []
+    for i in picks:
+        code, name = stocks[i]
+        price = rng.uniform(20, 1200)
+        shares = int(rng.uniform(50, 5000)) * 1000 + int(day_rng.choice([0, 0, 0, 1, -1]) * 10) * 1000
+        rows.append([code, name, max(shares, 1000), price])
+    total = sum(s * p for _, _, s, p in rows)
+    return [(c, n, s, round(s * p / total * 95, 2), round(p, 2)) for c, n, s, p in rows]
+
+# ==========================================
+# 3. 各家格式
+# ==========================================
+
+def nomura_body(fund, day):
+    rows = [[c, n, f"{s:,}", f"{w:.2f}", f"{p:.2f}", f"{int(s * p):,}"] for c, n, s, w, p in make_holdings(fund, day)]
+    table = {
+        'TableTitle': '股票',
+        'Columns': [{'Name': name} for name in ['股票代號', '股票名稱', '股數', '權重(%)', '股價', '市值']],
+        'Rows': rows,
+    }
+    return json.dumps({'StatusCode': 0, 'Entries': {'Data': {'Table': [table]}}}, ensure_ascii=False).encode("utf-8")
+
+def ezmoney_body(fund, day):
+    details = [{'DetailCode': c, 'DetailName': n, 'Share': f"{s:,}", 'NavRate': w}
+               for c, n, s, w, _ in make_holdings(fund, day)]
+    assets = [{'AssetCode': 'CASH', 'Details': []}, {'AssetCode': 'ST', 'Details': details}]
+    content = html.escape(json.dumps(assets, ensure_ascii=False), quote=True)
+    page = f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>ETF 基金資訊</title></head>
+<body><div class="fund-info"><div id="DataAsset" data-content="{content}"></div></div></body></html>"""
+    return page.encode("utf-8")
+
+def capital_body(fund, day):
+    stocks = [{'stocNo': c, 'stocName': n, 'weight': w, 'shareFormat': f"{s:,}"}
+              for c, n, s, w, _ in make_holdings(fund, day)]
+    return json.dumps({'code': 200, 'data': {'date': day, 'stocks': stocks}}, ensure_ascii=False).encode("utf-8")
+
+def fhtrust_body(fund, day):
+    holdings = make_holdings(fund, day)
+    rows = [['復華台灣未來50主動式ETF基金 持股明細', None, None, None, None],
+            [f'資料日期：{day}', None, None, None, None],
+            [None, None, None, None, None],
+            ['證券代號', '證券名稱', '股數', '金額', '權重(%)']]
+    rows += [[c, n, f"{s:,}", f"{int(s * p):,}", f"{w:.3f}%"] for c, n, s, w, p in holdings]
+    rows += [['合計', None, None, None, f"{sum(h[3] for h in holdings):.3f}%"],
+             ['備註：本資料僅供參考', None, None, None, None]]
+    buf = io.BytesIO()
+    pd.DataFrame(rows).to_excel(buf, header=False, index=False)
+    return buf.getvalue()
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def route(method, path, query, body):
+    """回傳 (content_type, bytes)，找不到回傳 None"""
+    today = time.strftime("%Y-%m-%d")
+    if method == "POST" and path == "/API/ETFAPI/api/Fund/GetFundAssets":
+        payload = json.loads(body or b"{}")
+        fund = NOMURA_FUNDS.get(payload.get('FundID'))
+        return fund and ("application/json", nomura_body(fund, payload.get('SearchDate') or today))
+    if method == "GET" and path == "/ETF/Fund/Info":
+        fund = EZMONEY_FUNDS.get(query.get('fundCode', [''])[0])
+        return fund and ("text/html; charset=utf-8", ezmoney_body(fund, today))
+    if method == "POST" and path == "/CFWeb/api/etf/buyback":
+        payload = json.loads(body or b"{}")
+        fund = CAPITAL_FUNDS.get(str(payload.get('fundId')))
+        return fund and ("application/json", capital_body(fund, payload.get('date') or today))
+    if method == "GET" and path.startswith("/api/assetsExcel/"):
+        parts = path.split("/")
+        if len(parts) == 5:
+            fund = FHTRUST_FUNDS.get(parts[3])
+            return fund and (XLSX, fhtrust_body(fund, parts[4]))
+    return None
+
+# ==========================================
+# 4. HTTP 伺服器與故障注入
+# ==========================================
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b""
+
+        delay = CONFIG['latency_ms'] + random.uniform(0, CONFIG['jitter_ms'])
+        if delay:
+            time.sleep(delay / 1000)
+
+        if random.random() < CONFIG['error_rate']:
+            return self._send(random.choice([500, 503]), "text/plain", "模擬伺服器錯誤".encode("utf-8"))
+
+        try:
+            result = route(method, url.path, parse_qs(url.query), body)
+        except ValueError:
+            return self._send(400, "text/plain", b"bad request")
+        if not result:
+            return self._send(404, "text/plain", b"not found")
+
+        content_type, data = result
+        if random.random() < CONFIG['truncate_rate']:
+            # 宣告完整長度但只送一半就斷線
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data[:len(data) // 2])
+            self.close_connection = True
+            return
+        self._send(200, content_type, data)
+
+    def _send(self, status, content_type, data):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def log_message(self, format, *args):
+        pass
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def start_server(host=HOST, port=PORT):
+    """在背景執行緒啟動，回傳 (server, base_url)；port=0 代表自動挑選"""
+    server = MockServer((host, port), MockHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="本機假投信 API 伺服器")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--size", type=int, help="所有基金的持股數")
+    parser.add_argument("--latency", type=float, default=0, help="固定延遲 (毫秒)")
+    parser.add_argument("--jitter", type=float, default=0, help="隨機延遲上限 (毫秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.size:
+        CONFIG['sizes'] = {fund: args.size for fund in REGISTRY}
+    CONFIG.update(latency_ms=args.latency, jitter_ms=args.jitter,
+                  error_rate=args.error_rate, truncate_rate=args.truncate_rate)
+
+    server = MockServer((HOST, args.port), MockHandler)
+    print(f"🧪 假投信 API 啟動: http://{HOST}:{args.port} (Ctrl+C 結束)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 已停止")
@@ -0,0 +1,87 @@
+import json
+import numpy as np
+
+from panel import build_panel
+from snapshot_store import atomic_write_text
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+OUTPUT_JSON = "overlap.json"   # total.html 讀取的重疊度時間序列
+
+# ==========================================
+# 2. 向量化計算
+# ==========================================
+
+def compute_overlap(weights, valid):
+    """
+    weights: [基金, 日期, 股票] (%)；valid: [基金, 日期]
+    回傳 (jaccard, weighted)，皆為 [基金, 基金, 日期]：
+      jaccard  = |A∩B| / |A∪B| (以持股名單計算)
+      weighted = Σ min(wA, wB)  (以權重計算，單位 %)
+    任一基金在該日期還沒有資料 (或資料已過期) 時為 NaN。
+    """
+    held = (weights > 0).astype(np.float32)
+    inter = np.einsum('fds,gds->fgd', held, held)
+    counts = held.sum(axis=2)
+    union = counts[:, None, :] + counts[None, :, :] - inter
+    with np.errstate(invalid='ignore', divide='ignore'):
+        jaccard = np.where(union > 0, inter / union, np.nan)
+
+    # 一次只比一組基金 (上三角)，暫存陣列只有 [日期, 股票]，不會展開成 [基金, 基金, 日期, 股票]
+    n_f = weights.shape[0]
+    weighted = np.empty((n_f, n_f, weights.shape[1]), dtype=weights.dtype)
+    buf = np.empty(weights.shape[1:], dtype=weights.dtype)
+    for a in range(n_f):
+        weighted[a, a] = weights[a].sum(axis=1)
+        for b in range(a + 1, n_f):
+            weighted[a, b] = weighted[b, a] = np.minimum(weights[a], weights[b], out=buf).sum(axis=1)
+
+    both = valid[:, None, :] & valid[None, :, :]
+    jaccard = np.where(both, jaccard, np.nan)
+    weighted = np.where(both, weighted, np.nan)
+    return jaccard, weighted
+
+def _series(values):
+    """NaN 轉 None，其餘取 4 位小數，讓 JSON 保持精簡"""
+    return [None if np.isnan(v) else round(float(v), 4) for v in values]
+
+def build_overlap(output_json=OUTPUT_JSON):
+    panel = build_panel()
+    funds, dates = panel['funds'], panel['dates']
+    if len(dates) == 0:
+        print("找不到任何歷史快照。")
+        return None
+
+    # 沿用太久 (過期) 的快照不拿來和別的基金當天的持股比較
+    jaccard, weighted = compute_overlap(panel['weights'], panel['valid'] & ~panel['stale'])
+
+    ia, ib = np.triu_indices(len(funds), k=1)
+    pairs = []
+    for a, b in zip(ia, ib):
+        pairs.append({
+            'a': funds[a], 'b': funds[b],
+            'jaccard': _series(jaccard[a, b]),
+            'weighted': _series(weighted[a, b]),
+        })
+
+    # 全體平均：越高代表主動式 ETF 越擁擠 (買的東西越像)
+    with np.errstate(invalid='ignore'):
+        pair_j = jaccard[ia, ib]
+        pair_w = weighted[ia, ib]
+        counted = (~np.isnan(pair_j)).sum(axis=0)
+        cohort_j = np.where(counted > 0, np.nansum(pair_j, axis=0) / np.maximum(counted, 1), np.nan)
+        cohort_w = np.where(counted > 0, np.nansum(pair_w, axis=0) / np.maximum(counted, 1), np.nan)
+
+    result = {
+        'dates': [str(d) for d in dates],
+        'funds': funds,
+        'pairs': pairs,
+        'cohort': {'jaccard': _series(cohort_j), 'weighted': _series(cohort_w)},
+    }
+    atomic_write_text(output_json, json.dumps(result, ensure_ascii=False, separators=(',', ':')))
+    print(f"✅ 重疊度時間序列已輸出: {output_json} ({len(dates)} 天, {len(pairs)} 組基金)")
+    return result
+
+if __name__ == "__main__":
+    build_overlap()
@@ -0,0 +1,94 @@
+import numpy as np
+
+from history import FUNDS, list_snapshots, load_snapshot, payload_price
+from secmaster import get_master
+from align import trading_axis, available_day, align_funds
+
+# ==========================================
+# 持股面板：把所有基金的歷史快照對齊成 [基金, 日期, 股票] 的陣列，
+# 給跨基金的向量化分析 (重疊度、合計曝險等) 共用
+# ==========================================
+
+def load_fund_history(fund, root="."):
+    """讀取一檔基金全部快照，回傳 (快照日期陣列, [DataFrame, ...])"""
+    dates, frames = [], []
+    for snap_date, path in list_snapshots(fund, root):
+        try:
+            frames.append(load_snapshot(path, fund))
+            dates.append(snap_date)
+        except Exception as e:
+            print(f"讀取 {path} 失敗: {e}")
+    return np.array(dates, dtype='datetime64[D]'), frames
+
+def build_panel(funds=None, root="."):
+    """
+    建立對齊後的持股面板 (dict)：
+      funds   : 基金代號 list
+      dates   : 交易日軸 (最早一份快照到最後一份之間的所有交易日, datetime64[D])
+      sids    : 證券主檔 sid (int64 陣列，欄位順序)
+      codes   : 股票代號 list (與 sids 對應)
+      names   : 代號 -> 證券主檔的標準名稱
+      weights : float32 [基金, 日期, 股票]，單位 %，未持有為 0
+      shares  : float64 [基金, 日期, 股票]
+      valid   : bool [基金, 日期]，該日期之前基金還沒有任何快照時為 False
+      fresh   : bool [基金, 日期]，該基金當天確實有一份快照 (非沿用前一份)
+      age     : int [基金, 日期]，沿用的快照是幾個交易日前的 (沒有快照為 -1)
+      stale   : bool [基金, 日期]，沿用超過 align.STALE_DAYS 個交易日
+      prices  : float64 [日期, 股票]，快照內含的股價 (股價 / 市值 / 金額 推得)，沒有為 NaN
+    每個交易日取該基金「當日或之前最近一份」快照 (as-of，見 align.py)，
+    非交易日的快照 (週末檔) 從下一個交易日起才算數。股票欄位以 sid 對齊，不比對名稱字串。
+    """
+    funds = list(funds or FUNDS)
+    histories = {fund: load_fund_history(fund, root) for fund in funds}
+    frames = [df for fund in funds for df in histories[fund][1]]
+
+    snap_dates = np.concatenate([histories[fund][0] for fund in funds] or [np.array([], dtype='datetime64[D]')])
+    dates = trading_axis(snap_dates)
+    aligned = align_funds([histories[fund][0] for fund in funds], dates)
+
+    sids = np.unique(np.concatenate([df['sid'].to_numpy(np.int64) for df in frames] or [np.zeros(0, dtype=np.int64)]))
+    records = get_master()['records']
+    codes = [records[sid]['code'] for sid in sids]
+    names = {records[sid]['code']: records[sid]['name'] for sid in sids}
+    n_s = len(sids)
+
+    # 所有基金的快照串成一個 [快照, 股票] 矩陣 (一次 scatter)，再依 as-of 序號一次取出 [基金, 日期, 股票]
+    rows = np.repeat(np.arange(len(frames)), [len(df) for df in frames])
+    cols = np.searchsorted(sids, np.concatenate([df['sid'].to_numpy(np.int64) for df in frames] or [np.zeros(0, dtype=np.int64)]))
+    snap_w = np.zeros((max(len(frames), 1), n_s), dtype=np.float32)
+    snap_s = np.zeros((max(len(frames), 1), n_s), dtype=np.float64)
+    if frames:
+        snap_w[rows, cols] = np.concatenate([df['權重(%)'].to_numpy() for df in frames])
+        snap_s[rows, cols] = np.concatenate([df['股數'].to_numpy() for df in frames])
+
+    valid = aligned['valid']
+    weights = np.where(valid[:, :, None], snap_w[aligned['index']], 0)
+    shares = np.where(valid[:, :, None], snap_s[aligned['index']], 0)
+
+    # 快照內含的股價放在「看得到」那份快照的交易日上
+    prices = np.full((len(dates), n_s), np.nan)
+    seen = np.searchsorted(dates, available_day(snap_dates))
+    start = 0
+    for i, df in enumerate(frames):
+        price, span = payload_price(df), slice(start, start + len(df))
+        start += len(df)
+        if price is None:
+            continue
+        price = price.to_numpy(np.float64)
+        ok = np.isfinite(price) & (price > 0)
+        prices[seen[i], cols[span][ok]] = price[ok]
+
+    return {
+        'funds': funds,
+        'dates': dates,
+        'sids': sids,
+        'codes': codes,
+        'names': names,
+        'weights': weights,
+        'shares': shares,
+        'valid': valid,
+        'fresh': aligned['fresh'],
+        'age': aligned['age'],
+        'stale': aligned['stale'],
+        'prices': prices,
+    }
@@ -0,0 +1,207 @@
+import os
+import sys
+import time
+import argparse
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from funds import REGISTRY, FUNDS
+from profiling import stage, profiled, profile_mode
+from history import normalize, to_number, diff_snapshots, CHANGE_KINDS
+from reports import STYLES
+from snapshot_store import fund_lock, commit_snapshot, atomic_write_bytes, record_output, meta_path
+from sources import ADAPTERS
+import stats
+import sectors
+import anomaly
+import secmaster
+from validate import gate, read_baseline
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+MAX_WORKERS = 16       # 批次執行時同時抓取的基金數 (只有抓取並行，比對與存檔依序進行)
+
+TEXT_COLUMNS = ['股票代號', '股票名稱']
+
+# ==========================================
+# 2. 抓取與比對
+# ==========================================
+
+def fetch(fund, day=None):
+    """依註冊表呼叫該基金的來源轉接器，回傳原始欄位的 DataFrame (尚未公布時回傳 None)"""
+    cfg = REGISTRY[fund]
+    with stage('fetch', fund):
+        return ADAPTERS[cfg['source']](cfg['params'], day or date.today())
+
+def native_snapshot(df, fund):
+    """
+    只留註冊表列出的原始欄位，數值欄去掉千分位 / 百分比後轉成數字，依股票代號排序
+    (基準檔與歷史檔的格式；來源每天換順序也不會讓整個檔案改寫)。
+    """
+    cfg = REGISTRY[fund]
+    df = df.rename(columns=lambda c: str(c).strip())
+    df = df[[c for c in cfg['columns'] if c in df.columns]].copy()
+    for native, canon in cfg['columns'].items():
+        if native not in df.columns:
+            continue
+        if canon in TEXT_COLUMNS:
+            df[native] = df[native].fillna('').astype(str).str.strip()
+        else:
+            df[native] = to_number(df[native])
+    code_col = next(native for native, canon in cfg['columns'].items() if canon == '股票代號')
+    return df.sort_values(code_col, kind='stable').reset_index(drop=True)
+
+def render_snapshot(fund, df_new, df_old, output_path, report_date, baseline_name=None, day_stats=None, day_sectors=None,
+                    day_anomalies=None, diff=None):
+    """
+    用該基金的報表版面畫出一份報表 (df_new / df_old 為統一欄位)；重建歷史報表時也共用
+    (已批次算好差異表時直接傳 diff)。
+    """
+    cfg = REGISTRY[fund]
+    if diff is None:
+        diff = diff_snapshots(df_new, df_old)
+    STYLES[cfg['report']](cfg, diff, output_path, report_date, baseline_name, day_stats, day_sectors, day_anomalies)
+    return diff
+
+# ==========================================
+# 3. 提交：閘門 -> 比對 -> 備份 / 存檔 -> 組合統計 / 族群 / 異常 -> 報表
+# ==========================================
+
+def commit(fund, df, day):
+    """把通過檢查的新快照提交為基準檔並產生報表 (呼叫端需持有 fund_lock)，回傳差異表"""
+    cfg = REGISTRY[fund]
+    snapshot = native_snapshot(df, fund)
+    df_old = read_baseline(cfg['baseline'])
+
+    backup_path = archive_path = None
+    if cfg.get('backup') and os.path.exists(cfg['baseline']):
+        mtime = datetime.fromtimestamp(os.path.getmtime(cfg['baseline']))
+        backup_path = cfg['backup'].format(now=datetime.now(), mtime=mtime)
+    if cfg.get('archive'):
+        archive_path = cfg['archive'].format(today=day)
+
+    # 先寫備份 / 歷史檔，最後才原子替換基準檔，中途失敗時舊基準仍完整
+    manifest = commit_snapshot(fund, snapshot, cfg['baseline'], backup_path=backup_path, archive_path=archive_path)
+    if manifest['backup']:
+        print(f"📦 {fund}: 舊資料已備份至 {manifest['backup']}")
+        if cfg.get('backup_html') and os.path.exists(cfg['html']):
+            with open(cfg['html'], "rb") as f:
+                atomic_write_bytes(os.path.splitext(manifest['backup'])[0] + ".html", f.read())
+
+    # 組合統計、族群曝險與異常偵測只補算新進來的這一份
+    with stage('stats', fund):
+        stats.update_fund(fund)
+    with stage('sectors', fund):
+        sectors.update_fund(fund)
+    with stage('anomaly', fund):
+        anomaly.update_fund(fund)
+
+    baseline_name = os.path.basename(manifest['backup']) if manifest['backup'] else None
+    with stage('render', fund):
+        diff = render_snapshot(fund, normalize(snapshot, fund), None if df_old is None else normalize(df_old, fund),
+                               cfg['html'], str(day), baseline_name, stats.latest_stats(fund),
+                               sectors.latest_sectors(fund), anomaly.latest_flags(fund))
+        record_output(cfg['html'], fund=fund, data_date=str(day))
+
+    # 這份快照裡第一次出現的股票 / 名稱 (統一欄位查主檔時當場登記) 寫回證券主檔
+    secmaster.save_changes()
+
+    changes = diff[diff['變動'].isin(CHANGE_KINDS)]
+    print(f"✅ {fund}: 已更新 {cfg['baseline']} / {cfg['html']} ({len(snapshot)} 檔持股，異動 {len(changes)} 筆)")
+    return diff
+
+def run_fund(fund, df=None, day=None, force=False):
+    """
+    單一基金的完整流程：抓取 (或使用排程器已抓好的資料) -> 鎖 -> 檢查 -> 比對 -> 提交 -> 報表。
+    有提交時回傳差異表，否則回傳 None。force=True 時未通過檢查也提交 (確認是真的大幅調整後手動使用)。
+    """
+    day = day or date.today()
+    if df is None:
+        try:
+            df = fetch(fund, day)
+        except Exception as e:
+            print(f"❌ {fund}: 抓取失敗 ({e})")
+            return None
+    if df is None or df.empty:
+        print(f"💤 {fund}: 尚無資料")
+        return None
+
+    # 同一檔基金同時只允許一個流程讀寫基準檔
+    with fund_lock(fund):
+        # 不完整或異常的資料不進基準檔，避免明天的比對被汙染
+        with stage('gate', fund):
+            passed = gate(fund, df, REGISTRY[fund]['baseline'], force=force)
+        if not passed:
+            return None
+        with stage('commit', fund):
+            return commit(fund, df, day)
+
+def output_paths(fund):
+    """
+    commit() 寫出 / 更新的檔案：基準檔、報表、meta/、備份或歷史檔目錄、證券主檔，以及該基金的組合統計 / 族群 / 異常檔。
+    排程推送時只 git add 這些 (隔離區、輪詢狀態、剖析結果等不進版控)；只列出已存在的路徑。
+    """
+    cfg = REGISTRY[fund]
+    paths = [cfg['baseline'], cfg['html'], meta_path(cfg['html']), stats.stats_path(fund),
+             sectors.sectors_path(fund), anomaly.flags_path(fund), anomaly.state_path(fund),
+             secmaster.MASTER_CSV, secmaster.MASTER_JSON]
+    paths += [os.path.dirname(cfg[key]) for key in ('backup', 'archive') if cfg.get(key)]
+    return [p for p in dict.fromkeys(paths) if p and os.path.exists(p)]
+
+# ==========================================
+# 4. 批次：全部基金一次跑完
+# ==========================================
+
+def run_batch(funds=None, day=None, workers=MAX_WORKERS, force=False):
+    """
+    抓取在執行緒池中並行 (網路等待佔大部分時間)，
+    抓到的資料依完成順序在主執行緒逐一提交 (證券主檔與基準檔不必處理並行寫入)。
+    """
+    funds = funds or FUNDS
+    day = day or date.today()
+    started = time.perf_counter()
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(funds)))) as pool:
+        futures = {pool.submit(fetch, fund, day): fund for fund in funds}
+        for future in as_completed(futures):
+            fund = futures[future]
+            try:
+                df = future.result()
+            except Exception as e:
+                print(f"❌ {fund}: 抓取失敗 ({e})")
+                results[fund] = None
+                continue
+            try:
+                results[fund] = run_fund(fund, df if df is not None else pd.DataFrame(), day, force)
+            except Exception as e:
+                print(f"❌ {fund}: 處理失敗 ({e})")
+                results[fund] = None
+
+    done = sum(r is not None for r in results.values())
+    print(f"🏁 批次完成: {done}/{len(funds)} 檔已更新，耗時 {time.perf_counter() - started:.2f} 秒")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="依 funds.py 的註冊表抓取、比對並產生各基金報表")
+    parser.add_argument("funds", nargs="*", default=FUNDS, help=f"要執行的基金 (預設全部: {' '.join(FUNDS)})")
+    parser.add_argument("--date", default=None, help="資料日期 YYYY-MM-DD (預設今天)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="同時抓取的基金數")
+    parser.add_argument("--force", action="store_true", help="未通過檢查 (換手率、檔數驟減等) 也提交，確認是真的大幅調整時使用")
+    parser.add_argument("--outputs", action="store_true", help="只列出這些基金要推送的檔案 (給工作流程的 git add 用)")
+    mode = profile_mode()   # --profile[=cprofile]：輸出各基金各階段的火焰圖到 profiles/
+    args = parser.parse_args()
+
+    unknown = [f for f in args.funds if f not in REGISTRY]
+    if unknown:
+        print(f"未知的基金: {', '.join(unknown)}")
+        sys.exit(1)
+    if args.outputs:
+        print(" ".join(p for fund in args.funds for p in output_paths(fund)))
+        sys.exit(0)
+    day = date.fromisoformat(args.date) if args.date else None
+    with profiled('batch', day, mode or 'sample', enabled=mode is not None):
+        run_batch(args.funds, day, args.workers, args.force)
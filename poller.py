@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import time
+import heapq
+import hashlib
+import argparse
+import subprocess
+from datetime import datetime, timedelta
+
+from alerts import notify
+from funds import REGISTRY
+from history import FUNDS, list_snapshots, load_snapshot, normalize
+from pipeline import fetch, run_fund
+from trading_calendar import TW_TZ, today_tw, is_trading_day, holiday_name
+from validate import REBASELINE_AFTER, load_rejection, repeat_rejection
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+STATE_FILE = "poll_state.json"   # 記錄各基金最近的公布時間與最新資料指紋
+WINDOW_START = "15:00"           # 台灣時間，最早開始輪詢
+WINDOW_END = "21:30"             # 台灣時間，超過就放棄今天
+BASE_INTERVAL = 5 * 60           # 第一次沒抓到新資料後等待的秒數
+BACKOFF = 1.5                    # 每多一次沒抓到，間隔乘上這個倍數
+MAX_INTERVAL = 30 * 60
+LEAD_TIME = 15 * 60              # 從歷史公布時間往前提早多久開始輪詢
+HISTORY_SIZE = 20                # 保留幾筆公布時間來估計今天何時會公布
+
+# ==========================================
+# 2. 狀態與指紋
+# ==========================================
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def save_state(state):
+    tmp_path = STATE_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, STATE_FILE)
+
+def fingerprint(df):
+    """以 (代號, 股數, 權重) 計算指紋；權重每天隨股價變動，所以新的一天一定會不同"""
+    rows = sorted(zip(df['股票代號'], df['股數'].round(0), df['權重(%)'].round(4)))
+    return hashlib.sha1(repr(rows).encode("utf-8")).hexdigest()
+
+def baseline_fingerprint(fund):
+    snapshots = list_snapshots(fund)
+    if not snapshots:
+        return None
+    return fingerprint(load_snapshot(snapshots[-1][1], fund))
+
+def _at(day, hhmm):
+    hour, minute = map(int, hhmm.split(":"))
+    return datetime(day.year, day.month, day.day, hour, minute, tzinfo=TW_TZ)
+
+def first_poll_time(day, fund_state):
+    """依過去的公布時間，決定今天第一次輪詢的時間 (不早於 WINDOW_START)"""
+    start = _at(day, WINDOW_START)
+    publish_times = fund_state.get('publish_times', [])
+    if publish_times:
+        learned = _at(day, min(publish_times)) - timedelta(seconds=LEAD_TIME)
+        start = max(start, learned)
+    return start
+
+# ==========================================
+# 3. 輪詢主流程
+# ==========================================
+
+def probe(fund, day, state):
+    """抓一次資料；若是新的一份就交給共用流程 (pipeline.run_fund) 處理。回傳是否已取得今日資料"""
+    try:
+        df = fetch(fund, day)
+    except Exception as e:
+        print(f"   {fund}: 抓取失敗 ({e})")
+        return False
+    if df is None or df.empty:
+        print(f"   {fund}: 尚無資料")
+        return False
+
+    fund_state = state.setdefault(fund, {})
+    last_fp = fund_state.get('fingerprint') or baseline_fingerprint(fund)
+    new_fp = fingerprint(normalize(df, fund))
+    if new_fp == last_fp:
+        print(f"   {fund}: 仍是上一份資料，稍後再試")
+        return False
+
+    # 已被擋下的同一份資料不再重新檢查 / 隔離，只累計次數；
+    # 累計到 validate.REBASELINE_AFTER 次時才再交給閘門 (問題都只是與上一份差太多時會自動接受)
+    if fund_state.get('rejected') == new_fp:
+        record = load_rejection(fund)
+        if record and record['count'] + 1 < REBASELINE_AFTER:
+            print(f"   {fund}: 仍是被擋下的那份資料 (第 {repeat_rejection(fund)} 次)，稍後再試")
+            return False
+
+    print(f"🆕 {fund}: 偵測到新資料，開始處理")
+    try:
+        diff = run_fund(fund, df, day)
+    except Exception as e:
+        print(f"   {fund}: 處理失敗 ({e})")
+        return False
+    if diff is None:
+        # 閘門 (持有鎖時重新檢查) 擋下，資料已放進隔離區；記住指紋，下次抓到同一份就略過
+        fund_state['rejected'] = new_fp
+        save_state(state)
+        return False
+
+    for key in ('rejected', 'due_day', 'misses', 'next_due'):
+        fund_state.pop(key, None)
+    now = datetime.now(TW_TZ)
+    fund_state['fingerprint'] = new_fp
+    fund_state['last_date'] = str(day)
+    fund_state['publish_times'] = (fund_state.get('publish_times', []) + [now.strftime("%H:%M")])[-HISTORY_SIZE:]
+    save_state(state)
+    return True
+
+def next_poll(day, fund_state):
+    """
+    今天下一次該抓的時間與已落空的次數：同一天沿用狀態檔記下的 next_due / misses
+    (--once 每次排程只跑幾分鐘，退避進度要跨次保存)，否則依過去的公布時間決定第一次。
+    """
+    if fund_state.get('due_day') == str(day) and fund_state.get('next_due'):
+        return datetime.fromisoformat(fund_state['next_due']), fund_state.get('misses', 0)
+    return first_poll_time(day, fund_state), 0
+
+def record_miss(day, fund_state, misses):
+    """這次沒抓到：依退避間隔排下一次，記進狀態 (呼叫端負責 save_state)，回傳 (下次時間, 間隔秒數)"""
+    interval = min(BASE_INTERVAL * (BACKOFF ** misses), MAX_INTERVAL)
+    next_due = datetime.now(TW_TZ) + timedelta(seconds=interval)
+    fund_state.update(due_day=str(day), misses=misses + 1, next_due=next_due.isoformat(timespec='seconds'))
+    return next_due, interval
+
+def poll(funds, force=False, once=False, on_publish=None):
+    day = today_tw()
+    if not force and not is_trading_day(day):
+        print(f"💤 {day} 休市 ({holiday_name(day)})，今天不抓取。")
+        return
+
+    state = load_state()
+    deadline = _at(day, WINDOW_END)
+    now = datetime.now(TW_TZ)
+    queue = []
+    for fund in funds:
+        fund_state = state.get(fund, {})
+        if fund_state.get('last_date') == str(day):
+            print(f"✅ {fund}: 今天已經取得資料，略過")
+            continue
+        due, misses = next_poll(day, fund_state)
+        if once:
+            # 排程每 10 分鐘跑一次 --once：還沒到時間 (未到歷史公布時間或退避中) 的基金這次不抓
+            if due > now:
+                print(f"   {fund}: 下次輪詢時間 {due:%H:%M}，這次略過")
+                continue
+            due = now
+        heapq.heappush(queue, (due, fund, misses))
+
+    while queue:
+        due, fund, misses = heapq.heappop(queue)
+        wait = (due - datetime.now(TW_TZ)).total_seconds()
+        if wait > 0:
+            time.sleep(wait)
+
+        if probe(fund, day, state):
+            # 先送通知 (秒級)，再執行推送等較慢的後續動作
+            try:
+                notify([fund])
+            except Exception as e:
+                print(f"   {fund}: 通知失敗 ({e})")
+            if on_publish:
+                subprocess.run(on_publish, shell=True, env=dict(os.environ, FUND=fund))
+            continue
+
+        next_due, interval = record_miss(day, state.setdefault(fund, {}), misses)
+        save_state(state)
+        if next_due > deadline:
+            print(f"⌛ {fund}: 到 {WINDOW_END} 仍未公布，今天放棄")
+            continue
+        print(f"   {fund}: {int(interval // 60)} 分鐘後重試")
+        if not once:
+            heapq.heappush(queue, (next_due, fund, misses + 1))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="依交易日曆輪詢各基金，資料一公布就處理")
+    parser.add_argument("funds", nargs="*", default=FUNDS, help=f"要輪詢的基金 (預設全部: {' '.join(FUNDS)})")
+    parser.add_argument("--force", action="store_true", help="忽略交易日曆 (休市日也抓)")
+    parser.add_argument("--once", action="store_true", help="每檔只抓一次，不等待")
+    parser.add_argument("--on-publish", default=None, help="每檔處理完後執行的指令 (環境變數 FUND 為基金代號)")
+    args = parser.parse_args()
+
+    unknown = [f for f in args.funds if f not in REGISTRY]
+    if unknown:
+        print(f"未知的基金: {', '.join(unknown)}")
+        sys.exit(1)
+    poll(args.funds, force=args.force, once=args.once, on_publish=args.on_publish)
@@ -0,0 +1,279 @@
+import os
+import sys
+import time
+import html
+import pstats
+import cProfile
+import threading
+import zlib
+from contextlib import contextmanager
+from collections import Counter
+from datetime import date
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+PROFILE_DIR = "profiles"        # profiles/<基金>_<日期>_<階段>.collapsed / .svg
+SAMPLE_INTERVAL = 0.005         # 取樣間隔 (秒)；5ms 對整體執行時間的影響約 1~3%
+ENV_FLAG = "ETF_PROFILE"        # 環境變數 ETF_PROFILE=1 (或 cprofile) 等同加上 --profile，排程上不必改指令
+MODES = ('sample', 'cprofile')
+
+SVG_WIDTH = 1200
+SVG_ROW = 16
+
+# ==========================================
+# 剖析器：預設是背景執行緒定時取各執行緒的呼叫堆疊 (不改動被測程式，額外負擔低)，
+# 拿不到 sys._current_frames 的直譯器或指定 cprofile 時改用 cProfile。
+# 被測程式用 stage() 標記階段，樣本依 (基金, 階段) 分開存檔。
+# ==========================================
+
+_active = None            # 目前執行中的剖析器 (沒有開啟時 stage() 什麼都不做)
+_default_label = "run"    # 沒指定基金的階段歸在這個標籤下
+
+class SamplingProfiler:
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = {}                     # (基金, 階段) -> Counter(堆疊字串)
+        self.stages = {}                      # 執行緒 id -> (基金, 階段)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def enter(self, key):
+        ident = threading.get_ident()
+        previous = self.stages.get(ident)
+        self.stages[ident] = key
+        return previous
+
+    def leave(self, previous):
+        ident = threading.get_ident()
+        if previous is None:
+            self.stages.pop(ident, None)
+        else:
+            self.stages[ident] = previous
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                key = self.stages.get(ident)
+                if ident == me or key is None:
+                    continue
+                self.samples.setdefault(key, Counter())[_collapse(frame)] += 1
+
+    def collapsed(self):
+        return self.samples
+
+class CProfileProfiler:
+    """
+    每個 (基金, 階段) 一個 cProfile，只剖析開啟剖析的那個執行緒 (cProfile 同時只能有一個在跑)；
+    只看得到呼叫者 -> 被呼叫者一層，火焰圖為兩層。
+    """
+    _IDLE = object()
+
+    def __init__(self):
+        self.profiles = {}
+        self.current = None
+        self.owner = threading.get_ident()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        if self.current is not None:
+            self.profiles[self.current].disable()
+
+    def enter(self, key):
+        if threading.get_ident() != self.owner:
+            return self._IDLE
+        previous = self.current
+        if previous is not None:
+            self.profiles[previous].disable()
+        self.current = key
+        self.profiles.setdefault(key, cProfile.Profile()).enable()
+        return previous
+
+    def leave(self, previous):
+        if previous is self._IDLE:
+            return
+        self.profiles[self.current].disable()
+        self.current = previous
+        if previous is not None:
+            self.profiles[previous].enable()
+
+    def collapsed(self):
+        result = {}
+        for key, profile in self.profiles.items():
+            stacks = Counter()
+            for func, (_, _, tottime, _, callers) in pstats.Stats(profile).stats.items():
+                name = _func_name(func[2], func[0], func[1])
+                if not callers:
+                    stacks[name] += int(tottime * 1e6)
+                    continue
+                # 自身時間依各呼叫者的呼叫次數分攤
+                total_calls = sum(c[1] for c in callers.values()) or 1
+                for caller, stat in callers.items():
+                    stacks[f"{_func_name(caller[2], caller[0], caller[1])};{name}"] += int(tottime * 1e6 * stat[1] / total_calls)
+            result[key] = +stacks
+        return result
+
+def _func_name(func, filename, lineno):
+    return f"{func} ({os.path.basename(filename)}:{lineno})".replace(";", ":")
+
+def _collapse(frame):
+    """frame -> 'root;...;leaf' (flamegraph.pl 的 collapsed 格式)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(_func_name(code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+@contextmanager
+def stage(name, fund=None):
+    """標記一段程式屬於哪個階段 (沒有開啟剖析時不做事)；fund 省略時沿用外層的基金"""
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    outer = _outer_key(profiler)
+    key = (fund or (outer[0] if outer else _default_label), name)
+    previous = profiler.enter(key)
+    try:
+        yield
+    finally:
+        profiler.leave(previous)
+
+def _outer_key(profiler):
+    if isinstance(profiler, SamplingProfiler):
+        return profiler.stages.get(threading.get_ident())
+    return profiler.current if threading.get_ident() == profiler.owner else None
+
+# ==========================================
+# 2. 輸出：collapsed 堆疊 + 火焰圖 SVG
+# ==========================================
+
+def write_collapsed(path, stacks):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{stack} {count}\n")
+
+def _build_tree(stacks):
+    root = {'name': 'all', 'value': 0, 'children': {}}
+    for stack, count in stacks.items():
+        root['value'] += count
+        node = root
+        for name in stack.split(";"):
+            node = node['children'].setdefault(name, {'name': name, 'value': 0, 'children': {}})
+            node['value'] += count
+    return root
+
+def flamegraph_svg(stacks, title):
+    """不依賴外部工具的火焰圖：寬度 = 樣本比例，由下往上為呼叫深度，滑鼠移上去看完整名稱"""
+    root = _build_tree(stacks)
+    total = max(root['value'], 1)
+    rects = []
+
+    def walk(node, x, depth):
+        rects.append((node, x, depth))
+        child_x = x
+        for child in sorted(node['children'].values(), key=lambda n: n['name']):
+            walk(child, child_x, depth + 1)
+            child_x += child['value']
+
+    walk(root, 0, 0)
+    depth_max = max(d for _, _, d in rects)
+    height = (depth_max + 1) * SVG_ROW + 40
+    scale = (SVG_WIDTH - 20) / total
+
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{SVG_WIDTH}" height="{height}" font-family="monospace" font-size="11">',
+             f'<text x="10" y="20" font-size="14">{html.escape(title)}</text>']
+    for node, x, depth in rects:
+        width = node['value'] * scale
+        if width < 0.5:
+            continue
+        y = height - (depth + 1) * SVG_ROW
+        hue = 10 + zlib.crc32(node['name'].encode('utf-8')) % 40
+        label = html.escape(node['name'])
+        pct = node['value'] / total * 100
+        parts.append(f'<g><title>{label} ({node["value"]} 樣本, {pct:.1f}%)</title>'
+                     f'<rect x="{10 + x * scale:.1f}" y="{y}" width="{width:.1f}" height="{SVG_ROW - 1}" fill="hsl({hue},90%,60%)"/>')
+        chars = int(width / 7)
+        if chars >= 3:
+            text = node['name'] if len(node['name']) <= chars else node['name'][:chars - 2] + ".."
+            parts.append(f'<text x="{12 + x * scale:.1f}" y="{y + SVG_ROW - 4}">{html.escape(text)}</text>')
+        parts.append('</g>')
+    parts.append('</svg>')
+    return "\n".join(parts)
+
+def save_artifacts(profiler, day, profile_dir=PROFILE_DIR):
+    os.makedirs(profile_dir, exist_ok=True)
+    written = []
+    for (fund, stage_name), stacks in sorted(profiler.collapsed().items()):
+        if not stacks:
+            continue
+        base = os.path.join(profile_dir, f"{fund}_{day}_{stage_name}")
+        write_collapsed(base + ".collapsed", stacks)
+        with open(base + ".svg", "w", encoding="utf-8") as f:
+            f.write(flamegraph_svg(stacks, f"{fund} {day} {stage_name} ({sum(stacks.values())} 樣本)"))
+        written.append(base)
+    return written
+
+# ==========================================
+# 3. 進入點
+# ==========================================
+
+@contextmanager
+def profiled(label, day=None, mode='sample', enabled=True, profile_dir=PROFILE_DIR):
+    """
+    在 with 區塊內開啟剖析，結束時輸出 profiles/<基金>_<日期>_<階段>.collapsed / .svg。
+    沒有被 stage() 包住的部分歸在 (label, 'main')。
+    """
+    global _active, _default_label
+    if not enabled:
+        yield None
+        return
+    if mode == 'sample' and not hasattr(sys, "_current_frames"):
+        mode = 'cprofile'
+    profiler = SamplingProfiler() if mode == 'sample' else CProfileProfiler()
+    _active, _default_label = profiler, label
+    started = time.perf_counter()
+    profiler.start()
+    try:
+        with stage('main', label):
+            yield profiler
+    finally:
+        profiler.stop()
+        _active = None
+        written = save_artifacts(profiler, day or date.today(), profile_dir)
+        print(f"🔬 剖析完成 ({mode}, {time.perf_counter() - started:.2f} 秒)，已輸出 {len(written)} 份火焰圖至 {profile_dir}/")
+
+def profile_mode(argv=None):
+    """
+    從命令列 (--profile 或 --profile=cprofile) 或環境變數 ETF_PROFILE 判斷是否剖析，回傳模式或 None。
+    會把 --profile 參數從 argv 移除，腳本原本的參數解析不受影響。
+    """
+    argv = sys.argv if argv is None else argv
+    mode = os.environ.get(ENV_FLAG) or None
+    for arg in list(argv[1:]):
+        if arg == "--profile" or arg.startswith("--profile="):
+            argv.remove(arg)
+            mode = arg.partition("=")[2] or 'sample'
+    if mode in ('1', 'true', 'yes'):
+        mode = 'sample'
+    if mode is not None and mode not in MODES:
+        print(f"未知的剖析模式: {mode} (可用: {', '.join(MODES)})")
+        sys.exit(1)
+    return mode
+
+def run_profiled(label, fn, *args, argv=None, day=None):
+    """各進入點共用：有 --profile / ETF_PROFILE 時包在剖析器裡執行 fn，否則直接執行"""
+    mode = profile_mode(argv)
+    with profiled(label, day, mode or 'sample', enabled=mode is not None):
+        return fn(*args)
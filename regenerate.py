@@ -0,0 +1,140 @@
+import os
+import io
+import sys
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from funds import REGISTRY
+from history import FUNDS, list_snapshots, load_snapshots, diff_consecutive
+from pipeline import render_snapshot
+from stats import load_stats
+from sectors import load_sectors, sectors_by_day
+from anomaly import load_flags, flags_by_day
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+REPORT_DIR = "reports"   # 重建的歷史報表輸出位置: reports/<基金>/<日期>.html
+# 報表本來就跟備份 CSV 存在一起的基金 (982a_backup/YYYYMMDD_982a.html)；
+# 最新一份 (基準檔 982a.csv) 的報表是線上的 982a.html，重建時改寫到 REPORT_DIR，不覆蓋它
+BESIDE_ARCHIVE = {fund for fund, cfg in REGISTRY.items() if cfg.get('backup_html')}
+CHUNK_SIZE = 25          # 每個子行程一次處理的連續快照數
+
+# ==========================================
+# 2. 重建流程
+# ==========================================
+
+def report_path(fund, snap_date, snapshot_path):
+    if fund in BESIDE_ARCHIVE and os.path.normpath(snapshot_path) != os.path.normpath(REGISTRY[fund]['baseline']):
+        return os.path.splitext(snapshot_path)[0] + ".html"
+    return os.path.join(REPORT_DIR, fund, f"{snap_date.strftime('%Y-%m-%d')}.html")
+
+def _split_by_fund(chunk):
+    groups = {}
+    for task in chunk:
+        groups.setdefault(task[0], []).append(task)
+    return list(groups.values())
+
+def build_tasks(funds):
+    """每份快照與它的前一份配對成一個重建工作"""
+    tasks = []
+    for fund in funds:
+        snapshots = list_snapshots(fund)
+        prev_path = None
+        for snap_date, path in snapshots:
+            tasks.append((fund, prev_path, path, snap_date, report_path(fund, snap_date, path)))
+            prev_path = path
+    return tasks
+
+def render_chunk(tasks):
+    """
+    在子行程中依序重建同一基金一段連續的報表。
+    這段的快照 (含第一份的前一份) 一次讀入、差異表一次算完，不必每天各讀兩份、各比對一次；
+    組合統計 / 族群 / 異常表也只分組一次。版面與每日流程相同 (pipeline.render_snapshot)。
+    """
+    fund, first_prev = tasks[0][0], tasks[0][1]
+    loaded = load_snapshots(([first_prev] if first_prev else []) + [task[2] for task in tasks], fund)
+    df_prev = loaded.pop(0) if first_prev else None
+    frames = loaded
+
+    # 讀取失敗的快照：它自己與下一份 (沒有前一份可比) 無法重建，其餘連續的一段一起比對
+    broken = {i for i, df in enumerate(frames) if df is None}
+    broken |= {i + 1 for i in broken}
+    if first_prev and df_prev is None:
+        broken.add(0)
+    diffs = [None] * len(frames)
+    i = 0
+    while i < len(frames):
+        if i in broken:
+            i += 1
+            continue
+        j = i
+        while j < len(frames) and j not in broken:
+            j += 1
+        diffs[i:j] = diff_consecutive(frames[i:j], df_prev if i == 0 else frames[i - 1])
+        i = j
+
+    days = {task[3].strftime('%Y-%m-%d') for task in tasks}
+    table = load_stats(fund)
+    day_stats = {} if table is None else {row['日期']: row for row in table.to_dict('records')}
+    day_sectors = sectors_by_day(load_sectors(fund), days)
+    day_flags = flags_by_day(load_flags(fund), days)
+
+    results = []
+    for (fund, prev_path, path, snap_date, output_path), df_new, diff in zip(tasks, frames, diffs):
+        if diff is None:
+            results.append((path, f"{fund} {path} 重建失敗: 無法讀取快照或前一份快照"))
+            continue
+        try:
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                report_date = snap_date.strftime('%Y-%m-%d')
+                render_snapshot(fund, df_new, None, output_path, report_date,
+                                prev_path and os.path.basename(prev_path), day_stats.get(report_date),
+                                day_sectors.get(report_date), day_flags.get(report_date, []), diff=diff)
+            results.append((path, None))
+        except Exception as e:
+            results.append((path, f"{fund} {path} 重建失敗: {e}"))
+    return results
+
+def regenerate(funds, workers=None):
+    tasks = build_tasks(funds)
+    if not tasks:
+        print("找不到任何歷史快照。")
+        return
+
+    # 依基金切成連續的小段，每段交給一個子行程
+    chunks = [tasks[i:i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE)]
+    chunks = [c for chunk in chunks for c in _split_by_fund(chunk)]
+
+    print(f"🔁 開始重建 {len(tasks)} 份報表 ({', '.join(funds)})...")
+    started = time.time()
+    done = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            for _, error in future.result():
+                if error:
+                    failed += 1
+                    print(f"⚠️ {error}")
+                else:
+                    done += 1
+            elapsed = time.time() - started
+            print(f"   [{done + failed}/{len(tasks)}] {(done + failed) / max(elapsed, 1e-9):.1f} 份/秒")
+
+    elapsed = time.time() - started
+    print(f"✅ 完成 {done} 份 (失敗 {failed} 份)，耗時 {elapsed:.1f} 秒，{done / max(elapsed, 1e-9):.1f} 份/秒")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="用歷史快照重建所有基金的每日報表")
+    parser.add_argument("funds", nargs="*", default=FUNDS, help=f"要重建的基金 (預設全部: {' '.join(FUNDS)})")
+    parser.add_argument("--workers", type=int, default=None, help="平行行程數 (預設為 CPU 核心數)")
+    args = parser.parse_args()
+
+    unknown = [f for f in args.funds if f not in REGISTRY]
+    if unknown:
+        print(f"未知的基金: {', '.join(unknown)}")
+        sys.exit(1)
+    regenerate(args.funds, args.workers)
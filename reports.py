@@ -0,0 +1,365 @@
+import os
+
+import pandas as pd
+
+from snapshot_store import atomic_write_text, meta_path
+
+# ==========================================
+# 各家報表版面 (沿用原本各腳本的樣式)
+# ==========================================
+# 每個版面都吃 history.diff_snapshots() 產生的同一張差異表：
+#   股票代號 / 股票名稱 / 股數 / 權重(%) / 股數_old / 股數變化 / 變動
+#   變動: first (首次建立) / new / exit / up / down / same；exit 的股數為 0、權重為 NaN
+# 輸出只依資料而定 (不放現在時間、不用隨機 id、列的順序固定)，產生時間由頁面讀 meta/ 的小檔顯示。
+# stats 為 stats.py 算好的當天組合統計 (一列 dict)，sectors 為 sectors.py 的前幾大族群 (list)，
+# anomalies 為 anomaly.py 標出的異常變動 (list)，沒有時不顯示。
+
+def _shares(value):
+    return f"{int(value):,}"
+
+def _weight(value):
+    return "-" if pd.isna(value) else f"{value:g}"
+
+def _stat(value, fmt):
+    return "-" if pd.isna(value) else format(value, fmt)
+
+def _stats_line(stats):
+    """一行組合統計：持股數 / 新進出清 / 單邊換手率 / 前十大權重 / HHI / 有效持股數"""
+    if not stats:
+        return ""
+    return (f"持股 {_stat(stats['持股檔數'], 'd')} 檔｜新進 {_stat(stats['新進檔數'], 'd')} / 出清 {_stat(stats['出清檔數'], 'd')}｜"
+            f"單邊換手率 {_stat(stats['單邊換手率(%)'], '.2f')}%｜前十大 {_stat(stats['前10大權重(%)'], '.2f')}%｜"
+            f"HHI {_stat(stats['HHI'], '.0f')}｜有效持股數 {_stat(stats['有效持股數'], '.1f')}")
+
+def _sectors_line(sectors):
+    """一行前幾大族群：名稱 權重 (與前一份相比的變化)"""
+    if not sectors:
+        return ""
+    parts = []
+    for s in sectors:
+        change = "" if pd.isna(s['change']) else f" ({s['change']:+.2f})"
+        parts.append(f"{s['name']} {s['weight']:.2f}%{change}")
+    return "族群: " + "｜".join(parts)
+
+def _anomaly_line(anomalies):
+    """一行異常變動：股票 主動變化 / 權重變化 與 z 分數 (和該股票自己過去的變動相比)"""
+    if not anomalies:
+        return ""
+    parts = []
+    for a in anomalies:
+        parts.append(f"{a['股票代號']} {a['股票名稱']} 主動 {a['主動變化(%)']:+.1f}% / 權重 {a['權重變化']:+.2f} (z {a['z']:+.1f})")
+    return "⚠️ 異常變動: " + "｜".join(parts)
+
+def _info_lines(stats, sectors, anomalies):
+    """組合統計 / 族群 / 異常三行中有內容的那幾行 (沒有資料的不輸出空白段落)"""
+    return [line for line in (_stats_line(stats), _sectors_line(sectors), _anomaly_line(anomalies)) if line]
+
+def _generated_at(output_path, label):
+    """頁面載入時才去讀 meta/<報表>.json 顯示產生時間 (歷史報表沒有 meta 檔時不顯示)"""
+    meta_url = meta_path(os.path.basename(output_path)).replace(os.sep, "/")
+    return (f'<span id="generated-at"></span><script>fetch("{meta_url}").then(r => r.json())'
+            f'.then(m => {{ document.getElementById("generated-at").textContent = "{label}: " + m.generated_at; }})'
+            '.catch(() => {});</script>')
+
+# ------------------------------------------
+# 野村 (980a / 985a)：Bootstrap 表格
+# ------------------------------------------
+NOMURA_LABELS = {'first': '首次建立', 'new': '新買入', 'exit': '全部賣出', 'up': '加碼', 'down': '減碼', 'same': '持平'}
+
+def render_nomura(cfg, diff, output_path, report_date, baseline_name=None, stats=None, sectors=None, anomalies=None):
+    table_rows = ""
+    for row in diff.rename(columns={'權重(%)': '權重'}).itertuples(index=False):
+        kind, change = row.變動, row.股數變化
+
+        # 狀態標籤顏色
+        badge_class = "bg-secondary"
+        if kind in ('new', 'up'): badge_class = "bg-danger"
+        elif kind in ('exit', 'down'): badge_class = "bg-success"
+
+        # 數值顏色
+        text_class = ""
+        change_str = "-"
+        if change > 0:
+            text_class = "text-danger fw-bold"
+            change_str = f"▲ {int(change):,}"
+        elif change < 0:
+            text_class = "text-success fw-bold"
+            change_str = f"▼ {int(change):,}"
+
+        table_rows += f"""
+        <tr>
+            <td><span class="badge {badge_class}">{NOMURA_LABELS[kind]}</span></td>
+            <td>{row.股票代號}</td>
+            <td>{row.股票名稱}</td>
+            <td class="text-end">{_shares(row.股數)}</td>
+            <td class="text-end {text_class}">{change_str}</td>
+            <td class="text-end">{_weight(row.權重)}%</td>
+        </tr>
+        """
+
+    info = "\n            ".join(f'<p class="text-muted small">{line}</p>' for line in _info_lines(stats, sectors, anomalies))
+    html_content = f"""
+    <!DOCTYPE html>
+    <html lang="zh-TW">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>{cfg['name']} 持股追蹤日報</title>
+        <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+        <style>
+            body {{ background-color: #f0f2f5; padding: 20px; font-family: "Microsoft JhengHei", sans-serif; }}
+            .container {{ background-color: white; padding: 30px; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.08); }}
+            h2 {{ color: #333; font-weight: bold; }}
+            .footer {{ margin-top: 20px; font-size: 0.85em; color: #888; text-align: right; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="d-flex justify-content-between align-items-center mb-4">
+                <h2>📊 {cfg['name']} 持股變動追蹤</h2>
+                <span class="badge bg-primary fs-6">資料日期: {report_date}</span>
+            </div>
+            {info}
+
+            <div class="table-responsive">
+                <table class="table table-hover align-middle">
+                    <thead class="table-dark">
+                        <tr>
+                            <th>狀態</th>
+                            <th>代號</th>
+                            <th>名稱</th>
+                            <th class="text-end">持有股數</th>
+                            <th class="text-end">較昨日增減</th>
+                            <th class="text-end">權重</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                        {table_rows}
+                    </tbody>
+                </table>
+            </div>
+            <div class="footer">
+                {_generated_at(output_path, '報表生成時間')}
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    atomic_write_text(output_path, html_content)
+
+# ------------------------------------------
+# 統一 (981a)：異動卡片 + 完整持股表
+# ------------------------------------------
+EZMONEY_BADGES = {'new': ('badge-new', '建倉'), 'exit': ('badge-exit', '清倉'), 'up': ('badge-up', '加碼'), 'down': ('badge-down', '減碼')}
+EZMONEY_ORDER = {'new': 0, 'up': 1, 'down': 2, 'exit': 3}
+
+def _ezmoney_message(kind, change):
+    if kind == 'new':
+        return f"買進 {change:,.0f} 股"
+    if kind == 'exit':
+        return "全數賣出"
+    return f"+{change:,.0f} 股" if change > 0 else f"-{abs(change):,.0f} 股"
+
+def render_ezmoney(cfg, diff, output_path, report_date, baseline_name=None, stats=None, sectors=None, anomalies=None):
+    current = diff[diff['股數'] > 0].sort_values('權重(%)', ascending=False, kind='stable')
+    changes = diff[diff['變動'].isin(list(EZMONEY_ORDER))]
+    changes = changes.iloc[changes['變動'].map(EZMONEY_ORDER).argsort(kind='stable')]
+
+    table_rows = ""
+    for row in current.rename(columns={'權重(%)': '權重'}).itertuples(index=False):
+        table_rows += f"""
+        <tr>
+            <td><span class="code-badge">{row.股票代號}</span> {row.股票名稱}</td>
+            <td class="text-right">{_shares(row.股數)}</td>
+            <td class="text-right">{_weight(row.權重)}%</td>
+        </tr>
+        """
+
+    date_line = "<br>".join([f"更新時間: {report_date}"] + _info_lines(stats, sectors, anomalies))
+    html_content = f"""
+    <!DOCTYPE html>
+    <html lang="zh-TW">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>ETF 持股監控報告</title>
+        <style>
+            body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; background-color: #f8f9fa; color: #333; margin: 0; padding: 20px; }}
+            .container {{ max_width: 800px; margin: 0 auto; background: #fff; padding: 20px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
+            h1 {{ text-align: center; color: #2c3e50; font-size: 22px; margin-bottom: 5px; }}
+            .date {{ text-align: center; color: #7f8c8d; font-size: 13px; margin-bottom: 30px; }}
+            h2 {{ font-size: 18px; border-left: 5px solid #3498db; padding-left: 10px; margin-top: 30px; margin-bottom: 15px; color: #2c3e50; }}
+            .card {{ border: 1px solid #eee; border-radius: 8px; padding: 12px 15px; margin-bottom: 10px; display: flex; justify-content: space-between; align-items: center; background: #fff; }}
+            .badge {{ padding: 4px 8px; border-radius: 4px; font-size: 12px; font-weight: bold; color: #fff; min-width: 50px; text-align: center; }}
+            .bg-new {{ border-left: 4px solid #e74c3c; }}
+            .bg-exit {{ border-left: 4px solid #2ecc71; }}
+            .badge-new {{ background-color: #e74c3c; }}
+            .badge-up {{ background-color: #e67e22; }}
+            .badge-exit {{ background-color: #27ae60; }}
+            .badge-down {{ background-color: #2ecc71; }}
+            .stock-info {{ display: flex; flex-direction: column; }}
+            .stock-name {{ font-weight: 600; font-size: 16px; }}
+            .stock-code {{ font-size: 12px; color: #999; }}
+            .change-msg {{ font-size: 13px; font-weight: 500; text-align: right; margin-top: 4px; }}
+            .empty-msg {{ text-align: center; color: #bbb; padding: 15px; font-style: italic; background: #f9f9f9; border-radius: 5px; }}
+            table {{ width: 100%; border-collapse: collapse; margin-top: 10px; }}
+            th, td {{ padding: 12px 8px; border-bottom: 1px solid #eee; font-size: 14px; }}
+            th {{ background-color: #f8f9fa; color: #666; font-weight: 600; text-align: left; }}
+            tr:last-child td {{ border-bottom: none; }}
+            .text-right {{ text-align: right; font-family: 'SF Mono', Consolas, 'Courier New', monospace; }}
+            .code-badge {{ background: #eee; color: #555; padding: 2px 6px; border-radius: 4px; font-size: 12px; margin-right: 5px; }}
+            footer {{ margin-top: 40px; text-align: center; font-size: 12px; color: #ccc; border-top: 1px solid #eee; padding-top: 10px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h1>📊 ETF 持股監控日報</h1>
+            <div class="date">{date_line}</div>
+            <h2>🔥 今日持股變動</h2>
+            <div id="changes-list">
+    """
+
+    if changes.empty:
+        html_content += '<div class="empty-msg">今日持股無任何變動 (或無舊資料可比對)</div>'
+    else:
+        for row in changes.itertuples(index=False):
+            card_class = "bg-new" if row.變動 in ['new', 'up'] else "bg-exit"
+            msg_color = '#c0392b' if row.變動 in ['new', 'up'] else '#27ae60'
+            badge_class, badge_text = EZMONEY_BADGES[row.變動]
+
+            html_content += f"""
+            <div class="card {card_class}">
+                <div class="stock-info"><span class="stock-name">{row.股票名稱}</span><span class="stock-code">{row.股票代號}</span></div>
+                <div style="text-align: right;"><span class="badge {badge_class}">{badge_text}</span><div class="change-msg" style="color: {msg_color}">{_ezmoney_message(row.變動, row.股數變化)}</div></div>
+            </div>
+            """
+
+    html_content += f"""
+            </div>
+            <h2>📋 當前完整持股 ({len(current)} 檔)</h2>
+            <table>
+                <thead><tr><th>股票名稱</th><th class="text-right">持有股數</th><th class="text-right">權重</th></tr></thead>
+                <tbody>{table_rows}</tbody>
+            </table>
+            <footer>Generated by GitHub Actions | Source: ezmoney</footer>
+        </div>
+    </body>
+    </html>
+    """
+    atomic_write_text(output_path, html_content)
+
+# ------------------------------------------
+# 群益 (982a)：pandas Styler 表格
+# ------------------------------------------
+CAPITAL_LABELS = {'first': '🆕 首次抓取', 'new': '🔥 新進', 'exit': '👋 賣出', 'up': '🔺 增加', 'down': '🔻 減少', 'same': '➖ 持平'}
+
+def render_capital(cfg, diff, output_path, report_date, baseline_name=None, stats=None, sectors=None, anomalies=None):
+    df = pd.DataFrame({
+        '股票代號': diff['股票代號'], '股票名稱': diff['股票名稱'], '權重(%)': diff['權重(%)'],
+        '持有股數': diff['股數'], '股數變化': diff['股數變化'], '狀態': diff['變動'].map(CAPITAL_LABELS),
+    }).sort_values(by=['權重(%)'], ascending=False, na_position='last', kind='stable')
+
+    def color_status(val):
+        color = 'black'
+        weight = 'normal'
+        if '新進' in val: color = 'red'; weight = 'bold'
+        elif '增加' in val: color = '#d9534f'
+        elif '減少' in val: color = 'green'
+        elif '賣出' in val: color = 'gray'; weight = 'bold'
+        return f'color: {color}; font-weight: {weight}'
+
+    def row_style(row):
+        if '賣出' in row['狀態']:
+            return ['background-color: #f9f9f9; color: #999'] * len(row)
+        return [''] * len(row)
+
+    try:
+        styler = df.style.map(color_status, subset=['狀態'])
+    except AttributeError:
+        styler = df.style.applymap(color_status, subset=['狀態'])
+
+    # 固定 uuid，否則每次產生的 id 都不同
+    styler = styler.set_uuid(cfg['name']).apply(row_style, axis=1)\
+                   .format({'權重(%)': "{:.2f}", '持有股數': "{:,.0f}", '股數變化': "{:+,.0f}"})
+    html_content = styler.hide(axis="index").to_html()
+    info = "\n        ".join(f'<p style="color: #666;">{line}</p>' for line in _info_lines(stats, sectors, anomalies))
+
+    html_template = f"""
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <title>ETF 持股監控 - {report_date}</title>
+        <style>
+            body {{ font-family: "Microsoft JhengHei", Arial, sans-serif; margin: 20px; background-color: #fdfdfd; }}
+            h2 {{ color: #333; border-bottom: 2px solid #007bff; padding-bottom: 10px; }}
+            table {{ border-collapse: collapse; width: 100%; max-width: 900px; margin-top: 15px; box-shadow: 0 0 10px rgba(0,0,0,0.1); }}
+            th {{ background-color: #007bff; color: white; padding: 12px; text-align: left; }}
+            td {{ border-bottom: 1px solid #ddd; padding: 10px; }}
+            tr:hover {{ background-color: #f1f1f1; }}
+        </style>
+    </head>
+    <body>
+        <h2>📊 {cfg['name']} 持股變化日報 ({report_date})</h2>
+        {info}
+        {html_content}
+        <p style="color: #666; font-size: 0.9em;">{_generated_at(output_path, '資料產生時間')}</p>
+    </body>
+    </html>
+    """
+    atomic_write_text(output_path, html_template)
+
+# ------------------------------------------
+# 復華 (991a)：昨日 / 今日股數對照表
+# ------------------------------------------
+FHTRUST_LABELS = {'new': '<span class="status-new">🆕 第一次買進</span>',
+                  'exit': '<span class="status-sold">🚫 全部賣出</span>',
+                  'same': '━ 持股不變'}
+
+def _fhtrust_status(kind, change):
+    if kind == 'up':
+        return f'<span class="status-up">🔺 增加持股 ({int(change):+,})</span>'
+    if kind == 'down':
+        return f'<span class="status-down">🔻 減少持股 ({int(change):+,})</span>'
+    return FHTRUST_LABELS[kind]
+
+def render_fhtrust(cfg, diff, output_path, report_date, baseline_name=None, stats=None, sectors=None, anomalies=None):
+    html_style = """
+    <style>
+        body { font-family: "Microsoft JhengHei", sans-serif; margin: 20px; }
+        table { border-collapse: collapse; width: 100%; max-width: 1000px; }
+        th { background-color: #f2f2f2; position: sticky; top: 0; }
+        td, th { border: 1px solid #ddd; padding: 10px; text-align: left; }
+        tr:hover { background-color: #f5f5f5; }
+        .status-new { color: #0066cc; font-weight: bold; }
+        .status-up { color: #d9534f; font-weight: bold; } /* 紅色 */
+        .status-down { color: #5cb85c; font-weight: bold; } /* 綠色 */
+        .status-sold { color: #777; text-decoration: line-through; background-color: #eee; }
+    </style>
+    """
+    if (diff['變動'] == 'first').all():
+        # 尚無歷史備份資料，僅產生基本 HTML
+        table = diff[['股票代號', '股票名稱', '股數', '權重(%)']]
+        baseline_name = "(無)"
+    else:
+        table = pd.DataFrame({
+            '代號': diff['股票代號'], '名稱': diff['股票名稱'],
+            '昨日股數': diff['股數_old'].astype('int64'), '今日股數': diff['股數'].astype('int64'),
+            '異動狀態': [_fhtrust_status(k, c) for k, c in zip(diff['變動'], diff['股數變化'])],
+        })
+
+    info = "".join(f"<p>{line}</p>" for line in _info_lines(stats, sectors, anomalies))
+    atomic_write_text(output_path, (
+        f"<html><head><meta charset='utf-8'>{html_style}</head><body>"
+        f"<h1>ETF 每日持股異動報告 ({report_date})</h1>"
+        f"<p>比對基準檔案: {baseline_name}</p>"
+        f"{info}"
+        f"{table.to_html(index=False, escape=False)}"
+        "</body></html>"
+    ))
+
+STYLES = {
+    'nomura': render_nomura,
+    'ezmoney': render_ezmoney,
+    'capital': render_capital,
+    'fhtrust': render_fhtrust,
+}
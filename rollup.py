@@ -0,0 +1,150 @@
+import os
+import json
+import pandas as pd
+
+from history import FUNDS, list_snapshots, load_snapshot
+from snapshot_store import atomic_write_bytes, atomic_write_text
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+ROLLUP_DIR = "rollups"                      # rollups/<基金>_weekly.csv, rollups/<基金>_monthly.csv
+STATE_FILE = os.path.join(ROLLUP_DIR, "state.json")   # 各基金已彙整到哪一天
+FREQS = {
+    'weekly': 'W-SUN',   # 週一 ~ 週日為一週，以週一日期標示
+    'monthly': 'M',
+}
+ROLLUP_COLUMNS = ['期間', '股票代號', '股票名稱', '天數',
+                  '權重_開', '權重_收', '權重_低', '權重_高',
+                  '股數_開', '股數_收', '股數_低', '股數_高', '淨買賣股數']
+
+# ==========================================
+# 2. 彙整計算
+# ==========================================
+
+def rollup_path(fund, freq):
+    return os.path.join(ROLLUP_DIR, f"{fund}_{freq}.csv")
+
+def period_label(dates, freq):
+    periods = pd.DatetimeIndex(dates).to_period(FREQS[freq])
+    if freq == 'weekly':
+        return periods.start_time.strftime('%Y-%m-%d')
+    return periods.strftime('%Y-%m')
+
+def daily_wide(snapshots, fund):
+    """把快照讀成 [日期 x 股票] 的權重與股數寬表 (未持有補 0)"""
+    weights, shares, names = {}, {}, {}
+    for snap_date, path in snapshots:
+        df = load_snapshot(path, fund)
+        weights[snap_date] = pd.Series(df['權重(%)'].to_numpy(), index=df['股票代號'])
+        shares[snap_date] = pd.Series(df['股數'].to_numpy(), index=df['股票代號'])
+        names.update(zip(df['股票代號'], df['股票名稱']))
+    wide_w = pd.DataFrame(weights).T.fillna(0).sort_index()
+    wide_s = pd.DataFrame(shares).T.reindex(columns=wide_w.columns).fillna(0).sort_index()
+    return wide_w, wide_s, names
+
+def compute_rollup(wide_w, wide_s, names, freq, prev_close=None):
+    """
+    以期間分組一次算出所有股票的開/收/低/高，淨買賣股數 = 本期收盤股數 - 上期收盤股數。
+    prev_close: 第一個期間之前最後一天的股數 (Series，增量更新時使用)
+    """
+    labels = period_label(wide_w.index, freq)
+    g_w = wide_w.groupby(labels)
+    g_s = wide_s.groupby(labels)
+
+    close_s = g_s.last()
+    prev = close_s.shift(1)
+    if prev_close is not None:
+        prev.iloc[0] = prev_close.reindex(close_s.columns).fillna(0).to_numpy()
+    prev = prev.fillna(0)
+
+    parts = {
+        '權重_開': g_w.first(), '權重_收': g_w.last(), '權重_低': g_w.min(), '權重_高': g_w.max(),
+        '股數_開': g_s.first(), '股數_收': close_s, '股數_低': g_s.min(), '股數_高': g_s.max(),
+        '淨買賣股數': close_s - prev,
+    }
+    long = pd.concat({k: v.stack() for k, v in parts.items()}, axis=1)
+    long.index.names = ['期間', '股票代號']
+    long = long.reset_index()
+
+    # 整個期間都沒持有、也沒有買賣的股票不輸出
+    long = long[(long['股數_高'] > 0) | (long['淨買賣股數'] != 0)]
+    days = pd.Series(labels).value_counts()
+    long['天數'] = long['期間'].map(days).astype(int)
+    long['股票名稱'] = long['股票代號'].map(names)
+    share_cols = ['股數_開', '股數_收', '股數_低', '股數_高', '淨買賣股數']
+    long[share_cols] = long[share_cols].round().astype('int64')
+    weight_cols = ['權重_開', '權重_收', '權重_低', '權重_高']
+    long[weight_cols] = long[weight_cols].round(4)
+    return long[ROLLUP_COLUMNS]
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def load_rollup(fund, freq, code=None):
+    """查詢用：讀取某基金的週/月彙整 (可只取一檔股票)"""
+    path = rollup_path(fund, freq)
+    if not os.path.exists(path):
+        return None
+    df = pd.read_csv(path, dtype={'股票代號': str, '期間': str})
+    if code is not None:
+        df = df[df['股票代號'] == str(code)]
+    return df
+
+# ==========================================
+# 3. 增量更新
+# ==========================================
+
+def update_fund(fund, state, rebuild=False):
+    snapshots = list_snapshots(fund)
+    if not snapshots:
+        return 0
+    last_done = None if rebuild else state.get(fund)
+    # 上次彙整到的那一天也重算 (同一天重跑取代快照時，該期間的列跟著更新)
+    new = [s for s in snapshots if last_done is None or str(s[0].date()) >= last_done]
+    if not new:
+        return 0
+
+    for freq in FREQS:
+        path = rollup_path(fund, freq)
+        existing = None
+        if last_done is not None and os.path.exists(path):
+            existing = pd.read_csv(path, dtype={'股票代號': str, '期間': str})
+
+        if existing is None:
+            todo, prev_close = snapshots, None
+        else:
+            # 只重算「第一個新日期所在的期間」之後的資料，之前的期間保持不動
+            first_period = period_label([new[0][0]], freq)[0]
+            start = next(i for i, (d, _) in enumerate(snapshots) if period_label([d], freq)[0] == first_period)
+            todo = snapshots[start:]
+            prev_close = None
+            if start > 0:
+                _, prev_s, _ = daily_wide(snapshots[start - 1:start], fund)
+                prev_close = prev_s.iloc[-1]
+            existing = existing[existing['期間'] < first_period]
+
+        wide_w, wide_s, names = daily_wide(todo, fund)
+        fresh = compute_rollup(wide_w, wide_s, names, freq, prev_close)
+        result = fresh if existing is None else pd.concat([existing, fresh], ignore_index=True)
+        result = result.sort_values(['期間', '股票代號'])
+        atomic_write_bytes(path, result.to_csv(index=False).encode("utf-8-sig"))
+
+    state[fund] = str(snapshots[-1][0].date())
+    return len(new)
+
+def update_rollups(funds=None, rebuild=False):
+    os.makedirs(ROLLUP_DIR, exist_ok=True)
+    state = load_state()
+    for fund in funds or FUNDS:
+        added = update_fund(fund, state, rebuild)
+        print(f"   {fund}: +{added} 天" if added else f"   {fund}: 無新資料")
+    atomic_write_text(STATE_FILE, json.dumps(state, ensure_ascii=False, indent=2, sort_keys=True))
+    print(f"✅ 週/月彙整已更新: {ROLLUP_DIR}/")
+
+if __name__ == "__main__":
+    import sys
+    update_rollups(rebuild="--rebuild" in sys.argv[1:])
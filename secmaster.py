@@ -0,0 +1,178 @@
+import os
+import json
+from collections import Counter
+
+import pandas as pd
+
+from snapshot_store import atomic_write_text
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+MASTER_CSV = "secmaster.csv"      # 證券主檔：sid / 代號 / 標準名稱 / 別名
+MASTER_JSON = "secmaster.json"    # 給 total.html 用的精簡版 (代號 -> 名稱、別名 -> 代號、各基金欄位)
+ALIAS_SEP = "|"
+NAME_MARKERS = "*＊#"             # 名稱後面的標記 (國巨* 之類的註記)，選標準名稱時先去掉
+
+# ==========================================
+# 證券主檔：同一檔股票在各基金的名稱不同 (台積電 / 台灣積體電路製造 / 台灣積體)，
+# 代號欄位也不同 (股票代號 / 證券代號 / stocNo)。
+# 所有讀取都在進來時查一次主檔，之後跨基金、跨日期的比對只用整數 sid。
+#   by_code  : 代號 -> 紀錄 (hash 索引)
+#   by_alias : 任何出現過的名稱 -> 代號
+# ==========================================
+
+_master = None
+
+def _empty_master():
+    # changed: 載入後有新登記的股票或別名，還沒寫回檔案
+    return {'records': [], 'by_code': {}, 'by_alias': {}, 'changed': False}
+
+def clean_name(name):
+    """去掉名稱後面的標記符號 (國巨* -> 國巨)；別名仍保留原樣，查詢時帶標記的名稱也查得到"""
+    return str(name).rstrip(NAME_MARKERS).strip() or str(name)
+
+def _index(master, record):
+    master['by_code'][record['code']] = record
+    for alias in record['aliases']:
+        master['by_alias'].setdefault(alias, record['code'])
+
+def register(master, code, name=None):
+    """主檔沒有的代號就新增一筆 (sid 依序遞增，已發出的 sid 永不改變)"""
+    record = master['by_code'].get(code)
+    if record is None:
+        record = {'sid': len(master['records']), 'code': code, 'name': clean_name(name) if name else code, 'aliases': []}
+        master['records'].append(record)
+        master['by_code'][code] = record
+        master['changed'] = True
+    if name and name not in record['aliases']:
+        record['aliases'].append(name)
+        master['by_alias'].setdefault(name, code)
+        master['changed'] = True
+    return record
+
+def load_master(path=MASTER_CSV):
+    master = _empty_master()
+    if not os.path.exists(path):
+        return master
+    df = pd.read_csv(path, dtype=str, keep_default_na=False).sort_values('sid', key=lambda s: s.astype(int))
+    for sid, code, name, aliases in zip(df['sid'].astype(int), df['股票代號'], df['股票名稱'], df['別名']):
+        record = {'sid': sid, 'code': code, 'name': name, 'aliases': [a for a in aliases.split(ALIAS_SEP) if a]}
+        master['records'].append(record)
+        _index(master, record)
+    return master
+
+def get_master():
+    """整個程式共用一份主檔；主檔檔案不存在時才從歷史快照建一份 (只在記憶體)"""
+    global _master
+    if _master is None:
+        _master = load_master() if os.path.exists(MASTER_CSV) else build_master(save=False)
+    return _master
+
+def resolve(df, master=None):
+    """
+    統一欄位後的 DataFrame 查主檔：補上 sid，代號缺漏時用名稱反查。
+    主檔沒有的股票會當場登記 (新股第一次出現)，由 save_changes() 寫回檔案 (pipeline.commit 每次提交後呼叫)。
+    """
+    master = master or get_master()
+    codes = df['股票代號'].astype(str).str.strip()
+    missing = codes.isin(['', 'nan', 'None'])
+    if missing.any():
+        codes = codes.where(~missing, df['股票名稱'].map(master['by_alias']).fillna(''))
+
+    by_code = master['by_code']
+    for code, name in zip(codes, df['股票名稱']):
+        if code and (code not in by_code or name not in by_code[code]['aliases']):
+            register(master, code, name)
+
+    df = df.copy()
+    df['股票代號'] = codes
+    df['sid'] = [by_code[c]['sid'] if c else -1 for c in codes]
+    return df
+
+def save_changes(root="."):
+    """把 resolve() 當場登記的新股票 / 新別名寫回主檔；沒有變動時不寫。回傳是否有寫入"""
+    if _master is None or not _master['changed']:
+        return False
+    save_master(_master, root)
+    return True
+
+def name_of(code, master=None):
+    record = (master or get_master())['by_code'].get(str(code))
+    return record['name'] if record else str(code)
+
+def lookup(key, master=None):
+    """用代號或任一名稱查紀錄，查不到回傳 None"""
+    master = master or get_master()
+    key = str(key).strip()
+    code = key if key in master['by_code'] else master['by_alias'].get(key)
+    return master['by_code'].get(code) if code else None
+
+# ==========================================
+# 2. 由所有歷史快照建立主檔
+# ==========================================
+
+def build_master(root=".", save=True):
+    """
+    掃描每檔基金的所有快照，收集 (代號, 名稱) 與出現次數。
+    標準名稱取出現最多次的名稱 (先去掉 NAME_MARKERS 標記再計數，同次數取較短的)；既有主檔的 sid 保持不變。
+    """
+    from history import FUNDS, list_snapshots, load_snapshot
+
+    seen = Counter()
+    for fund in FUNDS:
+        for _, path in list_snapshots(fund, root):
+            try:
+                df = load_snapshot(path, fund, resolve=False)
+            except Exception as e:
+                print(f"讀取 {path} 失敗: {e}")
+                continue
+            seen.update(zip(df['股票代號'], df['股票名稱']))
+
+    master = load_master(os.path.join(root, MASTER_CSV))
+    names_by_code, clean_by_code = {}, {}
+    for (code, name), count in seen.items():
+        names_by_code.setdefault(code, Counter())[name] += count
+        clean_by_code.setdefault(code, Counter())[clean_name(name)] += count
+
+    for code in sorted(names_by_code):
+        clean = clean_by_code[code]
+        canonical = sorted(clean, key=lambda n: (-clean[n], len(n), n))[0]
+        record = register(master, code, canonical)
+        for name in sorted(names_by_code[code]):
+            register(master, code, name)
+        record['name'] = canonical
+
+    if save:
+        save_master(master, root)
+    return master
+
+def save_master(master, root="."):
+    from history import ARCHIVES
+
+    records = master['records']
+    df = pd.DataFrame({
+        'sid': [r['sid'] for r in records],
+        '股票代號': [r['code'] for r in records],
+        '股票名稱': [r['name'] for r in records],
+        '別名': [ALIAS_SEP.join(r['aliases']) for r in records],
+    })
+    atomic_write_text(os.path.join(root, MASTER_CSV), df.to_csv(index=False), encoding="utf-8-sig")
+
+    # 各基金基準檔的代號/名稱欄位 (由 history.ARCHIVES 反查)，total.html 不必再猜欄位名稱
+    columns = {}
+    for fund, cfg in ARCHIVES.items():
+        native = {canon: raw for raw, canon in cfg['columns'].items()}
+        columns[fund] = {'code': native['股票代號'], 'name': native['股票名稱'], 'weight': native['權重(%)']}
+    compact = {
+        'columns': columns,
+        'names': {r['code']: r['name'] for r in records},
+        'aliases': master['by_alias'],
+    }
+    atomic_write_text(os.path.join(root, MASTER_JSON), json.dumps(compact, ensure_ascii=False, separators=(',', ':')))
+    master['changed'] = False
+
+if __name__ == "__main__":
+    master = build_master()
+    multi = sum(1 for r in master['records'] if len(r['aliases']) > 1)
+    print(f"✅ 證券主檔已更新: {MASTER_CSV} / {MASTER_JSON} (共 {len(master['records'])} 檔，{multi} 檔有多個名稱)")
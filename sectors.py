@@ -0,0 +1,254 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from history import FUNDS, list_snapshots, load_snapshot, payload_price
+from flows import PRICE_CSV
+from snapshot_store import atomic_write_bytes
+from align import trading_axis, available_day, asof
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+INDUSTRY_CSV = "industry.csv"    # 手動維護的對照表：股票代號 / 股票名稱 / 產業 (證交所分類) / 族群 (散熱、PCB…)
+SECTOR_COLUMN = '族群'           # 依哪一欄彙整 (改成 '產業' 就是證交所的產業別)
+UNMAPPED = '未分類'              # 對照表沒有的股票
+SECTORS_DIR = "sectors"          # sectors/<基金>.csv：每天每個族群一列；sectors/all.csv：全體基金合計
+COHORT_CSV = os.path.join(SECTORS_DIR, "all.csv")
+TOP_SECTORS = 5                  # 報表上列出前幾大族群
+ROTATION_THRESHOLD = 0.5         # 族群權重較該基金前一份快照變動超過幾個百分點才算加碼 / 減碼
+# 修改對照表後，歷史資料要用 python sectors.py --rebuild 重算 (每天的增量更新只算新進來的快照)
+
+SECTOR_COLUMNS = ['日期', SECTOR_COLUMN, '持股檔數', '權重(%)', '市值']
+COHORT_COLUMNS = ['日期', SECTOR_COLUMN, '持有基金數', '合計權重(%)', '平均權重(%)', '合計市值', '加碼基金數', '減碼基金數']
+
+# ==========================================
+# 2. 對照表：股票代號 -> 整數族群代碼
+# ==========================================
+
+def load_mapping(path=INDUSTRY_CSV):
+    """回傳 {'codes': 排序後的代號, 'ids': 對應的族群代碼, 'names': 族群名稱 (最後一個是 未分類)}"""
+    if os.path.exists(path):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        df = df[df[SECTOR_COLUMN] != ''].sort_values('股票代號')
+    else:
+        df = pd.DataFrame({'股票代號': [], SECTOR_COLUMN: []})
+    names, ids = np.unique(df[SECTOR_COLUMN].to_numpy(str), return_inverse=True)
+    return {'codes': df['股票代號'].to_numpy(str), 'ids': ids, 'names': list(names) + [UNMAPPED]}
+
+def sector_ids(codes, mapping):
+    known = mapping['codes']
+    unmapped = len(mapping['names']) - 1
+    if len(known) == 0:
+        return np.full(len(codes), unmapped)
+    pos = np.clip(np.searchsorted(known, codes), 0, len(known) - 1)
+    return np.where(known[pos] == codes, mapping['ids'][pos], unmapped)
+
+def load_prices(path=PRICE_CSV):
+    """自備收盤價 (flows.py 的 prices.csv)，以 (日期, 股票代號) 為索引；沒有檔案時回傳 None"""
+    if not os.path.exists(path):
+        return None
+    df = pd.read_csv(path, dtype={'股票代號': str})
+    df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y-%m-%d')
+    return df.groupby(['日期', '股票代號'])['收盤價'].last()
+
+# ==========================================
+# 3. 彙整 (整段歷史一次 group-by；增量更新也用同一個函式)
+# ==========================================
+
+def aggregate(snapshots, fund, mapping, prices=None):
+    """
+    每列持股換成 (日期序號, 族群代碼) 的整數鍵，用 np.bincount 一次加總所有日期、所有族群的
+    權重 / 市值 / 檔數。市值 = 股數 × 價格 (快照內的價格優先，其次 prices.csv)，
+    族群內都沒有價格時為 NaN。
+    """
+    days = [d.strftime('%Y-%m-%d') for d, _ in snapshots]
+    day_idx, codes, weights, shares, unit = [], [], [], [], []
+    for i, (_, path) in enumerate(snapshots):
+        df = load_snapshot(path, fund, resolve=False)
+        price = payload_price(df)
+        day_idx.append(np.full(len(df), i))
+        codes.append(df['股票代號'].to_numpy(str))
+        weights.append(df['權重(%)'].to_numpy(np.float64))
+        shares.append(df['股數'].to_numpy(np.float64))
+        unit.append(price.to_numpy(np.float64) if price is not None else np.full(len(df), np.nan))
+    day_idx, codes, weights = np.concatenate(day_idx), np.concatenate(codes), np.concatenate(weights)
+    shares, unit = np.concatenate(shares), np.concatenate(unit)
+
+    if prices is not None:
+        missing = ~np.isfinite(unit)
+        keys = pd.MultiIndex.from_arrays([np.array(days)[day_idx[missing]], codes[missing]])
+        unit[missing] = prices.reindex(keys).to_numpy(np.float64)
+    values = shares * unit
+
+    n_sec = len(mapping['names'])
+    keys = day_idx * n_sec + sector_ids(codes, mapping)
+    size = len(snapshots) * n_sec
+    priced = np.isfinite(values)
+    count = np.bincount(keys, minlength=size)
+    weight = np.bincount(keys, weights=weights, minlength=size)
+    value = np.bincount(keys[priced], weights=values[priced], minlength=size)
+    n_priced = np.bincount(keys[priced], minlength=size)
+
+    hit = np.nonzero(count)[0]
+    names = np.array(mapping['names'], dtype=object)
+    table = pd.DataFrame({
+        '日期': np.array(days, dtype=object)[hit // n_sec],
+        SECTOR_COLUMN: names[hit % n_sec],
+        '持股檔數': count[hit],
+        '權重(%)': weight[hit].round(4),
+        '市值': np.where(n_priced[hit] > 0, value[hit].round(0), np.nan),
+    })
+    return table.sort_values(['日期', '權重(%)', SECTOR_COLUMN], ascending=[True, False, True],
+                             kind='stable')[SECTOR_COLUMNS].reset_index(drop=True)
+
+def sectors_path(fund):
+    return os.path.join(SECTORS_DIR, f"{fund}.csv")
+
+def load_sectors(fund):
+    path = sectors_path(fund)
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype={'日期': str, SECTOR_COLUMN: str})
+
+def update_fund(fund, rebuild=False, mapping=None, prices=None):
+    """
+    與 stats.py 相同：只彙整最後一天 (含) 之後的快照，最後一天一律重算 (同日重跑取代快照時跟著更新)；
+    沒有既有檔案或 rebuild=True 時整段歷史一次重算。回傳重算的天數。
+    """
+    snapshots = list_snapshots(fund)
+    if not snapshots:
+        return 0
+    mapping = mapping or load_mapping()
+    prices = prices if prices is not None else load_prices()
+    existing = None if rebuild else load_sectors(fund)
+
+    if existing is None or existing.empty:
+        table = aggregate(snapshots, fund, mapping, prices)
+        added = len(snapshots)
+    else:
+        last_done = existing['日期'].iloc[-1]
+        todo = [(d, p) for d, p in snapshots if d.strftime('%Y-%m-%d') >= last_done]
+        if not todo:
+            return 0
+        fresh = aggregate(todo, fund, mapping, prices)
+        kept = existing[existing['日期'] < todo[0][0].strftime('%Y-%m-%d')]
+        table = pd.concat([kept, fresh], ignore_index=True)
+        added = len(todo)
+
+    os.makedirs(SECTORS_DIR, exist_ok=True)
+    atomic_write_bytes(sectors_path(fund), table.to_csv(index=False).encode("utf-8-sig"))
+    return added
+
+# ==========================================
+# 4. 全體基金：同一個交易日各基金的族群權重相加 (沿用各基金當日或之前最近一份，見 align.py)
+# ==========================================
+
+def _on_trading_days(table):
+    """快照日期換成看得到它的交易日 (週末檔併入下週一)；同一交易日有好幾份時只留最後一份"""
+    day = pd.Series(available_day(table['日期'].to_numpy(str)).astype(str), index=table.index)
+    table = table[table['日期'] == table['日期'].groupby(day).transform('max')]
+    return table.assign(日期=day[table.index])
+
+def cohort_frame(tables):
+    """
+    tables: 基金 -> 該基金的族群長表。回傳每個交易日每個族群一列：
+      合計權重 = 各基金權重直接相加 (與 exposure.py 的合計權重同義)，平均權重 = 合計 / 當天有資料的基金數，
+      加碼 / 減碼基金數 = 當天有新快照、且該族群權重較自己前一份快照變動超過 ROTATION_THRESHOLD 的基金數
+      (好幾檔基金同時加碼同一族群 = 族群輪動)。
+    沿用超過 align.STALE_DAYS 個交易日的快照不算當天的資料 (與 overlap.py / exposure.py 相同)。
+    """
+    tables = {f: _on_trading_days(t) for f, t in tables.items() if t is not None and not t.empty}
+    if not tables:
+        return pd.DataFrame(columns=COHORT_COLUMNS)
+    dates = [str(d) for d in trading_axis(sorted(set().union(*(t['日期'] for t in tables.values()))))]
+    names = sorted(set().union(*(t[SECTOR_COLUMN] for t in tables.values())))
+
+    n_d, n_s = len(dates), len(names)
+    total_w, total_v = np.zeros((n_d, n_s)), np.zeros((n_d, n_s))
+    has_v = np.zeros((n_d, n_s), dtype=bool)
+    holders, up, down = (np.zeros((n_d, n_s), dtype=np.int64) for _ in range(3))
+    n_data = np.zeros(n_d, dtype=np.int64)
+
+    for table in tables.values():
+        live = ~asof(np.unique(table['日期'].to_numpy(str)), dates)['stale']
+        w = table.pivot(index='日期', columns=SECTOR_COLUMN, values='權重(%)').reindex(columns=names).fillna(0)
+        v = table.pivot(index='日期', columns=SECTOR_COLUMN, values='市值').reindex(columns=names)
+        change = w.diff().reindex(dates).fillna(0).to_numpy()
+        started = (np.asarray(dates) >= w.index[0]) & live
+        w = np.where(live[:, None], w.reindex(dates).ffill().fillna(0).to_numpy(), 0)
+        v = np.where(live[:, None], v.reindex(dates).ffill().to_numpy(), np.nan)
+
+        n_data += started
+        total_w += w
+        holders += w > 0
+        has_v |= np.isfinite(v)
+        total_v += np.nan_to_num(v)
+        up += change > ROTATION_THRESHOLD
+        down += change < -ROTATION_THRESHOLD
+
+    keep = (holders > 0) | (up > 0) | (down > 0)
+    di, si = np.nonzero(keep)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        average = total_w / np.maximum(n_data, 1)[:, None]
+    frame = pd.DataFrame({
+        '日期': np.array(dates, dtype=object)[di], SECTOR_COLUMN: np.array(names, dtype=object)[si],
+        '持有基金數': holders[di, si], '合計權重(%)': total_w[di, si].round(4),
+        '平均權重(%)': average[di, si].round(4),
+        '合計市值': np.where(has_v[di, si], total_v[di, si].round(0), np.nan),
+        '加碼基金數': up[di, si], '減碼基金數': down[di, si],
+    })
+    return frame.sort_values(['日期', '合計權重(%)', SECTOR_COLUMN], ascending=[True, False, True],
+                             kind='stable')[COHORT_COLUMNS].reset_index(drop=True)
+
+# ==========================================
+# 5. 報表用
+# ==========================================
+
+def top_sectors(table, day=None, top=TOP_SECTORS):
+    """某一天 (預設最後一天) 權重前幾大的族群，附上與前一份快照相比的權重變化 (list of dict)"""
+    if table is None or table.empty:
+        return None
+    dates = table['日期'].drop_duplicates().tolist()
+    day = day or dates[-1]
+    if day not in dates:
+        return None
+    i = dates.index(day)
+    prev = table[table['日期'] == dates[i - 1]] if i > 0 else None
+    return _sector_entries(table[table['日期'] == day].head(top), prev)
+
+def sectors_by_day(table, days=None, top=TOP_SECTORS):
+    """每一天 (或只取 days 這幾天) 的 top_sectors() (dict: 日期 -> list)，重建歷史報表時整張表只分組一次"""
+    if table is None or table.empty:
+        return {}
+    result, prev = {}, None
+    for day, today in table.groupby('日期', sort=False):
+        if days is None or day in days:
+            result[day] = _sector_entries(today.head(top), prev)
+        prev = today
+    return result
+
+def _sector_entries(today, prev):
+    prev = None if prev is None else dict(zip(prev[SECTOR_COLUMN], prev['權重(%)']))
+    return [{'name': name, 'weight': weight, 'count': count,
+             'change': np.nan if prev is None else weight - prev.get(name, 0.0)}
+            for name, weight, count in zip(today[SECTOR_COLUMN], today['權重(%)'], today['持股檔數'])]
+
+def latest_sectors(fund):
+    return top_sectors(load_sectors(fund))
+
+def update_sectors(funds=None, rebuild=False):
+    mapping, prices = load_mapping(), load_prices()
+    for fund in funds or FUNDS:
+        added = update_fund(fund, rebuild, mapping, prices)
+        print(f"   {fund}: 重算 {added} 天" if added else f"   {fund}: 無新資料")
+
+    cohort = cohort_frame({fund: load_sectors(fund) for fund in FUNDS})
+    os.makedirs(SECTORS_DIR, exist_ok=True)
+    atomic_write_bytes(COHORT_CSV, cohort.to_csv(index=False).encode("utf-8-sig"))
+    print(f"✅ {SECTOR_COLUMN}曝險已更新: {SECTORS_DIR}/ ({len(mapping['names']) - 1} 個{SECTOR_COLUMN}，對照表 {INDUSTRY_CSV})")
+
+if __name__ == "__main__":
+    import sys
+    update_sectors(rebuild="--rebuild" in sys.argv[1:])
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl，改用獨占建立鎖檔
+    fcntl = None
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+LOCK_DIR = ".locks"            # 每檔基金一個鎖檔
+MANIFEST_DIR = "manifests"     # 每檔基金一份 manifest，記錄目前的比對基準 (本機紀錄，不進 git)
+META_DIR = "meta"              # 每份報表一個小檔，記錄產生時間 (報表本身不含會變動的時間；跟報表一起進 git，見 pipeline.output_paths)
+LOCK_TIMEOUT = 600             # 等待鎖的最長秒數
+
+# ==========================================
+# 2. 鎖與原子寫入
+# ==========================================
+
+@contextmanager
+def fund_lock(fund, timeout=LOCK_TIMEOUT):
+    """
+    取得某基金的獨占鎖。同一基金的讀基準 -> 比對 -> 寫入必須在鎖內完成，
+    不同基金各自一把鎖，可以同時執行。
+    """
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    lock_path = os.path.join(LOCK_DIR, f"{fund}.lock")
+    deadline = time.time() + timeout
+
+    if fcntl is not None:
+        with open(lock_path, "w") as lock_file:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.time() > deadline:
+                        raise TimeoutError(f"等待 {fund} 的鎖逾時")
+                    time.sleep(0.2)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+            break
+        except FileExistsError:
+            if time.time() > deadline:
+                raise TimeoutError(f"等待 {fund} 的鎖逾時 (若無其他程式執行中，請刪除 {lock_path})")
+            time.sleep(0.2)
+    try:
+        yield
+    finally:
+        os.remove(lock_path)
+
+def atomic_write_bytes(path, data):
+    """先寫到同資料夾的暫存檔並 fsync，再用 os.replace 一次換上，中途當掉也不會留下半個檔案"""
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".tmp_", suffix=os.path.splitext(path)[1])
+    try:
+        # mkstemp 預設 0600，改回一般檔案權限，網頁與其他程式才讀得到
+        os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def atomic_write_text(path, text, encoding="utf-8"):
+    atomic_write_bytes(path, text.encode(encoding))
+
+# ==========================================
+# 3. 快照提交與 manifest
+# ==========================================
+
+def manifest_path(fund):
+    return os.path.join(MANIFEST_DIR, f"{fund}.json")
+
+def read_manifest(fund):
+    path = manifest_path(fund)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def unique_path(path):
+    """檔名已存在時加上流水號 (backup_xxx_1.csv)，避免同一秒內的兩次提交互相覆蓋備份"""
+    stem, ext = os.path.splitext(path)
+    candidate, n = path, 1
+    while os.path.exists(candidate):
+        candidate = f"{stem}_{n}{ext}"
+        n += 1
+    return candidate
+
+def commit_snapshot(fund, df, baseline_path, backup_path=None, archive_path=None):
+    """
+    提交一份新快照 (呼叫端需持有 fund_lock)：
+      1. backup_path: 先把目前的基準檔「複製」一份到備份位置 (不再 move，基準檔始終存在)
+      2. archive_path: 新快照另存一份歷史檔
+      3. 以 os.replace 原子地換上新的基準檔
+      4. 更新 manifest
+    任何一步失敗，舊的基準檔都還在。
+    """
+    data = df.to_csv(index=False).encode("utf-8-sig")
+
+    if backup_path and os.path.exists(baseline_path):
+        backup_path = unique_path(backup_path)
+        with open(baseline_path, "rb") as f:
+            atomic_write_bytes(backup_path, f.read())
+    else:
+        backup_path = None
+    if archive_path:
+        atomic_write_bytes(archive_path, data)
+    atomic_write_bytes(baseline_path, data)
+
+    manifest = {
+        'fund': fund,
+        'baseline': baseline_path,
+        'archive': archive_path,
+        'backup': backup_path,
+        'rows': int(len(df)),
+        'sha1': hashlib.sha1(data).hexdigest(),
+        'committed_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    atomic_write_text(manifest_path(fund), json.dumps(manifest, ensure_ascii=False, indent=2))
+    return manifest
+
+# ==========================================
+# 4. 報表產生紀錄
+# ==========================================
+
+def meta_path(output_path):
+    return os.path.join(META_DIR, os.path.basename(output_path) + ".json")
+
+def record_output(output_path, **fields):
+    """
+    報表內容只依資料而定 (同樣的資料產生同樣的位元組，git 差異只剩真正的異動)，
+    產生時間改記在 meta/<報表檔名>.json：generated_at 每次更新，changed_at 只在內容改變時更新。
+    """
+    with open(output_path, "rb") as f:
+        sha1 = hashlib.sha1(f.read()).hexdigest()
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    path = meta_path(output_path)
+    previous = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            previous = json.load(f)
+    meta = dict(fields, path=output_path, sha1=sha1, generated_at=now,
+                changed_at=previous['changed_at'] if previous.get('sha1') == sha1 else now)
+    atomic_write_text(path, json.dumps(meta, ensure_ascii=False, indent=2, sort_keys=True))
+    return meta
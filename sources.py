@@ -0,0 +1,102 @@
+import io
+import json
+import html
+
+import requests
+from requests.adapters import HTTPAdapter
+import pandas as pd
+from bs4 import BeautifulSoup
+
+# ==========================================
+# 1. 設定區：各家投信的網址 (測試時可改指向 mock_server.py)
+# ==========================================
+NOMURA_URL = "https://www.nomurafunds.com.tw/API/ETFAPI/api/Fund/GetFundAssets"
+EZMONEY_URL = "https://www.ezmoney.com.tw/ETF/Fund/Info?fundCode={code}"
+CAPITAL_URL = "https://www.capitalfund.com.tw/CFWeb/api/etf/buyback"
+FHTRUST_URL = "https://www.fhtrust.com.tw/api/assetsExcel/{etf}/{date}"
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+POOL_SIZE = 32     # 每個網站保留的連線數 (批次執行時同一家投信的多檔基金共用連線)
+
+# 所有基金共用一個 Session：同一家投信的請求重用 TCP/TLS 連線
+SESSION = requests.Session()
+SESSION.headers["User-Agent"] = USER_AGENT
+SESSION.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=POOL_SIZE))
+SESSION.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=POOL_SIZE))
+
+# ==========================================
+# 2. 各家轉接器：(參數, 日期) -> 原始欄位的 DataFrame，尚未公布時回傳 None
+#    欄位名稱要與 funds.py 的 columns 對得上；數值清洗統一在 history.normalize 做
+# ==========================================
+
+def fetch_nomura(params, day):
+    """野村投信 API：回應中 TableTitle 為「股票」的表格"""
+    headers = {"Referer": "https://www.nomurafunds.com.tw/", "Origin": "https://www.nomurafunds.com.tw"}
+    payload = {"FundID": params['fund_id'], "SearchDate": str(day)}
+    response = SESSION.post(NOMURA_URL, headers=headers, json=payload)
+    response.raise_for_status()
+    tables = response.json().get('Entries', {}).get('Data', {}).get('Table', [])
+    stock_data = next((t for t in tables if t['TableTitle'] == '股票'), None)
+    if not stock_data:
+        print("找不到股票資料表 (可能是假日或無資料)")
+        return None
+    columns = [col['Name'] for col in stock_data['Columns']]
+    return pd.DataFrame(stock_data['Rows'], columns=columns)
+
+def fetch_ezmoney(params, day):
+    """統一投信基金頁面：DataAsset div 的 data-content 裡 AssetCode 為 ST 的明細"""
+    response = SESSION.get(EZMONEY_URL.format(code=params['fund_code']))
+    response.raise_for_status()
+    data_div = BeautifulSoup(response.text, 'html.parser').find("div", id="DataAsset")
+    if not data_div:
+        return None
+
+    data = json.loads(html.unescape(data_div.get("data-content")))
+    stock_data = next((item.get("Details") for item in data if item.get("AssetCode") == "ST"), None)
+    if not stock_data:
+        return None
+
+    df = pd.DataFrame(stock_data)[['DetailCode', 'DetailName', 'Share', 'NavRate']]
+    df.columns = ['股票代號', '股票名稱', '股數', '權重(%)']
+    return df
+
+def fetch_capital(params, day):
+    """群益投信 buyback API (不帶日期時回傳最新一份)"""
+    headers = {"Referer": "https://www.capitalfund.com.tw/"}
+    response = SESSION.post(CAPITAL_URL, json={"fundId": params['fund_id'], "date": None}, headers=headers)
+    response.raise_for_status()
+    raw_data = response.json()
+    if 'data' not in raw_data or 'stocks' not in raw_data['data']:
+        print("⚠️ 資料結構異常。")
+        return None
+    if not raw_data['data']['stocks']:
+        print("⚠️ API 回傳的 'stocks' 列表是空的。")
+        return None
+
+    df = pd.DataFrame(raw_data['data']['stocks'])[['stocNo', 'stocName', 'weight', 'shareFormat']]
+    df.columns = ['股票代號', '股票名稱', '權重(%)', '持有股數']
+    return df
+
+def fetch_fhtrust(params, day):
+    """復華投信持股 Excel：先找到「證券名稱」那一列當表頭，再去掉合計與備註列"""
+    response = SESSION.get(FHTRUST_URL.format(etf=params['etf_code'], date=day.strftime("%Y%m%d")))
+    response.raise_for_status()
+
+    raw_df = pd.read_excel(io.BytesIO(response.content), header=None)
+    header_rows = [i for i, row in enumerate(raw_df.itertuples(index=False)) if "證券名稱" in row]
+    if not header_rows:
+        raise ValueError("在 Excel 中找不到 '證券名稱' 欄位，請檢查官網檔案格式是否更動。")
+
+    # 表頭以上的標題列不必再讀一次檔案，直接從已讀入的表格切出來
+    df = raw_df.iloc[header_rows[0] + 1:].copy()
+    df.columns = [str(c).strip() for c in raw_df.iloc[header_rows[0]]]
+    df = df.dropna(how='all')
+    df = df[~df.iloc[:, 0].astype(str).str.contains("合計|備註|註", na=False)]
+    return df.reset_index(drop=True)
+
+ADAPTERS = {
+    'nomura': fetch_nomura,
+    'ezmoney': fetch_ezmoney,
+    'capital': fetch_capital,
+    'fhtrust': fetch_fhtrust,
+}
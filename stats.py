@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from history import FUNDS, list_snapshots, load_snapshot
+from snapshot_store import atomic_write_bytes
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+STATS_DIR = "stats"      # stats/<基金>.csv：每天一列的組合統計 (最後一列即最新)
+TOP_N = 10               # 前幾大持股合計權重
+STATS_COLUMNS = ['日期', '持股檔數', '新進檔數', '出清檔數', '單邊換手率(%)',
+                 f'前{TOP_N}大權重(%)', 'HHI', '有效持股數']
+
+# ==========================================
+# 2. 統計計算 (全量重算與增量更新共用同一個向量化函式)
+# ==========================================
+
+def stats_path(fund):
+    return os.path.join(STATS_DIR, f"{fund}.csv")
+
+def window_arrays(frames):
+    """把連續幾份快照排成 [日期, 股票] 的股數與權重矩陣 (未持有補 0)，回傳 (股票代號, 股數, 權重)"""
+    codes = np.unique(np.concatenate([df['股票代號'].to_numpy(str) for df in frames]))
+    shares = np.zeros((len(frames), len(codes)))
+    weights = np.zeros((len(frames), len(codes)))
+    for i, df in enumerate(frames):
+        cols = np.searchsorted(codes, df['股票代號'].to_numpy(str))
+        shares[i, cols] = df['股數'].to_numpy(np.float64)
+        weights[i, cols] = df['權重(%)'].to_numpy(np.float64)
+    return codes, shares, weights
+
+def compute_stats(shares, weights):
+    """
+    每一列 (一天) 的組合統計；第一列沒有前一天可比，換手率與新進 / 出清為 NaN。
+      單邊換手率 = min(買進, 賣出)，買賣金額以「股數變化 × 每股權重」換算成占淨值的 %，
+                   每股權重取當天的 權重/股數 (出清的股票取前一天的)，申購買回造成的同向增減會互相抵掉
+      HHI        = Σ (個股權重 / 股票部位合計權重)² × 10000
+      有效持股數 = 10000 / HHI
+    """
+    prev_s = np.zeros_like(shares)
+    prev_w = np.zeros_like(weights)
+    prev_s[1:], prev_w[1:] = shares[:-1], weights[:-1]
+    held, prev_held = shares > 0, prev_s > 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_share = np.where(held, weights / np.where(held, shares, 1), prev_w / np.where(prev_held, prev_s, 1))
+    delta = (shares - prev_s) * per_share
+    turnover = np.minimum(np.clip(delta, 0, None).sum(axis=1), np.clip(-delta, 0, None).sum(axis=1))
+
+    total = weights.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hhi = ((weights / total) ** 2).sum(axis=1) * 10000
+        effective = 10000 / hhi
+    top = -np.sort(-weights, axis=1)[:, :TOP_N].sum(axis=1)
+
+    new = (held & ~prev_held).sum(axis=1).astype(np.float64)
+    exit_ = (~held & prev_held).sum(axis=1).astype(np.float64)
+    turnover[0] = new[0] = exit_[0] = np.nan
+
+    return pd.DataFrame({
+        '持股檔數': held.sum(axis=1),
+        '新進檔數': pd.array(new, dtype='Int64'), '出清檔數': pd.array(exit_, dtype='Int64'),
+        '單邊換手率(%)': turnover.round(4),
+        f'前{TOP_N}大權重(%)': top.round(4),
+        'HHI': hhi.round(2), '有效持股數': effective.round(2),
+    })
+
+def stats_frame(snapshots, fund, has_prev=False):
+    """
+    snapshots 的每一天算一列；has_prev=True 時第一份只當比較基準，不輸出。
+    同一基金內以股票代號對齊即可，不查證券主檔。
+    """
+    frames = [load_snapshot(path, fund, resolve=False) for _, path in snapshots]
+    _, shares, weights = window_arrays(frames)
+    table = compute_stats(shares, weights)
+    table.insert(0, '日期', [d.strftime('%Y-%m-%d') for d, _ in snapshots])
+    table = table.iloc[1:] if has_prev else table
+    return table[STATS_COLUMNS].reset_index(drop=True)
+
+def load_stats(fund):
+    path = stats_path(fund)
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype={'日期': str, '新進檔數': 'Int64', '出清檔數': 'Int64'})
+
+def latest_stats(fund):
+    """報表用：最新一天的統計 (dict)，沒有資料時回傳 None"""
+    table = load_stats(fund)
+    if table is None or table.empty:
+        return None
+    return table.iloc[-1].to_dict()
+
+# ==========================================
+# 3. 增量更新
+# ==========================================
+
+def update_fund(fund, rebuild=False):
+    """
+    只算新進來的快照 (加上前一份當比較基準)，每天的成本與歷史長度無關；
+    最後一天也一律重算，同一天重跑取代了快照時統計跟著更新。
+    沒有既有檔案或 rebuild=True 時整段歷史一次向量化重算 (回補用)。回傳重算的天數。
+    """
+    snapshots = list_snapshots(fund)
+    if not snapshots:
+        return 0
+    existing = None if rebuild else load_stats(fund)
+
+    if existing is None or existing.empty:
+        table = stats_frame(snapshots, fund)
+        added = len(table)
+    else:
+        last_done = existing['日期'].iloc[-1]
+        start = next((i for i, (d, _) in enumerate(snapshots) if d.strftime('%Y-%m-%d') >= last_done), len(snapshots))
+        if start == len(snapshots):
+            return 0
+        fresh = stats_frame(snapshots[max(start - 1, 0):], fund, has_prev=start > 0)
+        kept = existing[existing['日期'] < fresh['日期'].iloc[0]]
+        table = pd.concat([kept, fresh], ignore_index=True)
+        added = len(fresh)
+
+    os.makedirs(STATS_DIR, exist_ok=True)
+    atomic_write_bytes(stats_path(fund), table.to_csv(index=False).encode("utf-8-sig"))
+    return added
+
+def update_stats(funds=None, rebuild=False):
+    for fund in funds or FUNDS:
+        added = update_fund(fund, rebuild)
+        print(f"   {fund}: 重算 {added} 天" if added else f"   {fund}: 無新資料")
+    print(f"✅ 組合統計已更新: {STATS_DIR}/")
+
+if __name__ == "__main__":
+    import sys
+    update_stats(rebuild="--rebuild" in sys.argv[1:])
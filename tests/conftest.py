@@ -0,0 +1,81 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# 腳本都放在專案根目錄，測試直接 import
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import secmaster
+from funds import REGISTRY
+from history import to_native
+from trading_calendar import trading_days
+
+# ==========================================
+# 合成歷史：每檔基金 14 ~ 16 檔持股，股數逐日小幅變動，
+# 每 7 天換掉一檔、第 SPIKE_DAY 天大買一檔 (讓異常偵測有東西可抓)
+# ==========================================
+CODES = [str(1101 + i) for i in range(20)]
+SPIKE_DAY = 24
+
+def holdings(fund, n):
+    """某基金第 n 個交易日的持股 (統一欄位，含股價)"""
+    offset = sum(map(ord, fund)) % 4
+    rng = np.random.default_rng(1000 * offset + n)
+    codes = CODES[offset:offset + 14] + [CODES[14 + offset + (n // 7) % 2]]
+    base = np.array([1000 * (i + 1) for i in range(len(codes))], dtype=np.float64)
+    shares = np.round(base * (1 + 0.01 * n) * (1 + rng.normal(0, 0.003, len(codes))))
+    if n >= SPIKE_DAY:
+        shares[3] *= 1.5
+    price = np.array([20.0 + 7 * CODES.index(c) for c in codes])
+    value = shares * price
+    return pd.DataFrame({
+        '股票代號': codes,
+        '股票名稱': [f"測試{c}" for c in codes],
+        '股數': shares,
+        '權重(%)': np.round(value / value.sum() * 95, 2),
+        '股價': price,
+        '市值': value,
+    })
+
+def write_history(fund, days, root="."):
+    """
+    依基金的存檔方式寫出 days (連續交易日) 每天一份快照：
+      captured : <基金>/<日期>.csv
+      replaced : 第 i 天的資料放在以第 i+1 天命名的備份檔，最後一天是基準檔 (history.list_snapshots 會往前挪一份)
+    """
+    cfg = REGISTRY[fund]
+    frames = [to_native(holdings(fund, n), fund) for n in range(len(days))]
+    stamps = [pd.Timestamp(d) for d in days]
+    if cfg['dated_by'] == 'captured':
+        targets = [cfg['archive'].format(today=s) for s in stamps]
+    else:
+        targets = [cfg['backup'].format(now=s + pd.Timedelta(hours=10), mtime=s) for s in stamps[1:]] + [cfg['baseline']]
+    for path, df in zip(targets, frames):
+        path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """腳本都以相對路徑讀寫，測試在暫存資料夾裡跑 (證券主檔也從空的開始)"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(secmaster, '_master', None)
+    return tmp_path
+
+@pytest.fixture
+def days():
+    """30 個連續交易日"""
+    return trading_days('2026-03-02', '2026-05-29')[:30]
+
+@pytest.fixture
+def history(workdir):
+    """回傳 write(funds, days)：在暫存資料夾寫出這幾檔基金的合成歷史"""
+    def write(funds, days):
+        for fund in funds:
+            write_history(fund, days)
+    return write
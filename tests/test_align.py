@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import align
+from panel import build_panel
+
+def _days(*dates):
+    return np.array(dates, dtype='datetime64[D]')
+
+def test_weekend_file_is_seen_on_monday():
+    assert align.available_day(_days('2026-03-07', '2026-03-08', '2026-03-09')).astype(str).tolist() == \
+        ['2026-03-09'] * 3
+    # 週五、週六 (週末檔) 兩份：週五看到的是週五那份，週一才看到週六那份，不會提早用到
+    axis = align.trading_axis(_days('2026-03-06', '2026-03-07'))
+    assert axis.astype(str).tolist() == ['2026-03-06', '2026-03-09']
+    a = align.asof(_days('2026-03-06', '2026-03-07'), axis)
+    assert a['pos'].tolist() == [0, 1]
+    assert a['fresh'].all()
+
+def test_skipped_days_reuse_the_last_snapshot():
+    snaps = _days('2026-03-02', '2026-03-05')
+    axis = align.trading_axis(snaps, end='2026-03-06')
+    a = align.asof(snaps, axis)
+    assert a['pos'].tolist() == [0, 0, 0, 1, 1]
+    assert a['age'].tolist() == [0, 1, 2, 0, 1]
+    assert a['fresh'].tolist() == [True, False, False, True, False]
+    assert not a['stale'].any()
+
+def test_old_snapshots_go_stale():
+    axis = align.trading_axis(_days('2026-03-02'), end='2026-03-13')
+    a = align.asof(_days('2026-03-02'), axis)
+    assert a['age'].tolist() == list(range(10))
+    assert a['stale'].tolist() == [age > align.STALE_DAYS for age in range(10)]
+
+def test_align_funds_indexes_the_concatenated_snapshots():
+    # 第二檔基金晚兩天才開始，沒有快照的日子 valid=False、age=-1
+    first, second = _days('2026-03-02', '2026-03-03', '2026-03-04'), _days('2026-03-04')
+    axis = align.trading_axis(np.concatenate([first, second]), end='2026-03-05')
+    a = align.align_funds([first, second], axis)
+    assert a['valid'].tolist() == [[True] * 4, [False, False, True, True]]
+    assert a['age'][1].tolist() == [-1, -1, 0, 1]
+    assert a['index'].tolist() == [[0, 1, 2, 2], [0, 0, 3, 3]]
+    assert a['pos'].tolist() == [[0, 1, 2, 2], [0, 0, 0, 0]]
+    assert a['stale'].sum() == 0
+
+def test_new_trading_days_after_last_update():
+    snaps = _days('2026-03-02', '2026-03-07')
+    assert align.new_trading_days(snaps, '2026-03-05').astype(str).tolist() == ['2026-03-06', '2026-03-09']
+    assert len(align.new_trading_days(snaps, '2026-03-09')) == 0
+
+def test_known_stock_on_the_trading_axis(workdir):
+    # 981a：週四 2330 100 股、週六 (週末檔) 150 股、下週二出清 (只剩 2317)
+    os.makedirs('981a')
+    for day, rows in [('2026-03-05', [('2330', 100)]), ('2026-03-07', [('2330', 150)]), ('2026-03-10', [('2317', 80)])]:
+        pd.DataFrame([(c, f"測試{c}", s, 10.0) for c, s in rows], columns=['股票代號', '股票名稱', '股數', '權重(%)'])\
+          .to_csv(f"981a/{day}.csv", index=False)
+    panel = build_panel(['981a'])
+    assert panel['dates'].astype(str).tolist() == ['2026-03-05', '2026-03-06', '2026-03-09', '2026-03-10']
+    tsmc = panel['codes'].index('2330')
+    assert panel['shares'][0, :, tsmc].tolist() == [100, 100, 150, 0]
+    assert panel['fresh'][0].tolist() == [True, False, True, True]
+    assert panel['age'][0].tolist() == [0, 1, 0, 0]
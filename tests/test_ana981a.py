@@ -0,0 +1,31 @@
+import os
+
+import pandas as pd
+
+import trajsearch
+from ana981a import index_trends, list_dated_files, stream_trends
+
+def test_stream_trends_by_hand(workdir):
+    # 週六的檔案算下週一 (同一天取較晚的那份)，沒有持股的日子不列
+    os.makedirs('981a')
+    for day, rows in [('2026-03-05', [('2330', 100, 5.0), ('2317', 50, 3.0)]),
+                      ('2026-03-06', [('2330', 0, 0.0), ('2317', 60, 3.5)]),
+                      ('2026-03-07', [('2330', 80, 4.0), ('2317', 60, 3.4)]),
+                      ('2026-03-09', [('2330', 90, 4.5), ('2317', 70, 3.8)])]:
+        pd.DataFrame(rows, columns=['股票代號', '股數', '權重(%)']).assign(股票名稱='x').to_csv(f"981a/{day}.csv", index=False)
+    trends = stream_trends(['2330'], list_dated_files('981a'))
+    assert trends == {'2330': {'dates': ['2026-03-05', '2026-03-09'], 'weights': [5.0, 4.5], 'shares': [100, 90]}}
+
+def test_index_trends_match_streamed_and_are_never_rebuilt(history, days):
+    codes = ['1101', '1105', '1115']
+    history(['981a'], days[:20])
+    files = list_dated_files('981a')
+    assert index_trends(codes, [d for d, _ in files]) is None          # 沒有索引：不重建，交給呼叫端
+    assert not os.path.exists(trajsearch.INDEX_NPY)
+
+    trajsearch.update_index()
+    assert index_trends(codes, [d for d, _ in files]) == stream_trends(codes, files)
+
+    history(['981a'], days[:22])                                         # 索引落後資料夾兩天
+    files = list_dated_files('981a')
+    assert index_trends(codes, [d for d, _ in files]) is None
@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import anomaly
+from conftest import SPIKE_DAY
+
+def _state(fund):
+    with open(anomaly.state_path(fund), encoding="utf-8") as f:
+        return json.load(f)
+
+def _assert_same_state(got, want):
+    assert got['as_of'] == want['as_of'] and got['base_date'] == want['base_date']
+    for block in ('cur', 'base'):
+        assert got[block]['codes'] == want[block]['codes']
+        for field in anomaly.STATE_FIELDS:
+            assert got[block][field] == want[block][field]   # 增量與全量用同一個 Welford，結果完全相同
+
+@pytest.mark.parametrize('fund', ['981a', '980a'])
+def test_incremental_matches_rebuild(history, days, fund):
+    history([fund], days[:20])
+    anomaly.update_fund(fund)
+    for n in range(21, len(days) + 1):
+        history([fund], days[:n])
+        anomaly.update_fund(fund)
+    flags, state = anomaly.load_flags(fund), _state(fund)
+
+    anomaly.update_fund(fund, rebuild=True)
+    pd.testing.assert_frame_equal(flags, anomaly.load_flags(fund))
+    _assert_same_state(state, _state(fund))
+
+def test_spike_is_flagged(history, days):
+    history(['981a'], days)
+    anomaly.update_fund('981a')
+    spike_day = str(days[SPIKE_DAY])
+    flags = anomaly.flags_on(anomaly.load_flags('981a'), spike_day, top=None)
+    assert flags and flags[0]['z'] > anomaly.Z_THRESHOLD
+    assert anomaly.latest_flags('981a') == anomaly.flags_on(anomaly.load_flags('981a'), str(days[-1]))
+
+def test_welford_by_hand():
+    # 一檔股票 5 天：1, 2, (沒持有), 4, 8；每天「之前」的 n / 平均 / M2
+    x = np.array([1.0, 2.0, np.nan, 4.0, 8.0])[:, None]
+    mask = ~np.isnan(x)
+    cnt, mean, m2, (n, mu, acc) = anomaly.expanding_before(x, mask)
+    assert cnt[:, 0].tolist() == [0, 1, 2, 2, 3]
+    assert mean[:, 0].tolist() == pytest.approx([0, 1, 1.5, 1.5, 7 / 3])
+    assert m2[:, 0].tolist() == pytest.approx([0, 0, 0.5, 0.5, 42 / 9])
+    assert (n[0], mu[0], acc[0]) == pytest.approx((4, 3.75, 28.75))
+
+    # 平均遠大於變異時仍準確 (Σx² - n·平均² 在這裡會整個相消)
+    _, _, m2, (_, _, acc) = anomaly.expanding_before(x + 1e9, mask)
+    assert m2[2, 0] == pytest.approx(0.5) and acc[0] == pytest.approx(28.75)
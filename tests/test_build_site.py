@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import struct
+import subprocess
+
+import numpy as np
+import pytest
+
+import build_site
+from build_site import EPOCH, MAGIC, WEIGHT_SCALE, col_dates, col_dict, col_float, col_int, encode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DTYPES = {v: k for k, v in build_site.DTYPES.items()}
+
+def decode(data):
+    """etfdata.js 的 decode 照抄成 Python (varint -> delta -> scale -> date / values)"""
+    assert data[:4] == MAGIC
+    head_len = struct.unpack("<I", data[4:8])[0]
+    header = json.loads(data[8:8 + head_len])
+    base = 8 + head_len
+    columns = {}
+    for c in header['columns']:
+        raw = data[base + c['offset']: base + c['offset'] + c['byteLength']]
+        values = np.frombuffer(raw, dtype=np.dtype(DTYPES[c['dtype']]).newbyteorder('<'))
+        if c.get('varint'):
+            out, v, shift = [], 0, 0
+            for b in values.tolist():
+                v |= (b & 0x7F) << shift
+                shift += 7
+                if not b & 0x80:
+                    out.append((v >> 1) ^ -(v & 1))
+                    v, shift = 0, 0
+            values = np.array(out, dtype=np.float64).reshape(c['shape'])
+        if c.get('delta'):
+            values = np.cumsum(values, axis=-1)
+        if c.get('scale'):
+            values = values / c['scale']
+        if c.get('date'):
+            values = (EPOCH + values.astype(np.int64)).astype(str)
+        elif 'values' in c:
+            values = np.array(c['values'])[values]
+        columns[c['name']] = values
+    return columns, header['meta']
+
+def _sample():
+    rng = np.random.default_rng(0)
+    dates = np.datetime64('2026-03-02') + np.cumsum(rng.integers(1, 4, 40))
+    shares = np.cumsum(rng.integers(-5000, 5000, (3, 40)), axis=1) + 10 ** 6
+    shares[1, 7] = -(2 ** 29)            # 大的負數差分 (多個 byte 的 varint)
+    weights = np.round(rng.uniform(0, 12, (3, 40)), 4)
+    return {
+        'date': col_dates(dates),
+        'code': col_dict(['2330', '2317', '2330', '6669']),
+        'shares': col_int(shares, delta=True),
+        'weight': col_int(weights, delta=True, scale=WEIGHT_SCALE),
+        'rows': col_int([1, 2, 300]),
+        'ratio': col_float([0.5, np.nan]),
+    }, dates, shares, weights
+
+def test_varint_delta_round_trip():
+    columns, dates, shares, weights = _sample()
+    decoded, meta = decode(encode(columns, {'asof': '2026-04-30'}))
+    assert meta == {'asof': '2026-04-30'}
+    assert decoded['date'].tolist() == dates.astype(str).tolist()
+    assert decoded['code'].tolist() == ['2330', '2317', '2330', '6669']
+    np.testing.assert_array_equal(decoded['shares'], shares)
+    np.testing.assert_allclose(decoded['weight'], weights, atol=0.5 / WEIGHT_SCALE)
+    assert decoded['rows'].tolist() == [1, 2, 300]
+    assert decoded['rows'].dtype == np.int16
+    assert decoded['ratio'][0] == 0.5 and np.isnan(decoded['ratio'][1])
+
+def test_columns_start_on_aligned_offsets():
+    data = encode(_sample()[0])
+    head_len = struct.unpack("<I", data[4:8])[0]
+    assert (8 + head_len) % build_site.ALIGN == 0
+    header = json.loads(data[8:8 + head_len])
+    assert all(c['offset'] % build_site.ALIGN == 0 for c in header['columns'])
+
+def test_values_that_do_not_fit_fall_back_to_float():
+    data, opts = col_int([1.5, np.nan])
+    assert opts == {} and data.dtype == np.float64
+
+@pytest.mark.skipif(shutil.which('node') is None, reason="沒有 node，無法執行 etfdata.js")
+def test_browser_decoder_agrees(tmp_path):
+    columns, dates, shares, weights = _sample()
+    path = tmp_path / "sample.bin"
+    path.write_bytes(encode(columns))
+    script = (
+        "const fs = require('fs');"
+        f"eval(fs.readFileSync({json.dumps(os.path.join(ROOT, 'etfdata.js'))}, 'utf8') + '; globalThis.E = ETFData;');"
+        f"const d = E.decode(new Uint8Array(fs.readFileSync({json.dumps(str(path))})));"
+        "const out = {}; for (const k in d.columns) out[k] = Array.from(d.columns[k]);"
+        "console.log(JSON.stringify(out));"
+    )
+    decoded = json.loads(subprocess.run(['node', '-e', script], capture_output=True, text=True, check=True).stdout)
+    assert decoded['date'] == dates.astype(str).tolist()
+    assert decoded['code'] == ['2330', '2317', '2330', '6669']
+    np.testing.assert_array_equal(np.reshape(decoded['shares'], shares.shape), shares)
+    np.testing.assert_allclose(np.reshape(decoded['weight'], weights.shape), weights, atol=0.5 / WEIGHT_SCALE)
+
+def test_exact_bytes():
+    # zigzag: 0, -1, 1, 300, -64 -> 0, 1, 2, 600, 127；600 = 0b100_1011000 -> 0xD8 0x04
+    assert build_site._varint(np.array([0, -1, 1, 300, -64])).tobytes() == b'\x00\x01\x02\xd8\x04\x7f'
+    # 2026-03-02 = 第 20514 天，差分 20514, 1, 3 -> zigzag 41028, 2, 6
+    assert col_dates(['2026-03-02', '2026-03-03', '2026-03-06'])[0].tobytes() == b'\xc4\xc0\x02\x02\x06'
+
+    head = b'{"columns":[{"name":"x","dtype":"i16","shape":[3],"offset":0,"byteLength":6}],"meta":{}}'
+    assert len(head) == 88   # 4 + 4 + 88 剛好對齊 8，不必補空白
+    assert encode({'x': col_int([1, 2, 300])}) == \
+        b'ETFB' + b'\x58\x00\x00\x00' + head + b'\x01\x00\x02\x00\x2c\x01' + b'\x00\x00'
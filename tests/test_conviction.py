@@ -0,0 +1,48 @@
+import numpy as np
+
+from conviction import compute_conviction, latest_table, percentile_rank, render_html, run_length
+
+def test_ties_get_the_same_percentile():
+    # 兩檔基金、一天、三檔股票；同值的不論在哪個位置分數都一樣
+    values = np.array([[[5, 3, 5]], [[3, 9, 0]]], dtype=float)
+    mask = np.array([[[True, True, True]], [[True, True, False]]])
+    pct = percentile_rank(values, mask)
+    assert pct[0, 0, 0] == pct[0, 0, 2] == 0.625
+    assert pct[0, 0, 1] == pct[1, 0, 0] == 0.125
+    assert pct[1, 0, 1] == 1
+    assert pct[1, 0, 2] == 0
+
+def test_all_tied_and_single_entry_sit_in_the_middle():
+    values = np.ones((3, 2, 4))
+    mask = np.zeros((3, 2, 4), dtype=bool)
+    mask[:, 0] = True
+    mask[1, 1, 2] = True
+    pct = percentile_rank(values, mask)
+    assert np.all(pct[:, 0] == 0.5)
+    assert pct[1, 1, 2] == 0.5
+    pct[1, 1, 2] = 0
+    assert np.all(pct[:, 1] == 0)
+
+def test_run_length_by_hand():
+    # 一檔基金一檔股票 6 天：加碼、加碼、(沒公布)、加碼、減碼、加碼
+    event = np.array([True, True, True, True, False, True])[None, :, None]
+    fresh = np.array([[True, True, False, True, True, True]])
+    assert run_length(event, fresh)[0, :, 0].tolist() == [1, 2, 2, 3, 0, 1]
+
+def test_lone_accumulating_holding_is_listed(tmp_path):
+    # 只有一檔正在連續加碼：各項排名都是 0.5，分數 50，加碼表要列出它
+    panel = {
+        'funds': ['981a'], 'codes': ['2330', '2317'], 'names': {'2330': '台積電', '2317': '鴻海'},
+        'dates': np.array(['2026-03-02', '2026-03-03', '2026-03-04'], dtype='datetime64[D]'),
+        'shares': np.array([[[100.0, 50.0], [110.0, 50.0], [120.0, 40.0]]]),
+        'weights': np.array([[[5.0, 3.0], [5.5, 3.0], [6.0, 2.5]]], dtype=np.float32),
+        'valid': np.ones((1, 3), dtype=bool), 'fresh': np.ones((1, 3), dtype=bool),
+    }
+    metrics = compute_conviction(panel)
+    table = latest_table(panel, metrics)
+    assert table['股票代號'].tolist() == ['2330', '2317']
+    assert table['信心分數'].tolist() == [50.0, 0.0]
+    assert table['連續加碼'].tolist() == [2, 0] and table['連續減碼'].tolist() == [0, 1]
+    render_html(table, '2026-03-04', str(tmp_path / 'conviction.html'))
+    html = (tmp_path / 'conviction.html').read_text(encoding='utf-8')
+    assert '台積電' in html.split('連續減碼中')[0]
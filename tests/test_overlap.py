@@ -0,0 +1,24 @@
+import numpy as np
+
+from overlap import compute_overlap
+
+def test_overlap_by_hand():
+    # 兩天、三檔股票；第二天 C 基金還沒有資料
+    weights = np.array([
+        [[50, 30, 0], [50, 30, 0]],    # A
+        [[20, 40, 10], [0, 0, 60]],    # B
+        [[0, 0, 0], [10, 10, 10]],     # C
+    ], dtype=np.float32)
+    valid = np.array([[True, True], [True, True], [True, False]])
+    jaccard, weighted = compute_overlap(weights, valid)
+
+    # A / B 第一天：共同持有 2 檔、聯集 3 檔；Σmin = 20 + 30
+    assert jaccard[0, 1, 0] == jaccard[1, 0, 0] == np.float32(2 / 3)
+    assert weighted[0, 1, 0] == weighted[1, 0, 0] == 50
+    # 第二天沒有共同持股
+    assert jaccard[0, 1, 1] == 0 and weighted[0, 1, 1] == 0
+    # 自己和自己：權重合計
+    assert weighted[0, 0].tolist() == [80, 80] and weighted[1, 1].tolist() == [70, 60]
+    # C 第一天沒有持股 (聯集為空的組合不計)，第二天無效
+    assert np.isnan(jaccard[2, 2, 0]) and weighted[0, 2, 0] == 0
+    assert np.isnan(jaccard[0, 2, 1]) and np.isnan(weighted[2, 0, 1])
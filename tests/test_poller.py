@@ -0,0 +1,92 @@
+import pytest
+
+import poller
+import validate
+from conftest import holdings
+from history import to_native
+
+FUND = '981a'
+
+@pytest.fixture
+def source(workdir, monkeypatch):
+    """假的來源與提交流程：fetch 回傳 source['df']，run_fund 走真正的閘門 (基準檔 = 第 0 天)"""
+    baseline = f"{FUND}.csv"
+    to_native(holdings(FUND, 0), FUND).to_csv(baseline, index=False, encoding="utf-8-sig")
+    calls = []
+
+    def run_fund(fund, df, day):
+        calls.append(fund)
+        if source.get('fail') == fund:
+            raise RuntimeError("render failed")
+        return 'diff' if validate.gate(fund, df, baseline) else None
+
+    source = {'df': None, 'calls': calls, 'fetches': 0}
+    def fetch(fund, day):
+        source['fetches'] += 1
+        return source['df']
+
+    monkeypatch.setattr(poller, 'fetch', fetch)
+    monkeypatch.setattr(poller, 'run_fund', run_fund)
+    monkeypatch.setattr(poller, 'notify', lambda funds: None)
+    monkeypatch.setattr(poller, 'WINDOW_START', "00:00")
+    monkeypatch.setattr(poller, 'WINDOW_END', "23:59")
+    return source
+
+def test_rejected_data_is_not_rechecked_until_rebaseline(source):
+    df = holdings(FUND, 1)
+    source['df'] = to_native(df.assign(**{'權重(%)': df['權重(%)'].to_numpy()[::-1]}), FUND)
+    state = {}
+    day = poller.today_tw()
+
+    assert not poller.probe(FUND, day, state)
+    assert state[FUND]['rejected'] and 'last_date' not in state[FUND]
+    assert len(source['calls']) == 1
+
+    # 第 2 次：略過檢查，只累計次數
+    assert not poller.probe(FUND, day, state)
+    assert len(source['calls']) == 1
+    assert validate.load_rejection(FUND)['count'] == 2
+
+    # 第 REBASELINE_AFTER 次：交給閘門，自動接受
+    assert validate.REBASELINE_AFTER == 3
+    assert poller.probe(FUND, day, state)
+    assert len(source['calls']) == 2
+    assert 'rejected' not in state[FUND] and state[FUND]['last_date'] == str(day)
+
+def test_failed_commit_does_not_stop_other_funds(source, monkeypatch):
+    source['df'] = to_native(holdings(FUND, 1), FUND)
+    source['fail'] = '980a'
+    monkeypatch.setattr(poller, 'baseline_fingerprint', lambda fund: None)
+    poller.poll(['980a', FUND], force=True, once=True)
+    state = poller.load_state()
+    assert source['calls'] == ['980a', FUND]
+    assert 'last_date' not in state.get('980a', {})
+    assert state[FUND]['last_date'] == str(poller.today_tw())
+
+def test_once_mode_keeps_the_backoff_between_runs(source):
+    poller.poll([FUND], force=True, once=True)          # 尚無資料：第 1 次落空，5 分鐘後再試
+    fund_state = poller.load_state()[FUND]
+    assert source['fetches'] == 1 and fund_state['misses'] == 1
+    due = poller.datetime.fromisoformat(fund_state['next_due'])
+    waited = (due - poller.datetime.now(poller.TW_TZ)).total_seconds()
+    assert poller.BASE_INTERVAL - 5 <= waited <= poller.BASE_INTERVAL
+
+    poller.poll([FUND], force=True, once=True)          # 還沒到時間：不抓
+    assert source['fetches'] == 1
+
+    state = poller.load_state()
+    state[FUND]['next_due'] = poller.datetime.now(poller.TW_TZ).isoformat()
+    poller.save_state(state)
+    poller.poll([FUND], force=True, once=True)          # 到時間：第 2 次落空，間隔 × BACKOFF
+    fund_state = poller.load_state()[FUND]
+    assert source['fetches'] == 2 and fund_state['misses'] == 2
+    waited = (poller.datetime.fromisoformat(fund_state['next_due']) - poller.datetime.now(poller.TW_TZ)).total_seconds()
+    assert waited > poller.BASE_INTERVAL * poller.BACKOFF - 5
+
+def test_once_mode_waits_for_the_learned_publish_time(source):
+    later = poller.datetime.now(poller.TW_TZ) + poller.timedelta(minutes=40)
+    if later.date() != poller.today_tw():
+        pytest.skip("接近午夜，無法排在今天稍後")
+    poller.save_state({FUND: {'publish_times': [later.strftime("%H:%M")]}})
+    poller.poll([FUND], force=True, once=True)
+    assert source['fetches'] == 0
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import regenerate
+from funds import REGISTRY
+from history import diff_consecutive, diff_snapshots, list_snapshots, load_snapshot, load_snapshots
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=['股票代號', '股票名稱', '股數', '權重(%)'])
+
+def test_diff_by_hand():
+    old = _frame([('2330', '台積電', 100.0, 50.0), ('2317', '鴻海', 50.0, 30.0), ('2454', '聯發科', 10.0, 20.0)])
+    new = _frame([('2330', '台積電', 120.0, 55.0), ('2454', '聯發科', 10.0, 20.0), ('3008', '大立光', 5.0, 25.0)])
+    diff = diff_snapshots(new, old)
+    assert diff['股票代號'].tolist() == ['2317', '2330', '2454', '3008']
+    assert diff['變動'].tolist() == ['exit', 'up', 'same', 'new']
+    assert diff['股數變化'].tolist() == [-50.0, 20.0, 0.0, 5.0]
+    assert diff['股票名稱'].tolist() == ['鴻海', '台積電', '聯發科', '大立光']
+    assert np.isnan(diff['權重(%)'][0])
+
+    # 批次比對：第一份沒有前一份 -> first，第二份與上面逐對比對相同
+    first, second = diff_consecutive([old, new])
+    assert first['變動'].tolist() == ['first'] * 3
+    pd.testing.assert_frame_equal(second, diff)
+
+def test_batch_load_and_diff_match_one_by_one(history, days):
+    history(['981a', '980a'], days[:8])
+    for fund in ('981a', '980a'):
+        paths = [p for _, p in list_snapshots(fund)]
+        frames = load_snapshots(paths, fund)
+        singles = [load_snapshot(p, fund) for p in paths]
+        for batch, single in zip(frames, singles):
+            pd.testing.assert_frame_equal(batch, single)
+        diffs = diff_consecutive(frames[1:], frames[0])
+        for i, diff in enumerate(diffs, start=1):
+            pd.testing.assert_frame_equal(diff, diff_snapshots(singles[i], singles[i - 1]))
+
+def test_baseline_report_does_not_overwrite_live_html(history, days):
+    history(['982a'], days[:5])
+    live = REGISTRY['982a']['html']
+    with open(live, "w", encoding="utf-8") as f:
+        f.write("live")
+
+    tasks = regenerate.build_tasks(['982a'])
+    outputs = [task[4] for task in tasks]
+    assert live not in outputs
+    assert outputs[-1] == os.path.join(regenerate.REPORT_DIR, '982a', f"{days[4]}.html")
+    assert all(os.path.normpath(p).startswith('982a_backup') for p in outputs[:-1])
+
+    assert all(error is None for _, error in regenerate.render_chunk(tasks))
+    assert all(os.path.exists(p) for p in outputs)
+    with open(live, encoding="utf-8") as f:
+        assert f.read() == "live"
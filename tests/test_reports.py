@@ -0,0 +1,39 @@
+import re
+
+import pandas as pd
+import pytest
+
+from funds import REGISTRY
+from history import diff_snapshots
+from reports import STYLES
+
+def _diff():
+    old = pd.DataFrame({'股票代號': ['2330', '2317'], '股票名稱': ['台積電', '鴻海'], '股數': [1000.0, 500.0], '權重(%)': [9.5, 3.0]})
+    new = pd.DataFrame({'股票代號': ['2330', '2454'], '股票名稱': ['台積電', '聯發科'], '股數': [1200.0, 80.0], '權重(%)': [9.87, 4.25]})
+    return diff_snapshots(new, old)
+
+@pytest.mark.parametrize('fund', ['980a', '981a', '982a', '991a'])
+def test_no_empty_info_paragraphs(tmp_path, fund):
+    cfg = REGISTRY[fund]
+    out = tmp_path / 'report.html'
+    STYLES[cfg['report']](cfg, _diff(), str(out), '2026-03-03')
+    html = out.read_text(encoding='utf-8')
+    assert not re.search(r'<p[^>]*>\s*</p>', html)
+    assert '<br><br>' not in html and '<br></div>' not in html
+
+    sectors = [{'name': '半導體', 'weight': 14.12, 'count': 2, 'change': 1.5}]
+    STYLES[cfg['report']](cfg, _diff(), str(out), '2026-03-03', sectors=sectors)
+    html = out.read_text(encoding='utf-8')
+    assert '族群: 半導體 14.12% (+1.50)' in html
+    assert not re.search(r'<p[^>]*>\s*</p>', html)
+
+@pytest.mark.parametrize('fund', ['980a', '981a'])
+def test_weight_column_is_read_by_name(tmp_path, fund):
+    # 欄位順序和 DIFF_COLUMNS 不同時，權重仍取 權重(%) 欄
+    cfg = REGISTRY[fund]
+    diff = _diff()
+    diff = diff[['權重(%)'] + [c for c in diff.columns if c != '權重(%)']]
+    out = tmp_path / 'report.html'
+    STYLES[cfg['report']](cfg, diff, str(out), '2026-03-03')
+    html = out.read_text(encoding='utf-8')
+    assert '9.87%' in html and '4.25%' in html
@@ -0,0 +1,30 @@
+import os
+
+import pandas as pd
+
+import rollup
+
+def _write(day, shares, weight):
+    os.makedirs('981a', exist_ok=True)
+    pd.DataFrame({'股票代號': ['2330'], '股票名稱': ['台積電'], '股數': [shares], '權重(%)': [weight]})\
+      .to_csv(f"981a/{day}.csv", index=False)
+
+def test_same_day_rerun_replaces_the_last_day(workdir):
+    # 2026-03-02 (一) ~ 03-04 (三) 同一週
+    for day, shares, weight in [('2026-03-02', 100, 5.0), ('2026-03-03', 120, 6.0), ('2026-03-04', 90, 4.0)]:
+        _write(day, shares, weight)
+    state = {}
+    assert rollup.update_fund('981a', state) == 3
+    week = rollup.load_rollup('981a', 'weekly', '2330').iloc[0]
+    assert week['期間'] == '2026-03-02' and week['天數'] == 3
+    assert [week[c] for c in ['股數_開', '股數_收', '股數_低', '股數_高', '淨買賣股數']] == [100, 90, 90, 120, 90]
+    assert [week[c] for c in ['權重_開', '權重_收', '權重_低', '權重_高']] == [5.0, 4.0, 4.0, 6.0]
+
+    # 同一天重跑、快照被取代：最後一天重算，不是被略過
+    _write('2026-03-04', 150, 7.0)
+    assert rollup.update_fund('981a', state) == 1
+    table = rollup.load_rollup('981a', 'weekly')
+    assert len(table) == 1
+    week = table.iloc[0]
+    assert [week['股數_收'], week['股數_高'], week['淨買賣股數'], week['權重_收']] == [150, 150, 150, 7.0]
+    assert rollup.load_rollup('981a', 'monthly').iloc[0]['股數_收'] == 150
@@ -0,0 +1,34 @@
+import os
+
+import pandas as pd
+
+import pipeline
+import secmaster
+from conftest import holdings
+from history import to_native
+
+def test_canonical_name_ignores_markers(workdir):
+    os.makedirs('981a')
+    for i, name in enumerate(['國巨*', '國巨*', '國巨*', '國巨', '國巨股份']):
+        pd.DataFrame({'股票代號': ['2327'], '股票名稱': [name], '股數': ['1000'], '權重(%)': ['5.0']})\
+          .to_csv(f"981a/2026-03-0{i + 2}.csv", index=False)
+    master = secmaster.build_master()
+    # 去掉標記後 國巨 出現 4 次 (國巨* 3 次 + 國巨 1 次)，勝過原樣計數最多的 國巨*
+    assert secmaster.lookup('2327', master)['name'] == '國巨'
+    assert secmaster.lookup('國巨*', master)['code'] == '2327'
+    assert secmaster.load_master()['by_code']['2327']['aliases'] == ['國巨', '國巨*', '國巨股份']
+
+def test_commit_persists_new_listings(history, days):
+    history(['981a'], days[:3])
+    secmaster.build_master()
+    assert '9999' not in secmaster.load_master()['by_code']
+
+    df = holdings('981a', 3)
+    df.loc[len(df)] = ['9999', '新上市*', 1000.0, 0.5, 10.0, 10000.0]
+    pipeline.commit('981a', to_native(df, '981a'), pd.Timestamp(days[3]).date())
+
+    saved = secmaster.load_master()['by_code']['9999']
+    assert saved['name'] == '新上市' and saved['aliases'] == ['新上市*']
+    assert saved['sid'] == secmaster.get_master()['by_code']['9999']['sid']
+    assert secmaster.MASTER_CSV in pipeline.output_paths('981a')
+    assert not secmaster.save_changes()   # 已寫回，沒有新的變動
@@ -0,0 +1,45 @@
+import pandas as pd
+
+import align
+import sectors
+from conftest import CODES
+
+def _write_mapping():
+    # 前 6 檔 = 半導體、接著 6 檔 = 散熱，其餘未分類
+    groups = ['半導體'] * 6 + ['散熱'] * 6
+    pd.DataFrame({'股票代號': CODES[:12], '股票名稱': [f"測試{c}" for c in CODES[:12]],
+                  '產業': '', sectors.SECTOR_COLUMN: groups}).to_csv(sectors.INDUSTRY_CSV, index=False)
+
+def _read(path):
+    return pd.read_csv(path, dtype={'日期': str, sectors.SECTOR_COLUMN: str})
+
+def test_incremental_matches_rebuild(history, days):
+    _write_mapping()
+    funds = ['981a', '980a']
+    history(funds, days[:20])
+    sectors.update_sectors()
+    for n in range(21, len(days) + 1):
+        history(funds, days[:n])
+        sectors.update_sectors()
+    incremental = {f: _read(sectors.sectors_path(f)) for f in funds}
+    cohort = _read(sectors.COHORT_CSV)
+
+    sectors.update_sectors(rebuild=True)
+    for fund in funds:
+        pd.testing.assert_frame_equal(incremental[fund], _read(sectors.sectors_path(fund)))
+    pd.testing.assert_frame_equal(cohort, _read(sectors.COHORT_CSV))
+    assert set(cohort[sectors.SECTOR_COLUMN]) == {'半導體', '散熱', sectors.UNMAPPED}
+
+def test_cohort_drops_stale_funds(history, days):
+    _write_mapping()
+    # 980a 只有前 10 天，之後沿用超過 STALE_DAYS 個交易日就不算當天的資料
+    history(['981a'], days)
+    history(['980a'], days[:10])
+    sectors.update_sectors()
+    cohort = _read(sectors.COHORT_CSV)
+    last_980a = str(days[9])
+    stale_from = str(days[10 + align.STALE_DAYS])
+    funds_on = cohort.groupby('日期')['持有基金數'].max()
+    assert funds_on[last_980a] == 2
+    assert funds_on[str(days[9 + align.STALE_DAYS])] == 2
+    assert funds_on[stale_from] == 1
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import stats
+
+@pytest.mark.parametrize('fund', ['981a', '980a'])
+def test_incremental_matches_rebuild(history, days, fund):
+    history([fund], days[:20])
+    assert stats.update_fund(fund) == 20
+    for n in range(21, len(days) + 1):
+        history([fund], days[:n])
+        stats.update_fund(fund)
+    incremental = stats.load_stats(fund)
+
+    assert stats.update_fund(fund, rebuild=True) == len(days)
+    pd.testing.assert_frame_equal(incremental, stats.load_stats(fund))
+
+def test_only_new_days_are_recomputed(history, days):
+    history(['981a'], days[:10])
+    stats.update_fund('981a')
+    assert stats.update_fund('981a') == 1   # 最後一天一律重算
+    history(['981a'], days[:12])
+    assert stats.update_fund('981a') == 3
+
+def test_stats_by_hand():
+    # 第一天 A 100 股 (50%)、B 50 股 (30%)；第二天 A 加到 120 股 (60%)、B 出清、C 新進 10 股 (20%)
+    shares = np.array([[100.0, 50.0, 0.0], [120.0, 0.0, 10.0]])
+    weights = np.array([[50.0, 30.0, 0.0], [60.0, 0.0, 20.0]])
+    table = stats.compute_stats(shares, weights)
+    # 買進: A 20 股 × 0.5% + C 10 股 × 2% = 30；賣出: B 50 股 × 前一天 0.6% = 30
+    assert table['單邊換手率(%)'].iloc[1] == 30
+    assert table['持股檔數'].tolist() == [2, 2]
+    assert table['新進檔數'].iloc[1] == 1 and table['出清檔數'].iloc[1] == 1
+    assert pd.isna(table['單邊換手率(%)'].iloc[0]) and pd.isna(table['新進檔數'].iloc[0])
+    # HHI: (50/80)² + (30/80)² = 0.53125；(60/80)² + (20/80)² = 0.625
+    assert table['HHI'].tolist() == [5312.5, 6250.0]
+    assert table['有效持股數'].tolist() == [1.88, 1.6]
+    assert table[f'前{stats.TOP_N}大權重(%)'].tolist() == [80, 80]
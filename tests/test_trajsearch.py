@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+
+import align
+import trajsearch
+
+def _by_pair(meta, traj):
+    return {tuple(p): np.asarray(traj[i]) for i, p in enumerate(meta['pairs'])}
+
+def test_incremental_matches_rebuild(history, days, monkeypatch):
+    monkeypatch.setattr(trajsearch, 'DATE_HEADROOM', 3)   # 預留區很小，中途會搬到新檔
+    funds = ['981a', '980a']
+    history(funds, days[:20])
+    trajsearch.update_index()
+    for n in range(21, len(days) + 1):
+        history(funds, days[:n])
+        trajsearch.update_index()
+    meta, traj = trajsearch.load_index()
+
+    full_meta, full_traj = trajsearch.update_index(rebuild=True)
+    assert meta['dates'] == full_meta['dates'] == [str(d) for d in days]
+    assert meta['axis'] == full_meta['axis']
+    got, want = _by_pair(meta, traj), _by_pair(full_meta, full_traj)
+    assert set(got) == set(want)
+    for pair, series in want.items():
+        np.testing.assert_allclose(got[pair], series, rtol=1e-6)
+
+def test_query_ranks_candidates_and_skips_the_template(history, days):
+    history(['981a', '985a'], days)
+    meta, traj = trajsearch.update_index()
+    table, _, _ = trajsearch.query(meta, traj, '981a', '1104', k=3)
+    assert len(table) == 3
+    assert table['相似度'].is_monotonic_decreasing
+    assert ('981a', '1104') not in set(zip(table['基金'], table['股票代號']))
+
+def test_new_days_are_written_in_place_and_stale_days_masked(history, days):
+    history(['981a', '980a'], days[:20])
+    trajsearch.update_index()
+    capacity = np.load(trajsearch.INDEX_NPY, mmap_mode='r').shape
+    assert capacity[1] == 20 + trajsearch.DATE_HEADROOM
+
+    # 981a 第 21 ~ 25 天沒有公布：沿用超過 STALE_DAYS 天的日子補 0，第 26 天起恢復
+    history(['981a', '980a'], days)
+    for n in range(20, 25):
+        os.remove(os.path.join('981a', f"{days[n]}.csv"))
+    meta, traj = trajsearch.update_index()
+    assert np.load(trajsearch.INDEX_NPY, mmap_mode='r').shape == capacity
+    assert len(meta['dates']) == len(days)
+
+    rows = [i for i, (fund, _) in enumerate(meta['pairs']) if fund == '981a']
+    held = np.asarray(traj[rows, :, 1]) > 0
+    age = np.array([0] * 20 + [1, 2, 3, 4, 5] + [0] * 5)
+    np.testing.assert_array_equal(held.any(axis=0), age <= align.STALE_DAYS)
+
+    full_meta, full_traj = trajsearch.update_index(rebuild=True)
+    got, want = _by_pair(meta, traj), _by_pair(full_meta, full_traj)
+    assert set(got) == set(want)
+    for pair, series in want.items():
+        np.testing.assert_array_equal(got[pair], series)
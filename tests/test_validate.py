@@ -0,0 +1,112 @@
+import os
+
+import pandas as pd
+import pytest
+
+import validate
+from conftest import holdings
+from history import to_native
+
+FUND = '981a'
+
+def _native(df):
+    return to_native(df, FUND)
+
+@pytest.fixture
+def baseline(workdir):
+    path = f"{FUND}.csv"
+    _native(holdings(FUND, 0)).to_csv(path, index=False, encoding="utf-8-sig")
+    return path
+
+def _quarantined():
+    folder = os.path.join(validate.QUARANTINE_DIR, FUND)
+    return sorted(f for f in os.listdir(folder) if f != validate.REJECTED_FILE) if os.path.isdir(folder) else []
+
+def test_normal_day_passes(baseline):
+    assert validate.gate(FUND, _native(holdings(FUND, 1)), baseline)
+    assert _quarantined() == []
+
+def test_first_snapshot_without_baseline_passes(workdir):
+    assert validate.gate(FUND, _native(holdings(FUND, 0)), f"{FUND}.csv")
+
+def _few_rows(df):
+    return df.head(5)
+
+def _weights_in_basis_points(df):
+    return df.assign(**{'權重(%)': df['權重(%)'] * 100})
+
+def _duplicate_row(df):
+    return pd.concat([df, df.head(1)], ignore_index=True)
+
+def _bad_shares(df):
+    return df.assign(股數=df['股數'].astype(object).where(df.index != 2, 'N/A'))
+
+def _top_holdings_vanish(df):
+    # 最大的幾檔整檔消失，其餘補上權重 (檔數與權重合計都正常)
+    df = df.sort_values('權重(%)', ascending=False)
+    kept, gone = df.iloc[4:].copy(), df.iloc[:4]
+    kept['權重(%)'] *= 1 + gone['權重(%)'].sum() / kept['權重(%)'].sum()
+    return kept
+
+def _reshuffled_weights(df):
+    return df.assign(**{'權重(%)': df['權重(%)'].to_numpy()[::-1]})
+
+@pytest.mark.parametrize('mutate, problem', [
+    (_few_rows, '持股只有'),
+    (_weights_in_basis_points, '權重合計'),
+    (_duplicate_row, '重複的股票代號'),
+    (_bad_shares, '股數無法解析'),
+    (_top_holdings_vanish, '整檔消失'),
+    (_reshuffled_weights, '換手率'),
+])
+def test_bad_snapshot_is_quarantined(baseline, mutate, problem):
+    with open(baseline, "rb") as f:
+        before = f.read()
+    df = mutate(holdings(FUND, 1))
+    problems, _ = validate.check_snapshot(FUND, _native(df), validate.read_baseline(baseline))
+    assert any(problem in p for p in problems), problems
+
+    assert not validate.gate(FUND, _native(df), baseline)
+    files = _quarantined()
+    assert [os.path.splitext(f)[1] for f in files] == ['.csv', '.json']
+    with open(baseline, "rb") as f:
+        assert f.read() == before   # 基準檔保持不變
+
+def test_stats_by_hand(workdir):
+    # 舊: A 50 / B 30 / C 20；新: A 40 / B 30 / D 30
+    # 整檔消失 = C 20；換手率 = (|40-50| + 0 + 20 + 30) / 2 = 30
+    old = pd.DataFrame({'股票代號': ['A', 'B', 'C'], '股票名稱': ['a', 'b', 'c'], '股數': ['1,000', '2000', '3000'],
+                        '權重(%)': ['50%', '30', '20']})
+    new = pd.DataFrame({'股票代號': ['A', 'B', 'D'], '股票名稱': ['a', 'b', 'd'], '股數': ['1000', '2000.5', '10'],
+                        '權重(%)': ['40', '30', '30']})
+    problems, stats = validate.check_snapshot(FUND, new, old)
+    assert stats == {'rows': 3, 'weight_sum': 100.0, 'duplicates': 0, 'bad_shares': 1,
+                     'prev_rows': 3, 'dropped_weight': 20.0, 'turnover': 30.0}
+    assert problems == ["持股只有 3 檔 (下限 10)", "有 1 筆股數無法解析或不是整數"]
+
+def test_force_accepts_a_rejected_snapshot(baseline):
+    df = _native(_reshuffled_weights(holdings(FUND, 1)))
+    assert not validate.gate(FUND, df, baseline)
+    assert validate.gate(FUND, df, baseline, force=True)
+    assert validate.load_rejection(FUND) is None
+
+def test_same_rebalance_is_accepted_after_repeats(baseline):
+    df = _native(_reshuffled_weights(holdings(FUND, 1)))
+    for n in range(1, validate.REBASELINE_AFTER):
+        assert not validate.gate(FUND, df, baseline)
+        assert validate.load_rejection(FUND)['count'] == n
+    assert len(_quarantined()) == 2   # 同一份資料只隔離一次
+    assert validate.gate(FUND, df, baseline)
+    assert validate.load_rejection(FUND) is None
+
+def test_broken_snapshot_is_never_accepted_automatically(baseline):
+    df = _native(_few_rows(holdings(FUND, 1)))
+    for _ in range(validate.REBASELINE_AFTER + 2):
+        assert not validate.gate(FUND, df, baseline)
+    assert validate.load_rejection(FUND)['count'] == validate.REBASELINE_AFTER + 2
+
+def test_different_data_restarts_the_count(baseline):
+    assert not validate.gate(FUND, _native(_reshuffled_weights(holdings(FUND, 1))), baseline)
+    assert not validate.gate(FUND, _native(_reshuffled_weights(holdings(FUND, 2))), baseline)
+    assert validate.load_rejection(FUND)['count'] == 1
+    assert len(_quarantined()) == 4
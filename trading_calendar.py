@@ -0,0 +1,73 @@
+import os
+import csv
+from datetime import datetime, date, timedelta, timezone
+from functools import lru_cache
+import numpy as np
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+# 休市日表 (日期,名稱)，每年依證交所公告的「市場開休市日期」更新
+HOLIDAY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tw_holidays.csv")
+TW_TZ = timezone(timedelta(hours=8))
+
+# ==========================================
+# 2. 交易日曆 (以 numpy busdaycalendar 當索引，查詢都是向量化的)
+# ==========================================
+
+@lru_cache(maxsize=None)
+def load_holidays(path=HOLIDAY_FILE):
+    """讀取休市日表，回傳 {date: 名稱}"""
+    holidays = {}
+    if not os.path.exists(path):
+        print(f"⚠️ 找不到休市日表 {path}，只排除週末")
+        return holidays
+    with open(path, encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            holidays[date.fromisoformat(row['日期'].strip())] = row['名稱'].strip()
+    return holidays
+
+@lru_cache(maxsize=None)
+def get_calendar(path=HOLIDAY_FILE):
+    return np.busdaycalendar(weekmask="1111100", holidays=sorted(load_holidays(path)))
+
+def _to_day(d):
+    return np.datetime64(str(d)[:10], 'D')
+
+def today_tw():
+    """台灣時間的今天 (GitHub Actions 跑在 UTC)"""
+    return datetime.now(TW_TZ).date()
+
+def is_trading_day(d=None):
+    d = today_tw() if d is None else d
+    return bool(np.is_busday(_to_day(d), busdaycal=get_calendar()))
+
+def previous_trading_day(d=None):
+    """d 之前 (不含 d) 的最後一個交易日"""
+    d = today_tw() if d is None else d
+    prev = np.busday_offset(_to_day(d), -1, roll='forward', busdaycal=get_calendar())
+    return prev.astype(object)
+
+def next_trading_day(d=None):
+    """d 之後 (不含 d) 的第一個交易日"""
+    d = today_tw() if d is None else d
+    nxt = np.busday_offset(_to_day(d), 1, roll='backward', busdaycal=get_calendar())
+    return nxt.astype(object)
+
+def trading_days(start, end):
+    """回傳 [start, end] 之間所有交易日 (numpy datetime64[D] 陣列)"""
+    days = np.arange(_to_day(start), _to_day(end) + 1, dtype='datetime64[D]')
+    return days[np.is_busday(days, busdaycal=get_calendar())]
+
+def holiday_name(d):
+    d = d if isinstance(d, date) else date.fromisoformat(str(d)[:10])
+    if d.weekday() >= 5:
+        return "週末"
+    return load_holidays().get(d)
+
+if __name__ == "__main__":
+    today = today_tw()
+    if is_trading_day(today):
+        print(f"📅 {today} 是交易日 (上一個交易日: {previous_trading_day(today)})")
+    else:
+        print(f"💤 {today} 休市: {holiday_name(today)} (下一個交易日: {next_trading_day(today)})")
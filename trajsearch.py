@@ -0,0 +1,319 @@
+import os
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from history import FUNDS, list_snapshots, load_snapshot
+from panel import build_panel
+from secmaster import name_of
+from align import AXIS, asof, new_trading_days
+from snapshot_store import atomic_write_text
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+INDEX_NPY = "trajectories.npy"     # float32 [軌跡, 日期, 2] (權重 %, 股數)，一整塊連續陣列 (預留容量，見下)
+INDEX_JSON = "trajectories.json"   # 日期軸、每條軌跡的 (基金, 股票代號)、股票名稱；實際大小以這裡為準
+WINDOW = 63                        # 沒指定區間時比較最近幾個日期 (約一季)
+TOP_K = 10
+DTW_BAND = 5                       # DTW 只允許前後錯開幾天 (Sakoe-Chiba 帶寬)
+METHODS = ('cosine', 'dtw')
+DATE_HEADROOM = 250                # 索引檔預留幾個日期的空間 (約一年)，用完才整個搬到較大的新檔
+PAIR_HEADROOM = 0.25               # 軌跡數預留的比例
+COPY_ROWS = 4096                   # 搬檔時每次複製幾條軌跡
+
+# ==========================================
+# 2. 軌跡索引：每個 (基金, 股票) 一條權重 + 股數的日序列
+# 檔案不存在時用持股面板一次向量化重建，之後每天只補新日期。
+# 索引檔預留了日期與軌跡的空間，每天用 mmap (r+) 只寫新日期那幾欄與新軌跡，
+# 既有的區塊從不改寫；最後才原子替換 trajectories.json (實際大小)，中途失敗時讀到的仍是舊的索引。
+# 沿用太久 (stale) 的快照和 leadlag.py 一樣視同沒有資料 (補 0)。
+# ==========================================
+
+def full_rebuild():
+    panel = build_panel()
+    current = ~panel['stale'][:, :, None]
+    weights = np.where(current, panel['weights'], 0)
+    shares = np.where(current, panel['shares'], 0)
+    held = (shares > 0).any(axis=1)                      # [基金, 股票] 曾經持有過
+    fi, si = np.nonzero(held)
+    traj = np.stack([weights[fi, :, si], shares[fi, :, si]], axis=-1)
+    meta = {
+        'axis': AXIS,
+        'dates': [str(d) for d in panel['dates']],
+        'pairs': [[panel['funds'][f], panel['codes'][s]] for f, s in zip(fi, si)],
+        'names': {panel['codes'][s]: panel['names'].get(panel['codes'][s], panel['codes'][s]) for s in set(si)},
+    }
+    return meta, np.ascontiguousarray(traj, dtype=np.float32)
+
+def _capacity(n_pairs, n_dates):
+    return n_pairs + int(n_pairs * PAIR_HEADROOM) + 1, n_dates + DATE_HEADROOM
+
+def write_index(index_npy, traj, capacity):
+    """把 traj ([軌跡, 日期, 2]) 寫進一個預留 capacity 的新索引檔 (先寫暫存檔再原子替換)，回傳 r+ 的 mmap"""
+    tmp_path = index_npy + ".tmp"
+    out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(*capacity, 2))
+    n_pairs, n_dates = traj.shape[:2]
+    for start in range(0, n_pairs, COPY_ROWS):
+        stop = min(start + COPY_ROWS, n_pairs)
+        out[start:stop, :n_dates] = traj[start:stop]
+    out.flush()
+    del out
+    os.replace(tmp_path, index_npy)
+    return np.load(index_npy, mmap_mode='r+')
+
+def incremental_update(meta, store, index_npy=INDEX_NPY):
+    """
+    只補最後一天之後新增的交易日：每個新交易日取各基金 as-of 的那份快照，
+    依 (基金, 代號) 一次查出軌跡列，直接寫進 store (r+ 的 mmap) 的新日期欄；容量不夠時才搬到新檔。
+    回傳 (meta, store, 新增天數)。
+    """
+    snapshots = {fund: list_snapshots(fund) for fund in FUNDS}
+    new_days = new_trading_days([d for snaps in snapshots.values() for d, _ in snaps], meta['dates'][-1])
+    if not len(new_days):
+        return meta, store, 0
+    aligned = {fund: asof([d for d, _ in snaps], new_days) for fund, snaps in snapshots.items()}
+    n_pairs, n_dates = len(meta['pairs']), len(meta['dates'])
+
+    # 先讀完這幾天要用的快照 (同一份沿用多天只讀一次)
+    columns, cache = [], {}
+    for fund, snaps in snapshots.items():
+        use = aligned[fund]['valid'] & ~aligned[fund]['stale']
+        for offset in np.nonzero(use)[0]:
+            path = snaps[aligned[fund]['pos'][offset]][1]
+            if path not in cache:
+                df = load_snapshot(path, fund)
+                cache[path] = (df['股票代號'].to_numpy(str), df['權重(%)'].to_numpy(np.float32),
+                               df['股數'].to_numpy(np.float32))
+                meta['names'].update((code, name_of(code)) for code in np.unique(cache[path][0]))
+            columns.append((offset, fund, path))
+    columns.sort(key=lambda c: c[0])
+
+    # (基金, 代號) -> 軌跡列，每份快照一次查完；第一次出現的排在最後 (之前的日期補 0)
+    pairs = pd.MultiIndex.from_arrays([[f for f, _ in meta['pairs']], [c for _, c in meta['pairs']]])
+    lookups = []
+    for offset, fund, path in columns:
+        codes, weights, shares = cache[path]
+        keys = pd.MultiIndex.from_arrays([np.full(len(codes), fund), codes])
+        rows = pairs.get_indexer(keys)
+        if (rows < 0).any():
+            fresh = pd.unique(codes[rows < 0])
+            meta['pairs'].extend([fund, code] for code in fresh)
+            pairs = pairs.append(pd.MultiIndex.from_arrays([np.full(len(fresh), fund), fresh]))
+            rows = pairs.get_indexer(keys)
+        lookups.append((n_dates + offset, rows, weights, shares))
+
+    total_pairs, total_dates = len(meta['pairs']), n_dates + len(new_days)
+    if total_pairs > store.shape[0] or total_dates > store.shape[1]:
+        store = write_index(index_npy, store[:n_pairs, :n_dates], _capacity(total_pairs, total_dates))
+    # 預留區可能有上次中斷時寫到一半的值，先清成 0 再寫
+    store[:total_pairs, n_dates:total_dates] = 0
+    store[n_pairs:total_pairs, :n_dates] = 0
+    for col, rows, weights, shares in lookups:
+        store[rows, col, 0] = weights
+        store[rows, col, 1] = shares
+    store.flush()
+    meta['dates'].extend(str(d) for d in new_days)
+    return meta, store, len(new_days)
+
+def load_index(index_npy=INDEX_NPY, index_json=INDEX_JSON):
+    """回傳 (meta, [軌跡, 日期, 2] 的 mmap)；只取 meta 記錄的實際大小，不含預留區"""
+    with open(index_json, encoding="utf-8") as f:
+        meta = json.load(f)
+    store = np.load(index_npy, mmap_mode='r')
+    return meta, store[:len(meta['pairs']), :len(meta['dates'])]
+
+def update_index(index_npy=INDEX_NPY, index_json=INDEX_JSON, rebuild=False):
+    meta = None
+    if not rebuild and os.path.exists(index_npy) and os.path.exists(index_json):
+        meta, _ = load_index(index_npy, index_json)
+        if meta.get('axis') != AXIS:
+            print("⚠️ 既有索引的日期軸不是交易日軸，整個重建")
+            meta = None
+    if meta is None:
+        print("🔁 重建持股軌跡索引...")
+        meta, traj = full_rebuild()
+        store = write_index(index_npy, traj, _capacity(*traj.shape[:2]))
+        added = len(meta['dates'])
+    else:
+        meta, store, added = incremental_update(meta, np.load(index_npy, mmap_mode='r+'), index_npy)
+        if not added:
+            print("💤 沒有新的日期需要更新")
+            return meta, store[:len(meta['pairs']), :len(meta['dates'])]
+
+    atomic_write_text(index_json, json.dumps(meta, ensure_ascii=False, separators=(',', ':')))
+    traj = store[:len(meta['pairs']), :len(meta['dates'])]
+    print(f"✅ 軌跡索引已更新: {index_npy} (+{added} 天，共 {traj.shape[1]} 天 / {traj.shape[0]} 條軌跡)")
+    return meta, traj
+
+# ==========================================
+# 3. 相似度 (一次對所有軌跡做矩陣運算)
+# ==========================================
+
+def znorm(x):
+    """
+    x: [軌跡, 日期, 通道] -> 每條軌跡、每個通道各自標準化 (只比形狀，不比規模)。
+    整段都沒變化的通道設為 0；兩個通道都沒變化的軌跡回傳 ok=False。
+    """
+    x = np.asarray(x, dtype=np.float32)
+    z = x - x.mean(axis=1, keepdims=True)
+    std = np.sqrt(np.einsum('ptc,ptc->pc', z, z) / x.shape[1])[:, None, :]
+    moving = std > 1e-6 * (np.abs(x).max(axis=1, keepdims=True) + 1)   # 股數是大數字，門檻跟著規模走
+    z /= np.where(moving, std, 1)
+    z *= moving
+    return z, moving.any(axis=(1, 2))
+
+def cosine_scores(query, cands):
+    """query: [日期, 通道]，cands: [軌跡, 日期, 通道] (皆已標準化) -> 每條軌跡的餘弦相似度"""
+    q = query.ravel()
+    c = cands.reshape(len(cands), -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (c @ q) / (np.linalg.norm(c, axis=1) * np.linalg.norm(q))
+
+def dtw_distances(query, cands, band=DTW_BAND):
+    """
+    帶寬限制的 DTW (只允許前後錯開 band 天)，所有候選軌跡一起算：
+    迴圈只跑 日期 × 帶寬，每一步都是長度為「軌跡數」的向量運算。回傳每條軌跡的 DTW 距離 (÷ 日期數)。
+    """
+    n_p, n_t = cands.shape[0], query.shape[0]
+    by_day = np.ascontiguousarray(cands.transpose(1, 0, 2))   # [日期, 軌跡, 通道]，每一步取的是連續的一塊
+    prev = np.full((n_t + 1, n_p), np.inf)
+    prev[0] = 0.0
+    for i in range(1, n_t + 1):
+        cur = np.full((n_t + 1, n_p), np.inf)
+        for j in range(max(1, i - band), min(n_t, i + band) + 1):
+            cost = ((by_day[j - 1] - query[i - 1]) ** 2).sum(axis=1)
+            cur[j] = cost + np.minimum(np.minimum(prev[j], cur[j - 1]), prev[j - 1])
+        prev = cur
+    return np.sqrt(prev[n_t] / n_t)
+
+def top_k(scores, k, largest=True):
+    """argpartition 取前 k 名再排序 (NaN / 無效分數已先設成 ±inf)"""
+    order = -scores if largest else scores
+    k = min(k, len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    head = np.argpartition(order, k - 1)[:k]
+    return head[np.argsort(order[head], kind='stable')]
+
+def similar_scores(query, cands, method='cosine', band=DTW_BAND):
+    """query: [日期, 通道]，cands: [軌跡, 日期, 通道] (原始值) -> (分數, 是否有效)；cosine 越大越像，dtw 越小越像"""
+    zq, q_ok = znorm(query[None])
+    zc, ok = znorm(cands)
+    if not q_ok[0]:
+        raise ValueError("查詢區間內權重與股數都沒有變化，無法比較走勢")
+    if method == 'dtw':
+        scores = dtw_distances(zq[0], zc, band)
+        return np.where(ok, scores, np.inf), ok
+    scores = cosine_scores(zq[0], zc)
+    return np.where(ok & np.isfinite(scores), scores, -np.inf), ok
+
+# ==========================================
+# 4. 查詢
+# ==========================================
+
+def _date_pos(dates, day, side):
+    return int(np.searchsorted(dates, np.datetime64(day, 'D'), side=side))
+
+def query(meta, traj, fund, code, start=None, end=None, at=None, method='cosine', k=TOP_K, funds=None):
+    """
+    以 (fund, code) 在 [start, end] 的權重 + 股數走勢為範本，
+    找出所有 (基金, 股票) 在「截至 at (預設最新一天) 的同樣長度區間」裡走勢最像的前 k 條。
+    """
+    dates = np.array(meta['dates'], dtype='datetime64[D]')
+    pairs = [tuple(p) for p in meta['pairs']]
+    if (fund, code) not in pairs:
+        raise ValueError(f"索引中沒有 {fund} 持有 {code} 的紀錄")
+    row = pairs.index((fund, code))
+
+    t1 = _date_pos(dates, end, 'right') if end else len(dates)
+    t0 = _date_pos(dates, start, 'left') if start else max(0, t1 - WINDOW)
+    length = t1 - t0
+    te = _date_pos(dates, at, 'right') if at else len(dates)
+    if length < 3 or te - length < 0:
+        raise ValueError(f"區間長度 {length} 天不足，或比較區間超出索引範圍")
+
+    cands = traj[:, te - length:te]
+    scores, _ = similar_scores(traj[row, t0:t1], cands, method)
+    largest = method == 'cosine'
+    scores[row] = -np.inf if largest else np.inf
+    if funds:
+        keep = np.isin([p[0] for p in pairs], list(funds))
+        scores = np.where(keep, scores, -np.inf if largest else np.inf)
+
+    best = top_k(scores, k, largest)
+    best = best[np.isfinite(scores[best])]
+    window = np.asarray(cands[best])
+    return pd.DataFrame({
+        '基金': [pairs[i][0] for i in best],
+        '股票代號': [pairs[i][1] for i in best],
+        '股票名稱': [meta['names'].get(pairs[i][1], pairs[i][1]) for i in best],
+        '相似度' if largest else 'DTW距離': scores[best].round(4),
+        '權重_起': window[:, 0, 0].round(4), '權重_迄': window[:, -1, 0].round(4),
+        '股數_起': window[:, 0, 1].astype(np.int64), '股數_迄': window[:, -1, 1].astype(np.int64),
+    }), (str(dates[t0]), str(dates[t1 - 1])), (str(dates[te - length]), str(dates[te - 1]))
+
+def trends_to_array(trend_dict):
+    """
+    ana981a.py 的單股趨勢 ({代號: {dates, weights, shares}}) -> (代號 list, 日期軸, float32 [股票, 日期, 2])，
+    某天沒有該股票的紀錄時補 0。
+    """
+    codes = list(trend_dict)
+    dates = np.unique(np.concatenate([np.array(t['dates'], dtype='datetime64[D]') for t in trend_dict.values()]
+                                     or [np.zeros(0, dtype='datetime64[D]')]))
+    traj = np.zeros((len(codes), len(dates), 2), dtype=np.float32)
+    for i, code in enumerate(codes):
+        t = trend_dict[code]
+        cols = np.searchsorted(dates, np.array(t['dates'], dtype='datetime64[D]'))
+        traj[i, cols, 0] = t['weights']
+        traj[i, cols, 1] = t['shares']
+    return codes, dates, traj
+
+def similar_trends(trend_dict, k=3, window=WINDOW):
+    """ana981a.py 用：每檔股票最近 window 個日期的走勢，和其他持股兩兩比對 (一次矩陣乘法)，回傳 {代號: [(代號, 分數), ...]}"""
+    codes, _, traj = trends_to_array(trend_dict)
+    if len(codes) < 2:
+        return {}
+    z, ok = znorm(traj[:, -window:])
+    flat = z.reshape(len(codes), -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        unit = flat / np.linalg.norm(flat, axis=1, keepdims=True)
+    sim = np.where(ok[:, None] & ok[None, :], unit @ unit.T, -np.inf)
+    np.fill_diagonal(sim, -np.inf)
+    result = {}
+    for i, code in enumerate(codes):
+        best = top_k(sim[i], k)
+        result[code] = [(codes[j], round(float(sim[i, j]), 3)) for j in best if np.isfinite(sim[i, j])]
+    return result
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+    parser = argparse.ArgumentParser(description="找出走勢和某檔股票某段期間最像的 (基金, 股票)；不帶股票代號時只更新索引")
+    parser.add_argument("code", nargs="?", help="範本股票代號 (例如 3017)")
+    parser.add_argument("--fund", default="981a", help="範本基金 (預設 981a)")
+    parser.add_argument("--start", default=None, help="範本區間起日 YYYY-MM-DD (預設 --end 往前 WINDOW 個日期)")
+    parser.add_argument("--end", default=None, help="範本區間迄日 YYYY-MM-DD (預設最新一天)")
+    parser.add_argument("--at", default=None, help="候選區間的結束日 (預設最新一天)")
+    parser.add_argument("--method", choices=METHODS, default="cosine")
+    parser.add_argument("--top", type=int, default=TOP_K)
+    parser.add_argument("--funds", nargs="*", default=None, help="只在這些基金裡找")
+    parser.add_argument("--rebuild", action="store_true", help="整個索引重建")
+    args = parser.parse_args()
+
+    meta, traj = update_index(rebuild=args.rebuild)
+    if not args.code:
+        sys.exit(0)
+    started = time.perf_counter()
+    try:
+        table, q_span, c_span = query(meta, traj, args.fund, args.code, args.start, args.end, args.at,
+                                      args.method, args.top, args.funds)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"🔎 範本: {args.fund} {args.code} {q_span[0]} ~ {q_span[1]}，候選區間 {c_span[0]} ~ {c_span[1]}"
+          f" ({traj.shape[0]} 條軌跡，{args.method}，{elapsed:.1f} ms)")
+    print(table.to_string(index=False) if not table.empty else "找不到可比較的軌跡")
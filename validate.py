@@ -0,0 +1,208 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from history import ARCHIVES, normalize, to_number
+from snapshot_store import atomic_write_text, unique_path
+
+# ==========================================
+# 1. 設定區
+# ==========================================
+QUARANTINE_DIR = "quarantine"      # 沒通過檢查的快照放這裡 (quarantine/<基金>/<時間>.csv + .json)
+MIN_ROWS = 10                      # 至少幾檔持股
+MIN_ROW_RATIO = 0.7                # 持股檔數至少是上一份的幾成
+WEIGHT_SUM_RANGE = (60.0, 105.0)   # 股票權重合計 (%) 的合理範圍
+MAX_DROPPED_WEIGHT = 25.0          # 上一份持股中「整檔消失」的權重合計上限 (%)
+MAX_TURNOVER = 40.0                # 權重換手率上限 (%) = Σ|新權重 - 舊權重| / 2
+REBASELINE_AFTER = 3               # 同一份資料連續被擋下幾次就當成真的大幅調整，自動接受 (只限與上一份比較的項目)
+REJECTED_FILE = "rejected.json"    # quarantine/<基金>/rejected.json：最近被擋下的資料指紋與次數
+
+# ==========================================
+# 2. 檢查 (轉成陣列後一次算完)
+# ==========================================
+
+def _arrays(df, fund):
+    """原始欄位 DataFrame -> (代號, 股數, 權重, 無法解析的股數筆數)；不查證券主檔"""
+    cfg = ARCHIVES[fund]
+    raw = df.rename(columns=lambda c: str(c).strip())
+    raw = raw[[c for c in cfg['columns'] if c in raw.columns]].rename(columns=cfg['columns'])
+    if not {'股票代號', '股票名稱', '股數', '權重(%)'} <= set(raw.columns):
+        return None
+    raw_shares = to_number(raw['股數'])
+    bad_shares = int((raw_shares.isna() | (raw_shares % 1 != 0)).sum())
+    canon = normalize(df, fund, resolve=False)
+    return (canon['股票代號'].to_numpy(str), canon['股數'].to_numpy(np.float64),
+            canon['權重(%)'].to_numpy(np.float64), bad_shares)
+
+def snapshot_stats(new, old=None):
+    """new / old 為 _arrays() 的結果，回傳檢查用的統計值"""
+    codes, shares, weights, bad_shares = new
+    stats = {
+        'rows': int(len(codes)),
+        'weight_sum': float(weights.sum()),
+        'duplicates': int(len(codes) - len(np.unique(codes))),
+        'bad_shares': bad_shares,
+    }
+    if old is not None:
+        old_codes, old_shares, old_weights, _ = old
+        kept = np.isin(old_codes, codes)
+        stats['prev_rows'] = int(len(old_codes))
+        stats['dropped_weight'] = float(old_weights[~kept].sum())
+        # 權重換手率：新舊代號合併後用 bincount 一次加總
+        union, inverse = np.unique(np.concatenate([codes, old_codes]), return_inverse=True)
+        signed = np.concatenate([weights, -old_weights])
+        stats['turnover'] = float(np.abs(np.bincount(inverse, weights=signed, minlength=len(union))).sum() / 2)
+    return stats
+
+def absolute_problems(stats):
+    """只看這一份快照本身就能判斷的問題 (資料不完整 / 格式錯誤)，永遠不會自動接受"""
+    problems = []
+    if stats['rows'] < MIN_ROWS:
+        problems.append(f"持股只有 {stats['rows']} 檔 (下限 {MIN_ROWS})")
+    low, high = WEIGHT_SUM_RANGE
+    if not low <= stats['weight_sum'] <= high:
+        problems.append(f"權重合計 {stats['weight_sum']:.2f}% 不在 {low:g}% ~ {high:g}% 之間")
+    if stats['duplicates']:
+        problems.append(f"有 {stats['duplicates']} 個重複的股票代號")
+    if stats['bad_shares']:
+        problems.append(f"有 {stats['bad_shares']} 筆股數無法解析或不是整數")
+    return problems
+
+def relative_problems(stats):
+    """與上一份比較才有的問題 (檔數驟減、整檔消失、換手率)；真的大幅調整也會觸發"""
+    if 'prev_rows' not in stats:
+        return []
+    problems = []
+    if stats['prev_rows'] and stats['rows'] < stats['prev_rows'] * MIN_ROW_RATIO:
+        problems.append(f"持股檔數 {stats['prev_rows']} -> {stats['rows']}，少於上一份的 {MIN_ROW_RATIO:.0%}")
+    if stats['dropped_weight'] > MAX_DROPPED_WEIGHT:
+        problems.append(f"上一份持股有 {stats['dropped_weight']:.2f}% 權重整檔消失 (上限 {MAX_DROPPED_WEIGHT:g}%)")
+    if stats['turnover'] > MAX_TURNOVER:
+        problems.append(f"權重換手率 {stats['turnover']:.2f}% (上限 {MAX_TURNOVER:g}%)")
+    return problems
+
+def check_snapshot(fund, df_new, df_old=None):
+    """回傳 (問題 list, 統計值)；問題 list 為空代表通過"""
+    new = _arrays(df_new, fund)
+    if new is None:
+        return ["缺少必要欄位 (股票代號 / 股票名稱 / 股數 / 權重)"], {}
+    old = _arrays(df_old, fund) if df_old is not None else None
+    stats = snapshot_stats(new, old)
+    return absolute_problems(stats) + relative_problems(stats), stats
+
+def data_fingerprint(df, fund):
+    """(代號, 股數, 權重) 的指紋：同一份資料重抓幾次都一樣"""
+    new = _arrays(df, fund)
+    rows = sorted(zip(*new[:3])) if new is not None else []
+    return hashlib.sha1(repr(rows).encode("utf-8")).hexdigest()
+
+# ==========================================
+# 3. 隔離與閘門
+# ==========================================
+
+def quarantine(fund, df, problems, stats):
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    folder = os.path.join(QUARANTINE_DIR, fund)
+    os.makedirs(folder, exist_ok=True)
+    csv_path = unique_path(os.path.join(folder, f"{stamp}.csv"))
+    atomic_write_text(csv_path, df.to_csv(index=False), encoding="utf-8-sig")
+    report = {'fund': fund, 'quarantined_at': stamp, 'problems': problems, 'stats': stats}
+    atomic_write_text(os.path.splitext(csv_path)[0] + ".json", json.dumps(report, ensure_ascii=False, indent=2))
+    return csv_path
+
+def rejection_path(fund):
+    return os.path.join(QUARANTINE_DIR, fund, REJECTED_FILE)
+
+def load_rejection(fund):
+    path = rejection_path(fund)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def clear_rejection(fund):
+    if os.path.exists(rejection_path(fund)):
+        os.remove(rejection_path(fund))
+
+def rejection_count(fund, fingerprint):
+    """這份資料 (指紋) 目前已連續被擋下幾次"""
+    record = load_rejection(fund)
+    return record['count'] if record and record['fingerprint'] == fingerprint else 0
+
+def note_rejection(fund, df, problems, stats, fingerprint=None):
+    """
+    記錄一次被擋下：同一份資料只隔離一次 (重抓到同樣的資料只累加次數)，回傳記錄。
+    """
+    fingerprint = fingerprint or data_fingerprint(df, fund)
+    record = load_rejection(fund)
+    if record and record['fingerprint'] == fingerprint:
+        record['count'] += 1
+    else:
+        record = {'fingerprint': fingerprint, 'count': 1, 'path': quarantine(fund, df, problems, stats)}
+    record['problems'] = problems
+    atomic_write_text(rejection_path(fund), json.dumps(record, ensure_ascii=False, indent=2))
+    return record
+
+def repeat_rejection(fund):
+    """輪詢重抓到同一份已被擋下的資料：不重新檢查、不再隔離，只把次數加一，回傳目前次數"""
+    record = load_rejection(fund)
+    if record is None:
+        return 0
+    record['count'] += 1
+    atomic_write_text(rejection_path(fund), json.dumps(record, ensure_ascii=False, indent=2))
+    return record['count']
+
+def read_baseline(path):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return pd.read_csv(path, dtype=str)
+    except Exception as e:
+        print(f"⚠️ 無法讀取基準檔 {path}: {e}")
+        return None
+
+def gate(fund, df_new, baseline_path, force=False):
+    """
+    提交新快照前呼叫 (呼叫端需持有 fund_lock)。
+    通過回傳 True；沒通過則把快照放進隔離區、印出原因並回傳 False，
+    基準檔保持不動，明天仍與最後一份正常的資料比對。
+    真的大幅調整時：force=True (pipeline.py --force) 直接接受；或同一份資料連續被擋下
+    REBASELINE_AFTER 次、且問題都只是「與上一份差太多」時自動接受，改用它當新的基準。
+    """
+    problems, stats = check_snapshot(fund, df_new, read_baseline(baseline_path))
+    if problems and force:
+        print(f"⚠️ {fund}: 強制接受未通過檢查的快照 ({'；'.join(problems)})")
+        problems = []
+    if not problems:
+        clear_rejection(fund)
+        return True
+
+    record = note_rejection(fund, df_new, problems, stats)
+    if record['count'] >= REBASELINE_AFTER and stats and not absolute_problems(stats):
+        print(f"🔁 {fund}: 同一份資料已連續 {record['count']} 次被擋下，視為真的大幅調整，改用它當新的基準")
+        clear_rejection(fund)
+        return True
+    print(f"🚫 {fund}: 新快照未通過檢查 (第 {record['count']} 次)，已隔離至 {record['path']}，基準檔保持不變")
+    for p in problems:
+        print(f"   - {p}")
+    return False
+
+if __name__ == "__main__":
+    # 用歷史快照檢查門檻是否合理：列出會被擋下的日子
+    import sys
+    from history import FUNDS, list_snapshots
+    for fund in sys.argv[1:] or FUNDS:
+        snapshots = list_snapshots(fund)
+        prev, flagged = None, 0
+        for day, path in snapshots:
+            df = pd.read_csv(path, dtype=str)
+            problems, _ = check_snapshot(fund, df, prev)
+            if problems:
+                flagged += 1
+                print(f"   {fund} {day.date()}: {'；'.join(problems)}")
+            prev = df
+        print(f"✅ {fund}: {len(snapshots)} 份快照，{flagged} 份會被擋下")